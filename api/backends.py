@@ -0,0 +1,217 @@
+import argparse
+import ast
+import os
+from typing import NamedTuple, Optional
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+# "ultralytics" runs weights through YOLO (.pt, or an OpenVINO export directory);
+# "onnxruntime" runs an exported .onnx file with NumPy pre/postprocessing
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "ultralytics")
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))  # 0 lets onnxruntime decide
+
+IOU_THRESHOLD = 0.7  # ultralytics predict default
+MAX_DETECTIONS = 300
+MAX_CANDIDATES = 30000
+_CLASS_OFFSET = 7680  # Separates classes so one NMS pass is class-aware
+
+
+class Detections(NamedTuple):
+    """Backend-independent detections for one image, in source image pixels."""
+    boxes: np.ndarray  # N x 4 xyxy
+    scores: np.ndarray  # N
+    class_ids: np.ndarray  # N
+    names: dict
+    image: Optional[np.ndarray] = None  # BGR source image, used for plotting
+
+    @classmethod
+    def from_ultralytics(cls, result) -> "Detections":
+        # One device-to-host copy for all boxes instead of one per attribute per box
+        data = result.boxes.data.cpu().numpy()
+        return cls(
+            boxes=data[:, :4],
+            scores=data[:, 4],
+            class_ids=data[:, 5].astype(np.int64),
+            names=result.names,
+            image=result.orig_img,
+        )
+
+    def plot(self, image: Optional[np.ndarray] = None, letterbox=None) -> np.ndarray:
+        """
+        Draw the boxes and labels on a copy of the source image (BGR).
+
+        Args:
+            image (np.ndarray): BGR image to draw on instead of the one the model saw,
+                e.g. the decoded upload when the model was given a letterboxed copy.
+            letterbox (Letterbox): Geometry of that letterboxed copy, mapping the boxes to `image`.
+        """
+        boxes = self.boxes if letterbox is None else letterbox.to_original(self.boxes)
+        canvas = Image.fromarray((self.image if image is None else image)[:, :, ::-1].copy())
+        draw = ImageDraw.Draw(canvas)
+        for (x1, y1, x2, y2), score, class_id in zip(boxes, self.scores, self.class_ids):
+            draw.rectangle([x1, y1, x2, y2], outline=(255, 56, 56), width=3)
+            draw.text((x1 + 4, y1 + 2), f"{self.names[int(class_id)]} {score:.2f}", fill=(255, 56, 56))
+        return np.asarray(canvas)[:, :, ::-1]
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """
+    Greedy non-maximum suppression; each step suppresses against all remaining boxes at once.
+
+    Returns:
+        np.ndarray: Indices of kept boxes, highest score first.
+    """
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        xx1 = np.maximum(boxes[i, 0], boxes[rest, 0])
+        yy1 = np.maximum(boxes[i, 1], boxes[rest, 1])
+        xx2 = np.minimum(boxes[i, 2], boxes[rest, 2])
+        yy2 = np.minimum(boxes[i, 3], boxes[rest, 3])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def postprocess(prediction: np.ndarray, conf: float, iou_threshold: float = IOU_THRESHOLD,
+                max_det: int = MAX_DETECTIONS):
+    """
+    Turn one raw YOLOv8 output (4 + num_classes, num_anchors) into boxes, scores and classes.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: xyxy boxes, scores and class ids.
+    """
+    pred = prediction.T
+    class_scores = pred[:, 4:]
+    class_ids = class_scores.argmax(axis=1)
+    scores = class_scores[np.arange(len(pred)), class_ids]
+    mask = scores > conf
+    pred, scores, class_ids = pred[mask], scores[mask], class_ids[mask]
+    if len(scores) > MAX_CANDIDATES:
+        top = scores.argsort()[::-1][:MAX_CANDIDATES]
+        pred, scores, class_ids = pred[top], scores[top], class_ids[top]
+
+    cx, cy, w, h = pred[:, 0], pred[:, 1], pred[:, 2], pred[:, 3]
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    keep = nms(boxes + class_ids[:, None] * _CLASS_OFFSET, scores, iou_threshold)[:max_det]
+    return boxes[keep], scores[keep], class_ids[keep]
+
+
+class OnnxDetector:
+    """
+    YOLOv8 detector running on onnxruntime's CPU provider.
+
+    Exposes the subset of the YOLO `predict` interface the API uses, but returns
+    `Detections` computed with NumPy letterboxing, decoding and NMS.
+
+    Args:
+        path (str): Exported .onnx file (see `export_onnx`).
+    """
+
+    def __init__(self, path: str):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if ONNX_THREADS:
+            options.intra_op_num_threads = ONNX_THREADS
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(metadata["names"]) if "names" in metadata else {}
+        if isinstance(model_input.shape[2], int):
+            self.imgsz = model_input.shape[2]
+        else:
+            self.imgsz = ast.literal_eval(metadata.get("imgsz", "[640, 640]"))[0]
+
+    def predict(self, source, conf: float = 0.25, imgsz: Optional[int] = None, **kwargs) -> list:
+        from images import load_image
+        from preprocess import letterbox_array
+
+        sources = source if isinstance(source, list) else [source]
+        images, letterboxes = [], []
+        for src in sources:
+            if isinstance(src, str):
+                with open(src, "rb") as f:
+                    src = load_image(f.read())
+            images.append(src)
+            letterboxes.append(letterbox_array(src, self.imgsz))
+
+        # BGR HWC uint8 -> RGB CHW float32 in [0, 1]
+        batch = np.stack([canvas for canvas, _ in letterboxes])[..., ::-1].transpose(0, 3, 1, 2)
+        batch = np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+        if self.dynamic_batch:
+            outputs = self.session.run(None, {self.input_name: batch})[0]
+        else:
+            outputs = np.concatenate([
+                self.session.run(None, {self.input_name: batch[i:i + 1]})[0] for i in range(len(batch))
+            ])
+
+        detections = []
+        for image, (_, letterbox), prediction in zip(images, letterboxes, outputs):
+            boxes, scores, class_ids = postprocess(prediction, conf)
+            detections.append(Detections(letterbox.to_original(boxes), scores, class_ids, self.names, image))
+        return detections
+
+
+def load_model(path: str):
+    """Registry loader honouring INFERENCE_BACKEND."""
+    if INFERENCE_BACKEND == "onnxruntime":
+        return OnnxDetector(path)
+    from ultralytics import YOLO
+    return YOLO(path)
+
+
+def to_detections(results) -> list:
+    """Normalise backend output (ultralytics results or Detections) to Detections."""
+    return [r if isinstance(r, Detections) else Detections.from_ultralytics(r) for r in results]
+
+
+def export_onnx(weights: str, imgsz: int = 640, int8: bool = False) -> str:
+    """
+    Export YOLO weights to ONNX with a dynamic batch axis, optionally INT8-quantized.
+
+    Returns:
+        str: Path of the exported (or quantized) model.
+    """
+    from ultralytics import YOLO
+
+    path = YOLO(weights).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+    if int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized = path.replace(".onnx", "_int8.onnx")
+        quantize_dynamic(path, quantized, weight_type=QuantType.QUInt8)
+        path = quantized
+    print(f"✅ Exported {weights} to {path}")
+    return path
+
+
+def export_openvino(weights: str, imgsz: int = 640, int8: bool = False) -> str:
+    """Export YOLO weights to an OpenVINO directory, served by the ultralytics backend."""
+    from ultralytics import YOLO
+
+    path = YOLO(weights).export(format="openvino", imgsz=imgsz, int8=int8)
+    print(f"✅ Exported {weights} to {path}")
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the meal detector for CPU inference backends.")
+    parser.add_argument("--weights", default="models/cstam.pt")
+    parser.add_argument("--format", choices=["onnx", "openvino"], default="onnx")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--int8", action="store_true", help="Quantize weights to INT8")
+    args = parser.parse_args()
+
+    if args.format == "onnx":
+        export_onnx(args.weights, args.imgsz, args.int8)
+    else:
+        export_openvino(args.weights, args.imgsz, args.int8)
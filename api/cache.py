@@ -0,0 +1,179 @@
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+DETECTION_CACHE_SIZE = int(os.getenv("DETECTION_CACHE_SIZE", "256"))
+DETECTION_CACHE_TTL = float(os.getenv("DETECTION_CACHE_TTL", "3600"))
+# Set to a sqlite file path (e.g. "cache/detections.db") to keep results across restarts
+DETECTION_CACHE_DB = os.getenv("DETECTION_CACHE_DB", "")
+DETECTION_CACHE_DB_MAX_ENTRIES = int(os.getenv("DETECTION_CACHE_DB_MAX_ENTRIES", "10000"))
+
+
+class DetectionCache:
+    """
+    Two-tier cache of detection results keyed by image content and model settings.
+
+    The memory tier is an LRU bounded by `max_entries` with a per-entry TTL. The
+    optional sqlite tier survives restarts; disk hits are promoted to memory. The
+    async `lookup` and `store` keep sqlite reads and commits off the event loop.
+
+    Args:
+        max_entries (int): Maximum entries kept in memory (0 disables the memory tier).
+        ttl_seconds (float): Entries older than this are treated as misses.
+        db_path (str): sqlite file for the persistent tier, empty to disable it.
+        db_max_entries (int): Rows kept in sqlite, oldest removed first.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DETECTION_CACHE_SIZE,
+        ttl_seconds: float = DETECTION_CACHE_TTL,
+        db_path: str = DETECTION_CACHE_DB,
+        db_max_entries: int = DETECTION_CACHE_DB_MAX_ENTRIES,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.db_max_entries = db_max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()  # Memory tier, taken on the event loop
+        self._db_lock = threading.Lock()  # sqlite tier, taken in threads
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._writes = 0
+
+        self._db = None
+        if db_path:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS detections (key TEXT PRIMARY KEY, created REAL, items TEXT)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS detections_created ON detections (created)")
+            self._db.commit()
+
+    @staticmethod
+    def make_key(image_data, *settings) -> str:
+        """
+        Hash the decoded image bytes together with everything that changes the result
+        (model weights, confidence threshold, preprocessing).
+        """
+        digest = hashlib.sha256(image_data)
+        digest.update(repr(settings).encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[list]:
+        items = self._get_memory(key)
+        if items is None and self._db is not None:
+            items = self._get_db(key)
+        if items is None:
+            self._count_miss()
+        return items
+
+    async def lookup(self, key: str) -> Optional[list]:
+        """
+        `get` for the event loop: the memory tier is read inline, the sqlite tier in a
+        thread, so a disk lookup never blocks other requests.
+        """
+        items = self._get_memory(key)
+        if items is None and self._db is not None:
+            items = await asyncio.to_thread(self._get_db, key)
+        if items is None:
+            self._count_miss()
+        return items
+
+    def put(self, key: str, items: list) -> None:
+        created = time.time()
+        with self._lock:
+            self._remember(key, created, copy.deepcopy(items))
+        if self._db is not None:
+            self._put_db(key, created, items)
+
+    async def store(self, key: str, items: list) -> None:
+        """`put` for the event loop: the sqlite insert and commit run in a thread."""
+        created = time.time()
+        with self._lock:
+            self._remember(key, created, copy.deepcopy(items))
+        if self._db is not None:
+            await asyncio.to_thread(self._put_db, key, created, items)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM detections")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+        }
+
+    def _get_memory(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created, items = entry
+            if now - created <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(items)
+            del self._entries[key]
+            return None
+
+    def _get_db(self, key):
+        now = time.time()
+        with self._db_lock:
+            row = self._db.execute("SELECT created, items FROM detections WHERE key = ?", (key,)).fetchone()
+        if row is None or now - row[0] > self.ttl:
+            return None
+        items = json.loads(row[1])
+        with self._lock:
+            self._remember(key, row[0], items)
+            self.disk_hits += 1
+        return copy.deepcopy(items)
+
+    def _put_db(self, key, created, items):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO detections (key, created, items) VALUES (?, ?, ?)",
+                (key, created, json.dumps(items)),
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._prune_db(created)
+            self._db.commit()
+
+    def _count_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def _remember(self, key, created, items):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (created, items)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _prune_db(self, now):
+        self._db.execute(
+            "DELETE FROM detections WHERE created < ? OR key NOT IN "
+            "(SELECT key FROM detections ORDER BY created DESC LIMIT ?)",
+            (now - self.ttl, self.db_max_entries),
+        )
@@ -0,0 +1,234 @@
+import bisect
+import difflib
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import Optional
+
+FOOD_DATA_PATH = os.getenv("FOOD_DATA_PATH", "food_data.json")
+# Seconds between checks of the file's modification time
+FOOD_DATA_WATCH_INTERVAL = float(os.getenv("FOOD_DATA_WATCH_INTERVAL", "2"))
+
+NUTRIENT_FIELDS = ("calories", "carbs_g", "protein_g")
+
+logger = logging.getLogger("api.food_catalog")
+
+
+class CatalogError(ValueError):
+    """Raised when the food data file does not have the expected structure."""
+
+
+def normalize_name(name: str) -> str:
+    """
+    Canonical form used to match dish names and YOLO class names,
+    e.g. "Salade Mechweya" and "salade_mechweya" both become "salade_mechweya".
+    """
+    ascii_name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "_", ascii_name.lower()).strip("_")
+
+
+def parse_range(value) -> dict:
+    """
+    Parse a nutrient value such as "300-450" or 120 into its min, max and average.
+    """
+    if isinstance(value, (int, float)):
+        low = high = float(value)
+    else:
+        try:
+            parts = [float(p) for p in str(value).replace("–", "-").split("-") if p.strip()]
+        except ValueError:
+            raise CatalogError(f"Invalid nutrient value: {value!r}")
+        if not 1 <= len(parts) <= 2:
+            raise CatalogError(f"Invalid nutrient value: {value!r}")
+        low, high = parts[0], parts[-1]
+    return {"min": low, "max": high, "avg": (low + high) / 2}
+
+
+class _Snapshot:
+    """Immutable, indexed view of one version of the food data file."""
+
+    def __init__(self, raw: bytes):
+        try:
+            data = json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise CatalogError(f"Invalid JSON: {e}")
+        if not isinstance(data, dict):
+            raise CatalogError("Food data must be an object keyed by cuisine")
+
+        self.etag = hashlib.sha1(raw).hexdigest()
+        # Pre-encoded body of the legacy /food_data response
+        self.legacy_body = json.dumps({"food_data": raw.decode("utf-8")}).encode("utf-8")
+        self.cuisines = {}
+        self.dishes = []
+        self.by_cuisine = {}
+        self.by_class = {}
+
+        for cuisine, section in data.items():
+            if not isinstance(section, dict) or not isinstance(section.get("dishes"), list):
+                raise CatalogError(f"Cuisine '{cuisine}' must have a 'dishes' list")
+            self.cuisines[cuisine] = {
+                "name": cuisine,
+                "description": section.get("description", ""),
+                "dish_count": len(section["dishes"]),
+                "nutritional_notes": section.get("nutritional_notes", {}),
+            }
+            self.by_cuisine[cuisine] = []
+            for dish in section["dishes"]:
+                if not isinstance(dish, dict) or not isinstance(dish.get("name"), str):
+                    raise CatalogError(f"Every dish in '{cuisine}' needs a name")
+                entry = {
+                    "name": dish["name"],
+                    "cuisine": cuisine,
+                    "description": dish.get("description", ""),
+                }
+                for field in NUTRIENT_FIELDS:
+                    if field in dish:
+                        entry[field] = parse_range(dish[field])
+                index = len(self.dishes)
+                self.dishes.append(entry)
+                self.by_cuisine[cuisine].append(index)
+                # Detector classes default to the normalised dish name; "class_names" adds aliases
+                for class_name in [dish["name"], *dish.get("class_names", [])]:
+                    self.by_class.setdefault(normalize_name(class_name), index)
+
+        self.sorted_names = sorted((normalize_name(d["name"]), i) for i, d in enumerate(self.dishes))
+        self.sorted_keys = [name for name, _ in self.sorted_names]
+
+
+class FoodCatalog:
+    """
+    Loads and validates the food data file once and serves indexed lookups.
+
+    The file is read on first access, then re-checked at most every `watch_interval`
+    seconds when the catalogue is used; if its modification time changed it is
+    re-parsed and the indexes are swapped atomically. An invalid edit keeps the
+    previous version in service.
+
+    Args:
+        path (str): JSON file with cuisines and their dishes.
+        watch_interval (float): Minimum seconds between modification checks.
+    """
+
+    def __init__(self, path: str = FOOD_DATA_PATH, watch_interval: float = FOOD_DATA_WATCH_INTERVAL):
+        self.path = path
+        self.watch_interval = watch_interval
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._mtime = None
+        self._checked = 0.0
+
+    def reload(self) -> None:
+        mtime = os.path.getmtime(self.path)
+        with open(self.path, "rb") as f:
+            snapshot = _Snapshot(f.read())
+        with self._lock:
+            self._snapshot, self._mtime = snapshot, mtime
+        logger.info("🍽️ Loaded %d dishes from %s", len(snapshot.dishes), self.path)
+
+    @property
+    def snapshot(self) -> _Snapshot:
+        if self._snapshot is None:
+            self.reload()
+            self._checked = time.monotonic()
+        now = time.monotonic()
+        if now - self._checked >= self.watch_interval:
+            self._checked = now
+            try:
+                if os.path.getmtime(self.path) != self._mtime:
+                    self.reload()
+            except (OSError, CatalogError) as e:
+                logger.warning("⚠️ Keeping previous food data, reload failed: %s", e)
+        return self._snapshot
+
+    @property
+    def etag(self) -> str:
+        return self.snapshot.etag
+
+    def cuisines(self) -> list:
+        return list(self.snapshot.cuisines.values())
+
+    def dishes(self, cuisine: Optional[str] = None, query: Optional[str] = None,
+               max_calories: Optional[float] = None, min_protein: Optional[float] = None,
+               offset: int = 0, limit: int = 20) -> dict:
+        """
+        Filtered, paginated list of dishes.
+
+        Args:
+            cuisine (str): Only dishes of this cuisine.
+            query (str): Only dishes whose name starts with this prefix.
+            max_calories (float): Only dishes whose average calories are at most this.
+            min_protein (float): Only dishes with at least this much average protein.
+        """
+        snapshot = self.snapshot
+        if query:
+            indexes = self._prefix_matches(snapshot, query)
+        elif cuisine:
+            indexes = snapshot.by_cuisine.get(cuisine, [])
+        else:
+            indexes = range(len(snapshot.dishes))
+
+        dishes = [snapshot.dishes[i] for i in indexes]
+        if cuisine:
+            dishes = [d for d in dishes if d["cuisine"] == cuisine]
+        if max_calories is not None:
+            dishes = [d for d in dishes if "calories" in d and d["calories"]["avg"] <= max_calories]
+        if min_protein is not None:
+            dishes = [d for d in dishes if "protein_g" in d and d["protein_g"]["avg"] >= min_protein]
+        return {"total": len(dishes), "offset": offset, "limit": limit, "items": dishes[offset:offset + limit]}
+
+    def search(self, query: str, limit: int = 10) -> list:
+        """
+        Prefix matches first, then fuzzy matches for typos ("cous cous", "brick").
+        """
+        snapshot = self.snapshot
+        indexes = self._prefix_matches(snapshot, query)[:limit]
+        if len(indexes) < limit:
+            close = difflib.get_close_matches(normalize_name(query), snapshot.sorted_keys, n=limit, cutoff=0.6)
+            for name in close:
+                index = snapshot.sorted_names[bisect.bisect_left(snapshot.sorted_keys, name)][1]
+                if index not in indexes:
+                    indexes.append(index)
+        return [snapshot.dishes[i] for i in indexes[:limit]]
+
+    def by_class(self, class_name: str) -> Optional[dict]:
+        """Dish matching a detector class name, or None."""
+        snapshot = self.snapshot
+        index = snapshot.by_class.get(normalize_name(class_name))
+        return snapshot.dishes[index] if index is not None else None
+
+    def enrich(self, detected_items: list) -> list:
+        """
+        Attach the catalogue's nutrition data to detected items in place.
+
+        Best effort: when no food data could be loaded the items are returned without
+        a "nutrition" key, so detection results do not depend on the file.
+        """
+        if not detected_items:
+            return detected_items
+        try:
+            snapshot = self.snapshot
+        except (OSError, CatalogError) as e:
+            logger.warning("⚠️ Detections returned without nutrition, food data unavailable: %s", e)
+            return detected_items
+        for item in detected_items:
+            index = snapshot.by_class.get(normalize_name(item["item"]))
+            if index is not None:
+                dish = snapshot.dishes[index]
+                item["nutrition"] = {"dish": dish["name"], **{f: dish[f] for f in NUTRIENT_FIELDS if f in dish}}
+        return detected_items
+
+    @staticmethod
+    def _prefix_matches(snapshot: _Snapshot, query: str) -> list:
+        prefix = normalize_name(query)
+        start = bisect.bisect_left(snapshot.sorted_keys, prefix)
+        indexes = []
+        for name, index in snapshot.sorted_names[start:]:
+            if not name.startswith(prefix):
+                break
+            indexes.append(index)
+        return indexes
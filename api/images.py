@@ -0,0 +1,77 @@
+import base64
+import io
+
+import numpy as np
+from PIL import Image, ImageOps
+
+
+def decode_data_url(data_url: str) -> bytes:
+    """
+    Decode a `data:image/...;base64,` string sent by the frontend.
+
+    Raises:
+        ValueError: If the string is not a data URL.
+    """
+    header, sep, payload = data_url.partition(',')
+    if not sep:
+        raise ValueError("Invalid image format")
+    return base64.b64decode(payload)
+
+
+class BufferReader(io.RawIOBase):
+    """
+    Read-only file object over an existing buffer.
+
+    Unlike io.BytesIO it does not copy bytearray/memoryview inputs, so uploads
+    received into a single buffer are decoded in place.
+    """
+
+    def __init__(self, data):
+        self._view = memoryview(data).cast("B")
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def readinto(self, b):
+        chunk = self._view[self._pos:self._pos + len(b)]
+        n = len(chunk)
+        b[:n] = chunk
+        self._pos += n
+        return n
+
+    def read(self, size=-1):
+        end = len(self._view) if size is None or size < 0 else self._pos + size
+        chunk = self._view[self._pos:end].tobytes()
+        self._pos += len(chunk)
+        return chunk
+
+
+def load_image(data) -> np.ndarray:
+    """
+    Decode encoded image bytes straight into an array the detector accepts.
+
+    Args:
+        data (bytes-like): Encoded image (PNG, JPEG, ...).
+
+    Returns:
+        np.ndarray: Contiguous HxWx3 uint8 array in BGR order, as ultralytics expects.
+    """
+    with Image.open(BufferReader(data)) as img:
+        # Phone photos are stored rotated with an EXIF hint; cv2.imread honours it too
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        return np.ascontiguousarray(np.asarray(img)[:, :, ::-1])
@@ -0,0 +1,158 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+# Micro-batching knobs (overridable from the environment)
+MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "8"))
+MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "10"))
+QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "64"))
+
+_STOP = object()
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the inference queue cannot accept more requests."""
+
+
+class InferenceEngine:
+    """
+    Runs detection off the event loop and groups concurrent requests into micro-batches.
+
+    Requests are pushed onto a bounded queue. A single worker thread owns the model,
+    pulls up to `max_batch_size` requests (waiting at most `max_wait_ms` after the first
+    one arrives), runs one `predict_batch` call for the whole batch and resolves each
+    request's future with its own result.
+
+    Args:
+        predict_batch (Callable): Takes a list of sources, returns one result per source.
+        max_batch_size (int): Maximum number of images per model call.
+        max_wait_ms (float): How long to wait for a batch to fill up.
+        queue_size (int): Maximum number of pending requests before rejecting new ones.
+    """
+
+    def __init__(
+        self,
+        predict_batch: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_wait_ms: float = MAX_WAIT_MS,
+        queue_size: int = QUEUE_SIZE,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._batches = 0
+        self._requests = 0
+        self._stopping = False
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="inference-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stop the worker once its current batch is done, waiting up to `timeout` seconds.
+
+        New requests are refused from now on, and requests still queued fail with
+        `QueueFullError` instead of waiting for a worker that will not run them.
+        Blocking: call it from a thread, not the event loop.
+        """
+        if self._thread is None:
+            return
+        self._stopping = True
+        self._fail_queued()
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass  # Only if requests were queued concurrently; the join below still honours the timeout
+        self._thread.join(timeout)
+        self._fail_queued()
+        self._thread = None
+
+    def submit(self, source: Any) -> Future:
+        """
+        Queue a source for detection.
+
+        Returns:
+            Future: Resolved with the detection result for this source.
+        """
+        if self._stopping:
+            raise QueueFullError("Inference engine is shutting down")
+        future: Future = Future()
+        try:
+            self._queue.put_nowait((source, future))
+        except queue.Full:
+            raise QueueFullError("Inference queue is full, try again later")
+        return future
+
+    async def predict(self, source: Any) -> Any:
+        """Awaitable wrapper around `submit` for use inside request handlers."""
+        return await asyncio.wrap_future(self.submit(source))
+
+    def stats(self) -> dict:
+        return {
+            "batches": self._batches,
+            "requests": self._requests,
+            "avg_batch_size": self._requests / self._batches if self._batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
+
+    def _fail_queued(self):
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _STOP and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(QueueFullError("Inference engine is shutting down"))
+
+    def _collect_batch(self) -> Tuple[List[Tuple[Any, Future]], bool]:
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._collect_batch()
+            # Drop requests whose caller already gave up
+            batch = [(src, fut) for src, fut in batch if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                results = self.predict_batch([src for src, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"Expected {len(batch)} results, got {len(results)}")
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+
+            self._batches += 1
+            self._requests += len(batch)
+            for (_, fut), result in zip(batch, results):
+                fut.set_result(result)
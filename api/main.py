@@ -1,12 +1,95 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-import base64
+from fastapi.middleware.gzip import GZipMiddleware
+import asyncio
+import copy
+import hashlib
+import hmac
+import json
+import logging
 import os
+from contextlib import asynccontextmanager
 from datetime import datetime
 from pydantic import BaseModel
-from predict import predict_meal
+from predict import run_model, extract_detected_items, CONFIDENCE_THRESHOLD
+from registry import registry
+from inference import InferenceEngine, QueueFullError
+from images import decode_data_url, load_image
+from storage import ImageSink
+from uploads import UploadTooLargeError, read_multipart_file, read_raw_body
+from preprocess import Preprocessor
+from cache import DetectionCache
+from food_catalog import FoodCatalog
+from observability import RequestMetricsMiddleware, configure_logging, metrics, span
 
-app = FastAPI()
+configure_logging()
+logger = logging.getLogger("api.main")
+
+# "memory" hands decoded arrays straight to the model; "disk" keeps the legacy
+# save-then-predict flow (originals in data/, annotated copies in runs/detect)
+UPLOAD_MODE = os.getenv("UPLOAD_MODE", "memory")
+# Decode and letterbox uploads at model resolution before detection (memory mode only)
+PRE_RESIZE = os.getenv("PRE_RESIZE", "true").lower() == "true"
+
+sink = ImageSink()
+preprocessor = Preprocessor()
+cache = DetectionCache()
+catalog = FoodCatalog()
+# Everything besides the image bytes (and model version) that changes detection results
+CACHE_SETTINGS = (CONFIDENCE_THRESHOLD, UPLOAD_MODE, PRE_RESIZE, preprocessor.imgsz)
+# Run a dummy inference at startup so the first upload does not pay for model loading
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() == "true"
+# Shared secret for POST /models/{name}/reload; empty disables the endpoint
+MODEL_ADMIN_TOKEN = os.getenv("MODEL_ADMIN_TOKEN", "")
+# Uploads currently being analysed, so double taps share one detection
+inflight: dict = {}
+
+
+def analyse_batch(uploads: list) -> list:
+    """
+    Detect meals for a batch of (image, filename, letterbox, original) uploads in one model call.
+
+    `original` is the upload's encoded bytes when it was letterboxed and annotated
+    images are persisted, so the boxes are drawn on the photo rather than the model input.
+    """
+    images = [image for image, _, _, _ in uploads]
+    imgsz = preprocessor.imgsz if PRE_RESIZE else None
+    with span("inference"):
+        results = run_model(images, save=UPLOAD_MODE == "disk", imgsz=imgsz)
+    if sink.annotated:
+        with span("annotate"):
+            for (_, filename, letterbox, original), result in zip(uploads, results):
+                if original is None:
+                    sink.save_annotated(filename, result.plot())
+                else:
+                    sink.save_annotated(filename, result.plot(load_image(original), letterbox))
+    with span("postprocess"):
+        return [
+            extract_detected_items(result, letterbox)
+            for (_, _, letterbox, _), result in zip(uploads, results)
+        ]
+
+
+# Batches concurrent uploads and keeps YOLO off the event loop
+engine = InferenceEngine(analyse_batch)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        catalog.snapshot
+    except Exception as e:
+        logger.error("Food data load error: %s", e)
+    if MODEL_WARMUP:
+        await asyncio.to_thread(registry.warmup, imgsz=preprocessor.imgsz)
+    sink.start()
+    engine.start()
+    yield
+    await asyncio.to_thread(engine.stop, 5)
+    sink.stop(timeout=5)
+
+
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     "http://localhost:5173", #React dev server
@@ -21,61 +104,222 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+# Outermost, so the request id and latency cover every other middleware
+app.add_middleware(RequestMetricsMiddleware)
 
 class UploadImageRequest(BaseModel):
     image: str
 
+async def detect(image_data, filename: str) -> list:
+    """
+    Run detection on decoded upload bytes.
+    """
+    if UPLOAD_MODE == "disk":
+        # Create uploads directory if not exists
+        upload_dir = "data"
+        os.makedirs(upload_dir, exist_ok=True)
+        filepath = os.path.join(upload_dir, filename)
+
+        # Save the image
+        with span("file_io"):
+            with open(filepath, "wb") as f:
+                f.write(image_data)
+
+        logger.debug("Image saved to %s", filepath)
+        source, letterbox = filepath, None
+    else:
+        with span("preprocess"):
+            if PRE_RESIZE:
+                source, letterbox = await asyncio.to_thread(preprocessor, image_data)
+            else:
+                source, letterbox = await asyncio.to_thread(load_image, image_data), None
+        sink.save_original(filename, image_data)
+
+    original = image_data if letterbox is not None and sink.annotated else None
+    # Run prediction on the uploaded image: time in the queue plus its batch's model call
+    with span("detect"):
+        return await engine.predict((source, filename, letterbox, original))
+
+
+async def analyse_upload(image_data) -> dict:
+    """
+    Detect meals in an upload, reusing cached results for images seen before,
+    and build the API response.
+    """
+    # Generate filename with timestamp
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    filename = f"meal_{timestamp}.png"
+
+    # The weights version is part of the key; resolving it may load the model, so it runs off the loop too
+    with span("cache_key"):
+        key = await asyncio.to_thread(
+            lambda: DetectionCache.make_key(image_data, registry.version(), *CACHE_SETTINGS)
+        )
+    detected_items = await cache.lookup(key)
+    if detected_items is None:
+        pending = inflight.get(key)
+        if pending is not None:
+            detected_items = copy.deepcopy(await asyncio.shield(pending))
+        else:
+            pending = inflight[key] = asyncio.ensure_future(detect(image_data, filename))
+            try:
+                detected_items = await asyncio.shield(pending)
+            finally:
+                del inflight[key]
+            await cache.store(key, detected_items)
+
+    # Nutrition comes from the live catalogue, so edits apply to cached results too
+    with span("nutrition"):
+        catalog.enrich(detected_items)
+
+    return {
+        "message": "Image uploaded and analyzed successfully",
+        "filename": filename,
+        "detected_items": detected_items
+    }
+
+
 @app.post("/upload_image")
 async def upload_image(request: UploadImageRequest):
     try:
-        print(f"Received image request: {request.image[:100]}...")
+        logger.debug("Received image request: %.100s...", request.image)
         # Decode the base64 image
-        parts = request.image.split(',')
-        if len(parts) < 2:
-            raise ValueError("Invalid image format")
-        image_data = base64.b64decode(parts[1])
+        with span("decode"):
+            image_data = decode_data_url(request.image)
+        return await analyse_upload(image_data)
+    except QueueFullError as e:
+        logger.warning("Upload rejected: %s", e)
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.warning("Upload error: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
 
-        # Create uploads directory if not exists
-        upload_dir = "data"
-        os.makedirs(upload_dir, exist_ok=True)
 
-        # Generate filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"meal_{timestamp}.png"
-        filepath = os.path.join(upload_dir, filename)
+@app.post("/upload_image/file")
+async def upload_image_file(request: Request):
+    """
+    Accept a raw `image/*` body or a multipart/form-data file upload.
 
-        # Save the image
-        with open(filepath, "wb") as f:
-            f.write(image_data)
+    The body is streamed into a single buffer, avoiding the base64/JSON copies
+    of /upload_image.
+    """
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith(("image/", "multipart/form-data", "application/octet-stream")):
+        raise HTTPException(status_code=415, detail=f"Unsupported content type: {content_type}")
 
-        print(f"Image saved to {filepath}")
+    try:
+        with span("read_body"):
+            if content_type.startswith("multipart/form-data"):
+                image_data = await read_multipart_file(request)
+            else:
+                image_data = await read_raw_body(request)
+        logger.debug("Received image upload: %d bytes", len(image_data))
+        return await analyse_upload(image_data)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except QueueFullError as e:
+        logger.warning("Upload rejected: %s", e)
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.warning("Upload error: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
 
-        # Run prediction on the uploaded image
-        detected_items = predict_meal(filepath)
+@app.get("/models")
+async def list_models():
+    return registry.stats()
 
-        return {
-            "message": "Image uploaded and analyzed successfully",
-            "filename": filename,
-            "detected_items": detected_items
-        }
+
+@app.post("/models/{name}/reload")
+async def reload_model(name: str, request: Request):
+    """
+    Re-read a model's configured weights file without restarting.
+
+    Requires the X-Admin-Token header to match MODEL_ADMIN_TOKEN; without one configured
+    the endpoint is disabled. Weights are only ever loaded from the paths in MODELS,
+    never from a path given by the caller: loading them unpickles arbitrary objects.
+    """
+    token = request.headers.get("x-admin-token", "")
+    if not MODEL_ADMIN_TOKEN or not hmac.compare_digest(token.encode(), MODEL_ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Model reload is not allowed")
+    try:
+        return await asyncio.to_thread(registry.reload, name, preprocessor.imgsz)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        print(f"Upload error: {e}")
+        logger.error("Model reload error: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
 
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return cache.stats()
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Stage and request latency histograms in Prometheus format."""
+    body, content_type = metrics()
+    return Response(content=body, media_type=content_type)
+
+
+def etag_response(request: Request, etag: str, build_body) -> Response:
+    """
+    Answer with 304 when the client already has this version, otherwise build the JSON body.
+    """
+    etag = f'"{etag}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    body = build_body()
+    if not isinstance(body, bytes):
+        body = json.dumps(body).encode("utf-8")
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def query_etag(request: Request) -> str:
+    """ETag for a catalogue query: data version plus the query parameters."""
+    params = hashlib.sha1(str(sorted(request.query_params.multi_items())).encode()).hexdigest()[:12]
+    return f"{catalog.etag}-{params}"
+
+
 @app.get("/food_data")
-async def get_food_data():
-    print("Fetching food data...")
+async def get_food_data(request: Request):
+    logger.debug("Fetching food data...")
     try:
-        food_data_file = "food_data.json"
-        if not os.path.exists(food_data_file):
-            raise FileNotFoundError("Food data file not found")
+        snapshot = catalog.snapshot
+        return etag_response(request, snapshot.etag, lambda: snapshot.legacy_body)
+    except Exception as e:
+        logger.error("Food data retrieval error: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
 
-        with open(food_data_file, "r") as f:
-            food_data = f.read()
 
-        return {
-            "food_data": food_data
-        }
-    except Exception as e:
-        print(f"Food data retrieval error: {e}")
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+@app.get("/foods/cuisines")
+async def list_cuisines(request: Request):
+    return etag_response(request, query_etag(request), lambda: {"cuisines": catalog.cuisines()})
+
+
+@app.get("/foods")
+async def list_foods(request: Request, cuisine: str = None, q: str = None, max_calories: float = None,
+                     min_protein: float = None, offset: int = 0, limit: int = 20):
+    """
+    Paginated dish list, filterable by cuisine, name prefix, calories and protein.
+    """
+    offset, limit = max(offset, 0), min(max(limit, 1), 100)
+    return etag_response(request, query_etag(request), lambda: catalog.dishes(
+        cuisine=cuisine, query=q, max_calories=max_calories, min_protein=min_protein, offset=offset, limit=limit))
+
+
+@app.get("/foods/search")
+async def search_foods(request: Request, q: str, limit: int = 10):
+    """Prefix and fuzzy dish name search."""
+    limit = min(max(limit, 1), 50)
+    return etag_response(request, query_etag(request), lambda: {"items": catalog.search(q, limit)})
+
+
+@app.get("/foods/class/{class_name}")
+async def food_for_class(class_name: str):
+    dish = catalog.by_class(class_name)
+    if dish is None:
+        raise HTTPException(status_code=404, detail=f"No dish for class '{class_name}'")
+    return dish
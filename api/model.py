@@ -1,11 +1,10 @@
-from ultralytics import YOLO
 import numpy as np
 from PIL import Image
 import os
+from registry import registry
+from backends import to_detections
 
-# Load your YOLO model - update the path to your model file
-model_path = "models/cstam.pt"
-model = YOLO(model_path)
+# Models are loaded once per process by the shared registry (see registry.py)
 
 # Map class IDs to food names and nutrition data
 # TODO: Update this FOOD_DATABASE with your actual YOLO model classes and nutrition data
@@ -19,6 +18,111 @@ FOOD_DATABASE = {
     # 4: {"name": "Apple", "calories": 95, "protein": 0.5, "carbs": 25, "fat": 0.3},
 }
 
+NUTRIENTS = ("calories", "protein", "carbs", "fat")
+
+
+class NutritionTable:
+    """
+    Array-backed view of a class id -> food mapping.
+
+    Nutrition values live in a (num_classes, len(NUTRIENTS)) array so a whole set of
+    detections is looked up with one fancy-indexing operation and totalled with one sum.
+    `integral` records which values were ints, so totals keep the types a plain Python
+    sum would give.
+
+    Args:
+        database (dict): Mapping of class id to food dict (see FOOD_DATABASE).
+    """
+
+    def __init__(self, database: dict):
+        size = max(database) + 1 if database else 0
+        self.foods = np.empty(size, dtype=object)
+        self.values = np.zeros((size, len(NUTRIENTS)), dtype=np.float64)
+        self.integral = np.ones((size, len(NUTRIENTS)), dtype=bool)
+        self.known = np.zeros(size, dtype=bool)
+        for class_id, food in database.items():
+            self.foods[class_id] = food
+            self.values[class_id] = [food[n] for n in NUTRIENTS]
+            self.integral[class_id] = [isinstance(food[n], int) for n in NUTRIENTS]
+            self.known[class_id] = True
+
+    def known_mask(self, class_ids: np.ndarray) -> np.ndarray:
+        """Boolean mask of the class ids that have nutrition data."""
+        in_range = (class_ids >= 0) & (class_ids < len(self.known))
+        mask = np.zeros(len(class_ids), dtype=bool)
+        mask[in_range] = self.known[class_ids[in_range]]
+        return mask
+
+
+NUTRITION_TABLE = NutritionTable(FOOD_DATABASE)
+
+
+def summarize_detections(detections_list: list, table: NutritionTable = NUTRITION_TABLE) -> list:
+    """
+    Build the nutrition summary for several images at once.
+
+    Class ids and confidences of every image are concatenated, looked up in the
+    nutrition table in one step and totalled per image with `np.add.at`.
+
+    Args:
+        detections_list (list): One `Detections` per image.
+
+    Returns:
+        list: One summary dict per image.
+    """
+    if not detections_list:
+        return []
+    counts = [len(d.class_ids) for d in detections_list]
+    class_ids = np.concatenate([np.asarray(d.class_ids, dtype=np.int64) for d in detections_list])
+    confidences = np.concatenate([np.asarray(d.scores, dtype=np.float64) for d in detections_list])
+    image_index = np.repeat(np.arange(len(detections_list)), counts)
+
+    mask = table.known_mask(class_ids)
+    class_ids, confidences, image_index = class_ids[mask], confidences[mask], image_index[mask]
+
+    totals = np.zeros((len(detections_list), len(NUTRIENTS)))
+    np.add.at(totals, image_index, table.values[class_ids])
+    # A total is an int, as with a Python sum, unless one of its values was a float
+    fractional = np.zeros(totals.shape, dtype=bool)
+    np.logical_or.at(fractional, image_index, ~table.integral[class_ids])
+    totals = [[value if is_float else int(value) for value, is_float in zip(row, flags)]
+              for row, flags in zip(totals.tolist(), fractional.tolist())]
+
+    items_per_image = [[] for _ in detections_list]
+    for food, confidence, index in zip(table.foods[class_ids], confidences.tolist(), image_index.tolist()):
+        items_per_image[index].append({"name": food["name"], "confidence": confidence,
+                                       **{n: food[n] for n in NUTRIENTS}})
+
+    summaries = []
+    for detected_items, (total_calories, total_protein, total_carbs, total_fat) in zip(items_per_image, totals):
+        summaries.append({
+            "items": detected_items,
+            "total_calories": total_calories,
+            "total_protein": total_protein,
+            "total_carbs": total_carbs,
+            "total_fat": total_fat,
+            "meal_name": generate_meal_name(detected_items),
+            "suggestion": generate_suggestion(total_calories, total_protein, total_carbs, total_fat)
+        })
+    return summaries
+
+
+def detect_meals_batch(images: list) -> list:
+    """
+    Detect meals in several images with a single model call
+
+    Args:
+        images: List of PIL Image objects
+
+    Returns:
+        list: Detection results with nutrition info, one per image
+    """
+    # Run inference through the configured backend (expects BGR arrays)
+    arrays = [np.ascontiguousarray(np.asarray(image.convert("RGB"))[:, :, ::-1]) for image in images]
+    results = to_detections(registry.get().predict(arrays))
+    return summarize_detections(results)
+
+
 def detect_meals(image: Image.Image):
     """
     Detect meals in image using YOLO model
@@ -29,53 +133,7 @@ def detect_meals(image: Image.Image):
     Returns:
         dict: Detection results with nutrition info
     """
-    # Run inference
-    results = model(image)
-
-    detected_items = []
-    total_calories = 0
-    total_protein = 0
-    total_carbs = 0
-    total_fat = 0
-
-    # Process YOLO results
-    for result in results:
-        boxes = result.boxes
-        for box in boxes:
-            class_id = int(box.cls[0])
-            confidence = float(box.conf[0])
-
-            if class_id in FOOD_DATABASE:
-                food_data = FOOD_DATABASE[class_id]
-                detected_items.append({
-                    "name": food_data["name"],
-                    "confidence": confidence,
-                    "calories": food_data["calories"],
-                    "protein": food_data["protein"],
-                    "carbs": food_data["carbs"],
-                    "fat": food_data["fat"]
-                })
-
-                total_calories += food_data["calories"]
-                total_protein += food_data["protein"]
-                total_carbs += food_data["carbs"]
-                total_fat += food_data["fat"]
-
-    # Generate meal name
-    meal_name = generate_meal_name(detected_items)
-
-    # Generate suggestion
-    suggestion = generate_suggestion(total_calories, total_protein, total_carbs, total_fat)
-
-    return {
-        "items": detected_items,
-        "total_calories": total_calories,
-        "total_protein": total_protein,
-        "total_carbs": total_carbs,
-        "total_fat": total_fat,
-        "meal_name": meal_name,
-        "suggestion": suggestion
-    }
+    return detect_meals_batch([image])[0]
 
 def generate_meal_name(items):
     if not items:
@@ -0,0 +1,73 @@
+import logging
+import os
+import re
+import sys
+import time
+import uuid
+
+from prometheus_client import Histogram
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # For common/, shared with the chatbot
+from common.observability import LOG_LEVEL, StageTimer, metrics, request_id_var  # noqa: E402,F401
+from common.observability import configure_logging as _configure_logging  # noqa: E402
+
+REQUEST_ID_HEADER = "X-Request-ID"
+# Seconds, from a cached lookup to a cold model call
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+_VALID_REQUEST_ID = re.compile(r"[\w.:-]{1,128}")
+
+STAGE_SECONDS = Histogram("meal_api_stage_seconds", "Time spent in each stage of meal detection",
+                          ["stage"], buckets=BUCKETS)
+REQUEST_SECONDS = Histogram("meal_api_request_seconds", "HTTP request latency by route and status",
+                            ["method", "route", "status"], buckets=BUCKETS)
+
+logger = logging.getLogger("api")
+
+# observe(stage, seconds) and `with span(stage):` record into meal_api_stage_seconds
+_stages = StageTimer(STAGE_SECONDS, logger)
+observe, span = _stages.observe, _stages.span
+
+
+def configure_logging(level: str = LOG_LEVEL):
+    """Log to stderr with the request id on every line: this service at `level`, libraries at WARNING."""
+    _configure_logging(logger, level)
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware giving every HTTP request an id and timing it.
+
+    The id comes from the X-Request-ID header (or is generated), is set for the logs
+    of the request and returned in the response header. Latency is recorded in
+    `meal_api_request_seconds` by route template, so paths with parameters share a series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_id = dict(scope["headers"]).get(REQUEST_ID_HEADER.lower().encode(), b"").decode("latin-1")
+        if not _VALID_REQUEST_ID.fullmatch(request_id):
+            request_id = uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []),
+                                      (REQUEST_ID_HEADER.encode(), request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            # The router stores the matched route in the scope
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.labels(scope["method"], route, str(status)).observe(time.perf_counter() - start)
+            request_id_var.reset(token)
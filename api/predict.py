@@ -1,34 +1,94 @@
-from ultralytics import YOLO
-import os
-import glob
+import logging
+
+import numpy as np
+
+from registry import registry, DEFAULT_MODEL
+from backends import to_detections
+
+CONFIDENCE_THRESHOLD = 0.5
+
+logger = logging.getLogger("api.predict")
+
+
+def extract_detected_items(detections, letterbox=None) -> list:
+    """
+    Convert the detections for one image into the list of detected items returned by the API.
+
+    Args:
+        detections (Detections): Backend output for one image.
+        letterbox (Letterbox): Geometry of a pre-resized input, used to report boxes in
+            original image pixels. None when the model saw the original image.
+    """
+    boxes = detections.boxes
+    if letterbox is not None:
+        boxes = letterbox.to_original(boxes)
+    # Convert whole arrays to Python values once instead of per element
+    names = detections.names
+    return [
+        {
+            "item": names[class_id],
+            "confidence": round(confidence, 2),
+            "box": xyxy
+        }
+        for xyxy, confidence, class_id in zip(
+            np.round(np.asarray(boxes, dtype=np.float64), 1).tolist(),
+            np.asarray(detections.scores, dtype=np.float64).tolist(),
+            np.asarray(detections.class_ids, dtype=np.int64).tolist(),
+        )
+    ]
+
+
+def run_model(sources: list, save: bool = False, imgsz: int = None, model_name: str = DEFAULT_MODEL) -> list:
+    """
+    Run a single model call over several images.
+
+    Args:
+        sources (list): Image paths or BGR arrays to analyse together.
+        save (bool): Let ultralytics write annotated copies under runs/detect.
+        imgsz (int): Inference size; defaults to the size the model was trained with.
+        model_name (str): Registry name of the model to use.
+
+    Returns:
+        list: One `Detections` per source, whichever backend served the model.
+    """
+    logger.debug("🔍 Running batched detection on %d image(s)", len(sources))
+    kwargs = {"imgsz": imgsz} if imgsz else {}
+    # ultralytics prints a line per image unless told not to
+    results = registry.get(model_name).predict(source=sources, conf=CONFIDENCE_THRESHOLD, save=save,
+                                               verbose=logger.isEnabledFor(logging.DEBUG), **kwargs)
+    return to_detections(results)
+
+
+def predict_batch(sources: list, save: bool = False) -> list:
+    """
+    Run a single model call over several images.
+
+    Args:
+        sources (list): Image paths or BGR arrays to analyse together.
+        save (bool): Let ultralytics write annotated copies under runs/detect.
+
+    Returns:
+        list: One list of detected items per source, in the same order.
+    """
+    results = run_model(sources, save=save)
+    return [extract_detected_items(result) for result in results]
 
-# ==========================
-# 🔧 Load your trained model
-# ==========================
-model = YOLO("models/cstam.pt")
 
 def predict_meal(image_path: str) -> list:
     """
     Predict meal items from image and return detected items.
     """
-    print(f"🔍 Running detection on: {image_path}")
+    logger.debug("🔍 Running detection on: %s", image_path)
     try:
-        results = model.predict(source=image_path, conf=0.5, save=True)
-        print(f"✅ Detection done!")
+        results = to_detections(registry.get().predict(source=image_path, conf=CONFIDENCE_THRESHOLD, save=True))
+        logger.debug("✅ Detection done!")
     except Exception as e:
-        print(f"❌ Prediction failed: {e}")
+        logger.error("❌ Prediction failed: %s", e)
         return []
 
     # Extract detected items
     detected_items = []
     for result in results:
-        for box in result.boxes:
-            class_id = int(box.cls.item())
-            class_name = result.names[class_id]
-            confidence = box.conf.item()
-            detected_items.append({
-                "item": class_name,
-                "confidence": round(confidence, 2)
-            })
+        detected_items.extend(extract_detected_items(result))
 
     return detected_items
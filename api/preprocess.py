@@ -0,0 +1,120 @@
+import math
+import os
+from functools import lru_cache
+from typing import NamedTuple, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from images import BufferReader
+
+# Square input size the detector was exported/trained with
+MODEL_INPUT_SIZE = int(os.getenv("MODEL_INPUT_SIZE", "640"))
+PAD_VALUE = 114  # Same grey ultralytics uses for letterbox padding
+
+# EXIF orientations that swap width and height
+_TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+class Letterbox(NamedTuple):
+    """Geometry needed to map boxes from model input space back to the original image."""
+    scale: float
+    pad_x: int
+    pad_y: int
+    orig_width: int
+    orig_height: int
+
+    def to_original(self, boxes: np.ndarray) -> np.ndarray:
+        """
+        Map xyxy boxes from the letterboxed image to original image pixels.
+
+        Args:
+            boxes (np.ndarray): Nx4 array of [x1, y1, x2, y2] in model input space.
+        """
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4).copy()
+        boxes[:, [0, 2]] = (boxes[:, [0, 2]] - self.pad_x) / self.scale
+        boxes[:, [1, 3]] = (boxes[:, [1, 3]] - self.pad_y) / self.scale
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, self.orig_width)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, self.orig_height)
+        return boxes
+
+
+@lru_cache(maxsize=256)
+def letterbox_params(orig_width: int, orig_height: int, imgsz: int) -> Tuple[Letterbox, Tuple[int, int]]:
+    """
+    Compute (and cache) letterbox geometry for an image size. Phone uploads come in a
+    handful of resolutions, so this is almost always a cache hit.
+
+    Returns:
+        Tuple[Letterbox, Tuple[int, int]]: Letterbox parameters and the resized (width, height).
+    """
+    scale = min(imgsz / orig_width, imgsz / orig_height)
+    new_width = max(1, round(orig_width * scale))
+    new_height = max(1, round(orig_height * scale))
+    pad_x = (imgsz - new_width) // 2
+    pad_y = (imgsz - new_height) // 2
+    return Letterbox(scale, pad_x, pad_y, orig_width, orig_height), (new_width, new_height)
+
+
+class Preprocessor:
+    """
+    Decode an upload directly at (roughly) model resolution and letterbox it.
+
+    The header is read first to get the dimensions; JPEGs are then decoded with
+    `Image.draft`, letting libjpeg downscale by 1/2, 1/4 or 1/8 during decoding
+    instead of materialising the full-resolution photo. The result is resized to fit
+    `imgsz` and padded to an `imgsz` x `imgsz` square so the detector does no further
+    resizing.
+
+    Args:
+        imgsz (int): Model input size.
+    """
+
+    def __init__(self, imgsz: int = MODEL_INPUT_SIZE):
+        self.imgsz = imgsz
+
+    def __call__(self, data) -> Tuple[np.ndarray, Letterbox]:
+        """
+        Args:
+            data (bytes-like): Encoded image.
+
+        Returns:
+            Tuple[np.ndarray, Letterbox]: imgsz x imgsz BGR array and its letterbox geometry.
+        """
+        with Image.open(BufferReader(data)) as img:
+            width, height = img.size
+            orientation = img.getexif().get(0x0112, 1)
+            if orientation in _TRANSPOSED_ORIENTATIONS:
+                width, height = height, width
+            letterbox, new_size = letterbox_params(width, height, self.imgsz)
+
+            # Draft only ever decodes at >= the requested size
+            ratio = letterbox.scale
+            img.draft("RGB", (math.ceil(img.width * ratio), math.ceil(img.height * ratio)))
+            img = ImageOps.exif_transpose(img).convert("RGB")
+            if img.size != new_size:
+                img = img.resize(new_size, Image.BILINEAR)
+
+        return _pad(np.asarray(img)[:, :, ::-1], letterbox, self.imgsz), letterbox
+
+
+def letterbox_array(image: np.ndarray, imgsz: int = MODEL_INPUT_SIZE) -> Tuple[np.ndarray, Letterbox]:
+    """
+    Letterbox an already decoded BGR array to an `imgsz` x `imgsz` square.
+    Arrays that already have the target shape are returned unchanged.
+    """
+    height, width = image.shape[:2]
+    letterbox, new_size = letterbox_params(width, height, imgsz)
+    if (width, height) == (imgsz, imgsz):
+        return image, letterbox
+    if (width, height) != new_size:
+        resized = Image.fromarray(image[:, :, ::-1]).resize(new_size, Image.BILINEAR)
+        image = np.asarray(resized)[:, :, ::-1]
+    return _pad(image, letterbox, imgsz), letterbox
+
+
+def _pad(image: np.ndarray, letterbox: Letterbox, imgsz: int) -> np.ndarray:
+    canvas = np.full((imgsz, imgsz, 3), PAD_VALUE, dtype=np.uint8)
+    height, width = image.shape[:2]
+    canvas[letterbox.pad_y:letterbox.pad_y + height, letterbox.pad_x:letterbox.pad_x + width] = image
+    return canvas
@@ -0,0 +1,152 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from backends import load_model
+
+DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "default")
+# Comma separated name=path pairs, e.g. "default=models/cstam.pt,v2=models/cstam_v2.pt"
+MODELS = os.getenv("MODELS", f"{DEFAULT_MODEL}=models/cstam.pt")
+
+logger = logging.getLogger("api.registry")
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _parameter_bytes(model) -> Optional[int]:
+    try:
+        module = model.model
+        tensors = list(module.parameters()) + list(module.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+    except Exception:
+        return None
+
+
+class _Entry:
+    def __init__(self, path: str):
+        self.path = path
+        self.model = None
+        self.version = None
+        self.lock = threading.Lock()
+        self.load_seconds = None
+        self.rss_delta = None
+        self.parameter_bytes = None
+        self.loads = 0
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of named detection models.
+
+    Each model is loaded lazily on first use and shared by every caller in the
+    process. `reload` loads replacement weights next to the live model and swaps
+    them in once ready, so in-flight requests finish on the old weights.
+
+    Args:
+        loader (Callable): Builds a model from a weights path.
+    """
+
+    def __init__(self, loader: Callable = load_model):
+        self.loader = loader
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, path: str) -> None:
+        with self._lock:
+            if name in self._entries:
+                self._entries[name].path = path
+            else:
+                self._entries[name] = _Entry(path)
+
+    def get(self, name: str = DEFAULT_MODEL):
+        entry = self._entry(name)
+        if entry.model is None:
+            with entry.lock:
+                if entry.model is None:
+                    self._load(entry, entry.path)
+        return entry.model
+
+    def version(self, name: str = DEFAULT_MODEL) -> str:
+        """Identifier that changes whenever different weights are served under `name`."""
+        entry = self._entry(name)
+        if entry.version is None:
+            self.get(name)
+        return entry.version
+
+    def warmup(self, name: str = DEFAULT_MODEL, imgsz: int = 640) -> float:
+        """
+        Run one dummy inference so lazy CUDA/kernel initialisation is paid up front.
+
+        Returns:
+            float: Warm-up duration in seconds.
+        """
+        model = self.get(name)
+        start = time.perf_counter()
+        model.predict(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, verbose=False)
+        return time.perf_counter() - start
+
+    def reload(self, name: str = DEFAULT_MODEL, imgsz: int = 640) -> dict:
+        """
+        Re-read the weights registered for `name` (e.g. after the file was replaced) and hot-swap them in.
+        """
+        entry = self._entry(name)
+        with entry.lock:
+            self._load(entry, entry.path, warmup_imgsz=imgsz)
+        return self.stats()[name]
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                "path": entry.path,
+                "loaded": entry.model is not None,
+                "version": entry.version,
+                "loads": entry.loads,
+                "load_seconds": entry.load_seconds,
+                "parameter_mb": entry.parameter_bytes / 1e6 if entry.parameter_bytes else None,
+                "rss_delta_mb": entry.rss_delta / 1e6 if entry.rss_delta is not None else None,
+            }
+            for name, entry in self._entries.items()
+        }
+
+    def _entry(self, name: str) -> _Entry:
+        try:
+            return self._entries[name]
+        except KeyError:
+            raise KeyError(f"Unknown model: {name}")
+
+    def _load(self, entry: _Entry, path: str, warmup_imgsz: Optional[int] = None) -> None:
+        logger.info("📦 Loading model weights from %s", path)
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        model = self.loader(path)
+        if warmup_imgsz:
+            model.predict(np.zeros((warmup_imgsz, warmup_imgsz, 3), dtype=np.uint8),
+                          imgsz=warmup_imgsz, verbose=False)
+        entry.load_seconds = time.perf_counter() - start
+        rss_after = _rss_bytes()
+        entry.rss_delta = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+        entry.parameter_bytes = _parameter_bytes(model)
+        entry.loads += 1
+
+        # Swap only once the new model is fully ready
+        entry.path = path
+        mtime = os.path.getmtime(path) if os.path.exists(path) else 0
+        entry.version = f"{path}@{mtime:.0f}#{entry.loads}"
+        entry.model = model
+        logger.info("✅ Model loaded in %.2fs", entry.load_seconds)
+
+
+registry = ModelRegistry()
+for _pair in filter(None, MODELS.split(",")):
+    _name, _, _path = _pair.partition("=")
+    registry.register(_name.strip(), _path.strip())
@@ -0,0 +1,96 @@
+"""
+Run the meal detection API in one or more worker processes.
+
+With several workers the default model is loaded and warmed up once, in this process,
+before the workers are forked (see common/prefork.py): its weights and everything
+PyTorch initialised on the first inference are shared copy-on-write instead of loaded
+once per worker, and the workers share one listening socket. Everything else in
+main.py (caches, inference queue, background writer) is created in each worker.
+onnxruntime and OpenVINO models are loaded by each worker.
+
+Usage (from the api directory):
+    python serve.py --workers 4 --port 8000
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+import uvicorn
+
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+
+logger = logging.getLogger("api.serve")
+
+
+def limit_threads(threads: int):
+    """Size the PyTorch and OpenCV thread pools, of those already imported."""
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+    if "cv2" in sys.modules:
+        sys.modules["cv2"].setNumThreads(threads)
+
+
+def preload():
+    """Load and warm up the default model in this process, if its backend can be forked."""
+    from backends import INFERENCE_BACKEND
+    from preprocess import MODEL_INPUT_SIZE
+    from registry import DEFAULT_MODEL, registry
+
+    path = registry.stats()[DEFAULT_MODEL]["path"]
+    if INFERENCE_BACKEND != "ultralytics" or not path.endswith(".pt"):
+        logger.info("Not preloading %s: each worker loads its own model", path)
+        return
+    registry.get(DEFAULT_MODEL)
+    limit_threads(1)  # Before the first inference starts a pool
+    seconds = registry.warmup(DEFAULT_MODEL, imgsz=MODEL_INPUT_SIZE)
+    logger.info("Preloaded %s for the workers (warm-up %.2fs)", path, seconds)
+    # Share the code main.py runs on too; main.py itself creates per-worker state, so it is imported by the workers
+    import fastapi, PIL.Image, cv2  # noqa: F401,E401
+    import cache, food_catalog, images, inference, storage, uploads  # noqa: F401,E401
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("API_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=API_WORKERS)
+    args = parser.parse_args()
+
+    if args.workers <= 1:
+        uvicorn.run("main:app", host=args.host, port=args.port)
+        return
+
+    # Each worker writes its metrics to this directory and /metrics adds them up;
+    # must be set before prometheus_client is imported
+    metrics_dir = None
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="meal-api-metrics-")
+
+    from observability import configure_logging
+    from common.prefork import run_workers
+
+    configure_logging()
+    preload()
+    config = uvicorn.Config("main:app", host=args.host, port=args.port)
+    sock = config.bind_socket()
+
+    def serve(index: int):
+        uvicorn.Server(config).run(sockets=[sock])
+
+    def worker_exited(pid: int):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
+
+    try:
+        run_workers(args.workers, serve, limit_threads, on_exit=worker_exited)
+    finally:
+        sock.close()
+        if metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
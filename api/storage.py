@@ -0,0 +1,113 @@
+import glob
+import logging
+import os
+import queue
+import threading
+
+import numpy as np
+from PIL import Image
+
+from observability import span
+
+# Optional persistence of uploads, disabled by default so nothing grows on disk
+PERSIST_ORIGINALS = os.getenv("PERSIST_ORIGINALS", "false").lower() == "true"
+PERSIST_ANNOTATED = os.getenv("PERSIST_ANNOTATED", "false").lower() == "true"
+ORIGINALS_DIR = os.getenv("ORIGINALS_DIR", "data")
+ANNOTATED_DIR = os.getenv("ANNOTATED_DIR", os.path.join("runs", "annotated"))
+PERSIST_MAX_FILES = int(os.getenv("PERSIST_MAX_FILES", "1000"))
+PERSIST_QUEUE_SIZE = int(os.getenv("PERSIST_QUEUE_SIZE", "32"))
+
+logger = logging.getLogger("api.storage")
+
+
+class ImageSink:
+    """
+    Writes uploaded originals and annotated detections to disk from a background thread.
+
+    Writes never block the request path: when the queue is full the image is dropped.
+    Each directory keeps at most `max_files` images, oldest removed first.
+
+    Args:
+        originals (bool): Persist the uploaded image bytes.
+        annotated (bool): Persist the image with detection boxes drawn on it.
+        max_files (int): Retention limit per directory (0 disables pruning).
+    """
+
+    def __init__(
+        self,
+        originals: bool = PERSIST_ORIGINALS,
+        annotated: bool = PERSIST_ANNOTATED,
+        originals_dir: str = ORIGINALS_DIR,
+        annotated_dir: str = ANNOTATED_DIR,
+        max_files: int = PERSIST_MAX_FILES,
+        queue_size: int = PERSIST_QUEUE_SIZE,
+    ):
+        self.originals = originals
+        self.annotated = annotated
+        self.originals_dir = originals_dir
+        self.annotated_dir = annotated_dir
+        self.max_files = max_files
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._thread = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.originals or self.annotated
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="image-sink", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def save_original(self, filename: str, data: bytes):
+        if self.originals:
+            self._enqueue(self._write_bytes, os.path.join(self.originals_dir, filename), data)
+
+    def save_annotated(self, filename: str, image: np.ndarray):
+        """Queue an annotated BGR array (e.g. `result.plot()`) for writing."""
+        if self.annotated:
+            self._enqueue(self._write_array, os.path.join(self.annotated_dir, filename), image)
+
+    def _enqueue(self, writer, path, payload):
+        try:
+            self._queue.put_nowait((writer, path, payload))
+        except queue.Full:
+            logger.warning("⚠️ Persistence queue full, dropping %s", path)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            writer, path, payload = job
+            try:
+                with span("file_io"):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    writer(path, payload)
+                    self._prune(os.path.dirname(path))
+            except Exception as e:
+                logger.warning("⚠️ Failed to persist %s: %s", path, e)
+
+    @staticmethod
+    def _write_bytes(path, data):
+        with open(path, "wb") as f:
+            f.write(data)
+
+    @staticmethod
+    def _write_array(path, image):
+        Image.fromarray(image[:, :, ::-1]).save(path)
+
+    def _prune(self, directory):
+        if self.max_files <= 0:
+            return
+        files = sorted(glob.glob(os.path.join(directory, "meal_*")), key=os.path.getmtime)
+        for path in files[:-self.max_files]:
+            os.remove(path)
@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+from backends import Detections, OnnxDetector, nms, postprocess
+from preprocess import letterbox_params
+
+
+def raw_prediction(rows, num_classes=3):
+    """YOLOv8 output (4 + num_classes, anchors) from (cx, cy, w, h, class_id, score) rows."""
+    prediction = np.zeros((4 + num_classes, len(rows)), dtype=np.float32)
+    for anchor, (cx, cy, w, h, class_id, score) in enumerate(rows):
+        prediction[:4, anchor] = (cx, cy, w, h)
+        prediction[4 + class_id, anchor] = score
+    return prediction
+
+
+class FakeSession:
+    """Stands in for an onnxruntime session, returning a fixed raw output per image."""
+
+    def __init__(self, prediction):
+        self.prediction = prediction
+        self.batches = []
+
+    def run(self, outputs, feeds):
+        batch = next(iter(feeds.values()))
+        self.batches.append(batch.shape)
+        return [np.stack([self.prediction] * len(batch))]
+
+
+def fake_detector(prediction, imgsz=640):
+    detector = OnnxDetector.__new__(OnnxDetector)
+    detector.session = FakeSession(prediction)
+    detector.input_name = "images"
+    detector.dynamic_batch = True
+    detector.names = {0: "rice", 1: "salad", 2: "chicken"}
+    detector.imgsz = imgsz
+    return detector
+
+
+def test_nms_keeps_best_of_overlapping_boxes():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [50, 50, 60, 60]], dtype=np.float32)
+    scores = np.array([0.6, 0.9, 0.8], dtype=np.float32)
+    assert nms(boxes, scores, 0.5).tolist() == [1, 2]
+
+
+def test_nms_keeps_boxes_below_iou_threshold():
+    boxes = np.array([[0, 0, 10, 10], [5, 0, 15, 10]], dtype=np.float32)  # IoU 1/3
+    scores = np.array([0.9, 0.8], dtype=np.float32)
+    assert nms(boxes, scores, 0.5).tolist() == [0, 1]
+    assert nms(boxes, scores, 0.3).tolist() == [0]
+
+
+def test_nms_of_no_boxes():
+    keep = nms(np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32), 0.5)
+    assert keep.dtype == np.int64 and keep.size == 0
+
+
+def test_postprocess_decodes_centre_boxes_and_filters_by_confidence():
+    prediction = raw_prediction([(100, 200, 40, 60, 1, 0.9), (300, 300, 20, 20, 0, 0.2)])
+    boxes, scores, class_ids = postprocess(prediction, conf=0.5)
+    np.testing.assert_allclose(boxes, [[80, 170, 120, 230]])
+    np.testing.assert_allclose(scores, [0.9])
+    assert class_ids.tolist() == [1]
+
+
+def test_postprocess_suppresses_overlaps_within_a_class_only():
+    prediction = raw_prediction([
+        (100, 100, 50, 50, 0, 0.9),
+        (102, 101, 50, 50, 0, 0.8),  # Same class, overlapping: suppressed
+        (101, 100, 50, 50, 2, 0.7),  # Other class, overlapping: kept
+    ])
+    boxes, scores, class_ids = postprocess(prediction, conf=0.5)
+    np.testing.assert_allclose(scores, [0.9, 0.7])
+    assert class_ids.tolist() == [0, 2]
+
+
+def test_postprocess_caps_detections():
+    prediction = raw_prediction([(60 * i + 30, 30, 20, 20, 0, 0.5 + i / 100) for i in range(10)])
+    _, scores, _ = postprocess(prediction, conf=0.25, max_det=3)
+    np.testing.assert_allclose(scores, [0.59, 0.58, 0.57])
+
+
+def test_postprocess_with_nothing_above_confidence():
+    boxes, scores, class_ids = postprocess(raw_prediction([(100, 100, 10, 10, 0, 0.1)]), conf=0.5)
+    assert boxes.shape == (0, 4) and scores.size == 0 and class_ids.size == 0
+
+
+@pytest.mark.parametrize("width, height", [(1280, 960), (960, 1280), (640, 640)])
+def test_onnx_detector_reports_boxes_in_original_pixels(width, height):
+    letterbox, _ = letterbox_params(width, height, 640)
+    expected = np.array([[width * 0.25, height * 0.5, width * 0.75, height]], dtype=np.float32)
+    # The same box in model input space, as centre, size
+    x1, y1, x2, y2 = expected[0] * letterbox.scale + [letterbox.pad_x, letterbox.pad_y] * 2
+    detector = fake_detector(raw_prediction([((x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1, 2, 0.95)]))
+
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    [detections] = detector.predict(image, conf=0.5)
+
+    assert isinstance(detections, Detections)
+    np.testing.assert_allclose(detections.boxes, expected, atol=0.5)
+    assert detections.class_ids.tolist() == [2]
+    assert detections.image is image
+    assert detector.session.batches == [(1, 3, 640, 640)]
+
+
+def test_onnx_detector_runs_a_list_as_one_batch():
+    detector = fake_detector(raw_prediction([(320, 320, 100, 100, 0, 0.9)]))
+    images = [np.zeros((960, 1280, 3), dtype=np.uint8), np.zeros((1280, 960, 3), dtype=np.uint8)]
+    results = detector.predict(images, conf=0.5)
+    assert detector.session.batches == [(2, 3, 640, 640)]
+    # The same model-space box maps to different places in differently shaped images
+    np.testing.assert_allclose(results[0].boxes, [[540, 380, 740, 580]], atol=0.5)
+    np.testing.assert_allclose(results[1].boxes, [[380, 540, 580, 740]], atol=0.5)
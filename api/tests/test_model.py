@@ -0,0 +1,70 @@
+import numpy as np
+
+from backends import Detections
+from model import FOOD_DATABASE, NutritionTable, summarize_detections
+
+
+def per_box_summary(detections, database):
+    """The per-box loop detect_meals used before summarize_detections."""
+    detected_items = []
+    total_calories = total_protein = total_carbs = total_fat = 0
+    for class_id, confidence in zip(detections.class_ids, detections.scores):
+        class_id = int(class_id)
+        confidence = float(confidence)
+        if class_id in database:
+            food_data = database[class_id]
+            detected_items.append({
+                "name": food_data["name"],
+                "confidence": confidence,
+                "calories": food_data["calories"],
+                "protein": food_data["protein"],
+                "carbs": food_data["carbs"],
+                "fat": food_data["fat"]
+            })
+            total_calories += food_data["calories"]
+            total_protein += food_data["protein"]
+            total_carbs += food_data["carbs"]
+            total_fat += food_data["fat"]
+    return detected_items, total_calories, total_protein, total_carbs, total_fat
+
+
+def detections(class_ids, seed=0):
+    scores = np.random.default_rng(seed).uniform(0.25, 1, len(class_ids)).astype(np.float32)
+    return Detections(boxes=np.zeros((len(class_ids), 4), dtype=np.float32), scores=scores,
+                      class_ids=np.asarray(class_ids, dtype=np.int64), names={})
+
+
+def typed(value):
+    """Value paired with its type, since 256 == 256.0 would hide a type change."""
+    if isinstance(value, dict):
+        return {k: typed(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [typed(v) for v in value]
+    return value, type(value)
+
+
+def test_summary_matches_per_box_loop_exactly():
+    images = [
+        detections([0, 0, 3, 7]),  # Integral calories, float protein/fat, an unknown class
+        detections([0, 3, 0], seed=1),  # Integral carbs only
+        detections([1, 2, 1, 2, 1], seed=2),  # Float sums accumulated in detection order
+        detections([9, 12]),  # Nothing known: all totals stay int 0
+        detections([]),
+    ]
+
+    summaries = summarize_detections(images)
+
+    assert len(summaries) == len(images)
+    for summary, image in zip(summaries, images):
+        items, *totals = per_box_summary(image, FOOD_DATABASE)
+        assert typed(summary["items"]) == typed(items)
+        assert typed([summary[f"total_{n}"] for n in ("calories", "protein", "carbs", "fat")]) == typed(totals)
+
+
+def test_integral_table_keeps_int_totals():
+    table = NutritionTable({0: {"name": "Bread", "calories": 256, "protein": 8, "carbs": 49, "fat": 3}})
+
+    summary, = summarize_detections([detections([0])], table)
+
+    assert typed(summary["total_calories"]) == (256, int)
+    assert typed(summary["total_fat"]) == (3, int)
@@ -0,0 +1,100 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from preprocess import Preprocessor, letterbox_array, letterbox_params
+
+
+def to_model_space(boxes, letterbox):
+    boxes = np.asarray(boxes, dtype=np.float32).copy()
+    boxes[:, [0, 2]] = boxes[:, [0, 2]] * letterbox.scale + letterbox.pad_x
+    boxes[:, [1, 3]] = boxes[:, [1, 3]] * letterbox.scale + letterbox.pad_y
+    return boxes
+
+
+def jpeg(width, height, orientation=None):
+    image = Image.new("RGB", (width, height), (200, 120, 40))
+    exif = Image.Exif()
+    if orientation is not None:
+        exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("width, height", [(640, 640), (1280, 960), (960, 1280), (4032, 3024), (300, 200)])
+def test_letterbox_params_fit_and_centre(width, height):
+    letterbox, (new_width, new_height) = letterbox_params(width, height, 640)
+    assert max(new_width, new_height) == 640
+    assert new_width <= 640 and new_height <= 640
+    assert letterbox.pad_x == (640 - new_width) // 2
+    assert letterbox.pad_y == (640 - new_height) // 2
+    assert (letterbox.orig_width, letterbox.orig_height) == (width, height)
+
+
+def test_landscape_pads_vertically_and_portrait_horizontally():
+    landscape, _ = letterbox_params(1280, 960, 640)
+    portrait, _ = letterbox_params(960, 1280, 640)
+    assert (landscape.pad_x, landscape.pad_y) == (0, 80)
+    assert (portrait.pad_x, portrait.pad_y) == (80, 0)
+    assert landscape.scale == portrait.scale == 0.5
+
+
+@pytest.mark.parametrize("width, height", [(1280, 960), (960, 1280), (4032, 3024), (300, 200)])
+def test_to_original_round_trips_boxes(width, height):
+    letterbox, _ = letterbox_params(width, height, 640)
+    boxes = np.array([[0, 0, width, height], [width * 0.25, height * 0.1, width * 0.5, height * 0.9]])
+    np.testing.assert_allclose(letterbox.to_original(to_model_space(boxes, letterbox)), boxes, atol=1e-2)
+
+
+def test_to_original_clips_boxes_in_the_padding():
+    letterbox, _ = letterbox_params(1280, 960, 640)
+    restored = letterbox.to_original(np.array([[-10, 0, 700, 640]]))
+    np.testing.assert_allclose(restored, [[0, 0, 1280, 960]])
+
+
+def test_to_original_accepts_no_boxes():
+    letterbox, _ = letterbox_params(1280, 960, 640)
+    assert letterbox.to_original(np.zeros((0, 4))).shape == (0, 4)
+
+
+def test_letterbox_array_places_image_inside_padding():
+    image = np.full((960, 1280, 3), 7, dtype=np.uint8)
+    canvas, letterbox = letterbox_array(image, 640)
+    assert canvas.shape == (640, 640, 3)
+    assert (canvas[letterbox.pad_y:640 - letterbox.pad_y] == 7).all()
+    assert (canvas[:letterbox.pad_y] == 114).all()
+
+
+def test_letterbox_array_keeps_model_sized_arrays():
+    image = np.zeros((640, 640, 3), dtype=np.uint8)
+    canvas, letterbox = letterbox_array(image, 640)
+    assert canvas is image
+    assert (letterbox.scale, letterbox.pad_x, letterbox.pad_y) == (1.0, 0, 0)
+
+
+def test_preprocessor_matches_letterbox_params():
+    canvas, letterbox = Preprocessor(640)(jpeg(1280, 960))
+    assert canvas.shape == (640, 640, 3)
+    assert letterbox == letterbox_params(1280, 960, 640)[0]
+
+
+@pytest.mark.parametrize("orientation", [5, 6, 7, 8])
+def test_preprocessor_swaps_size_of_exif_rotated_images(orientation):
+    # Stored 1280 x 960, displayed (and reported) 960 x 1280
+    canvas, letterbox = Preprocessor(640)(jpeg(1280, 960, orientation))
+    assert (letterbox.orig_width, letterbox.orig_height) == (960, 1280)
+    assert (letterbox.pad_x, letterbox.pad_y) == (80, 0)
+    # The rotated image fills the unpadded columns
+    assert (canvas[:, :letterbox.pad_x] == 114).all()
+    assert not (canvas[:, letterbox.pad_x:640 - letterbox.pad_x] == 114).all()
+
+    boxes = np.array([[100, 900, 500, 1200]], dtype=np.float32)
+    np.testing.assert_allclose(letterbox.to_original(to_model_space(boxes, letterbox)), boxes, atol=1e-2)
+
+
+def test_preprocessor_keeps_size_of_upright_exif_orientation():
+    _, letterbox = Preprocessor(640)(jpeg(1280, 960, orientation=3))
+    assert (letterbox.orig_width, letterbox.orig_height) == (1280, 960)
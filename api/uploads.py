@@ -0,0 +1,143 @@
+import os
+from typing import AsyncIterator, Optional
+
+from starlette.requests import Request
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds MAX_UPLOAD_BYTES."""
+
+
+class UploadBuffer:
+    """
+    Growable byte buffer filled chunk by chunk.
+
+    When the final size is known up front (Content-Length) the whole upload lands in a
+    single allocation; otherwise capacity doubles as chunks arrive.
+    """
+
+    def __init__(self, size_hint: Optional[int] = None, max_bytes: int = MAX_UPLOAD_BYTES):
+        if size_hint is not None and size_hint > max_bytes:
+            raise UploadTooLargeError(f"Upload exceeds {max_bytes} bytes")
+        self.max_bytes = max_bytes
+        self._data = bytearray(size_hint or 64 * 1024)
+        self._size = 0
+
+    def write(self, chunk) -> None:
+        end = self._size + len(chunk)
+        if end > self.max_bytes:
+            raise UploadTooLargeError(f"Upload exceeds {self.max_bytes} bytes")
+        if end > len(self._data):
+            self._data.extend(bytes(max(end, 2 * len(self._data)) - len(self._data)))
+        self._data[self._size:end] = chunk
+        self._size = end
+
+    def getbuffer(self) -> memoryview:
+        """Zero-copy view over the bytes written so far."""
+        return memoryview(self._data)[:self._size]
+
+
+def _content_length(request: Request) -> Optional[int]:
+    value = request.headers.get("content-length")
+    return int(value) if value and value.isdigit() else None
+
+
+async def read_stream(chunks: AsyncIterator[bytes], size_hint: Optional[int] = None,
+                      max_bytes: int = MAX_UPLOAD_BYTES) -> memoryview:
+    """
+    Collect an async stream of chunks into one buffer.
+
+    Args:
+        chunks (AsyncIterator[bytes]): Body chunks, e.g. `request.stream()`.
+        size_hint (int): Expected total size, used to allocate the buffer once.
+        max_bytes (int): Hard limit on the accepted size.
+
+    Returns:
+        memoryview: The received bytes.
+    """
+    buffer = UploadBuffer(size_hint, max_bytes)
+    async for chunk in chunks:
+        buffer.write(chunk)
+    return buffer.getbuffer()
+
+
+async def read_raw_body(request: Request) -> memoryview:
+    """Read an `image/*` request body."""
+    return await read_stream(request.stream(), _content_length(request))
+
+
+async def read_multipart_file(request: Request, field: Optional[str] = None) -> memoryview:
+    """
+    Stream a multipart/form-data body and keep only the first file part.
+
+    The Content-Length of the whole body bounds the file size, so the file is written
+    into a single preallocated buffer without spooling to a temporary file.
+
+    Args:
+        request (Request): Incoming request.
+        field (str): Form field holding the image; any file part is accepted if None.
+
+    Returns:
+        memoryview: The file part's bytes.
+    """
+    _, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise ValueError("Missing multipart boundary")
+
+    buffer = UploadBuffer(_content_length(request))
+    state = {"header_field": b"", "header_value": b"", "disposition": b"", "selected": False, "done": False}
+
+    def on_part_begin():
+        state["disposition"] = b""
+
+    def on_header_field(data, start, end):
+        state["header_field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["header_value"] += data[start:end]
+
+    def on_header_end():
+        if state["header_field"].lower() == b"content-disposition":
+            state["disposition"] = state["header_value"]
+        state["header_field"] = b""
+        state["header_value"] = b""
+
+    def on_headers_finished():
+        _, options = parse_options_header(state["disposition"])
+        is_file = b"filename" in options
+        name = options.get(b"name", b"").decode("latin-1")
+        state["selected"] = is_file and not state["done"] and (field is None or name == field)
+
+    def on_part_data(data, start, end):
+        if state["selected"]:
+            buffer.write(memoryview(data)[start:end])
+
+    def on_part_end():
+        if state["selected"]:
+            state["done"] = True
+            state["selected"] = False
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+    })
+    async for chunk in request.stream():
+        parser.write(chunk)
+    parser.finalize()
+
+    if not state["done"]:
+        raise ValueError("No image file found in multipart body")
+    return buffer.getbuffer()
@@ -0,0 +1,123 @@
+"""
+Load test of the chatbot Agent websocket server against a local stub LLM.
+
+Starts ``FakeLLMServer`` and an ``Agent`` whose retriever is replaced by a synthetic
+one that blocks for ``--retrieval-ms`` (standing in for embedding + FAISS search),
+then runs N concurrent websocket clients that each ask ``--messages`` questions.
+With a non-blocking agent, throughput grows with the number of clients until the
+LLM concurrency limit is reached; a blocking agent stays at ~1 / LLM latency.
+
+Usage (from the repository root):
+    python benchmarks/agent_load.py --clients 1 4 16 64 --llm-latency-ms 300
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import time
+import zlib
+
+import numpy as np
+import websockets
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CHATBOT_DIR = os.path.abspath(os.path.join(BENCH_DIR, "..", "chatbot"))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_llm import FakeLLMServer  # noqa: E402
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class SyntheticRetriever:
+    """
+    Stand-in for processing.retriever: the same text always gets the same random
+    embedding, search returns fixed chunks, and each step blocks for half of `delay_ms`.
+    """
+
+    def __init__(self, delay_ms: float, dim: int = 384):
+        self.delay = delay_ms / 2000.0
+        self.dim = dim
+        self.version = 0
+        self.chunks = [
+            {"chunk_id": i, "source": f"synthetic.pdf#page={i + 1}", "text": f"Synthetic nutrition passage {i}."}
+            for i in range(5)
+        ]
+
+    def embed_query(self, query: str) -> np.ndarray:
+        time.sleep(self.delay)
+        rng = np.random.default_rng(zlib.crc32(query.strip().lower().encode()))
+        return rng.standard_normal(self.dim).astype(np.float32)
+
+    def search(self, embedding, top_k=5, query=None):
+        time.sleep(self.delay)
+        return self.chunks[:top_k]
+
+    def index_version(self):
+        return self.version
+
+
+def synthetic_retriever(delay_ms: float) -> SyntheticRetriever:
+    return SyntheticRetriever(delay_ms)
+
+
+async def run_clients(url: str, clients: int, messages: int):
+    latencies = []
+
+    async def client(client_id):
+        async with websockets.connect(url) as ws:
+            for i in range(messages):
+                start = time.perf_counter()
+                await ws.send(f"Client {client_id} question {i}: how much protein per day?")
+                await ws.recv()
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(clients)))
+    elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, np.percentile(latencies, 50) * 1000, np.percentile(latencies, 99) * 1000
+
+
+async def main_async(args):
+    llm = FakeLLMServer(latency_ms=args.llm_latency_ms).start()
+    os.environ["GROQ_BASE_URL"] = llm.base_url
+    os.environ.setdefault("GROQ_API_KEY", "test")
+    os.environ.setdefault("GROQ_MODEL", "fake-llm")
+    os.environ["LLM_MAX_CONCURRENCY"] = str(args.llm_concurrency)
+
+    sys.path.insert(0, CHATBOT_DIR)
+    from agent import Agent
+
+    agent = Agent(retriever=synthetic_retriever(args.retrieval_ms))
+    port = free_port()
+    server = asyncio.ensure_future(agent.start_server("127.0.0.1", port))
+    await asyncio.sleep(0.5)
+
+    url = f"ws://127.0.0.1:{port}"
+    print(f"Serial baseline (one request at a time): {1000 / (args.llm_latency_ms + args.retrieval_ms):.2f} msg/s")
+    for clients in args.clients:
+        throughput, p50, p99 = await run_clients(url, clients, args.messages)
+        print(f"clients={clients:<4} | {throughput:7.2f} msg/s | p50={p50:8.1f} ms | p99={p99:8.1f} ms")
+
+    server.cancel()
+    llm.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--messages", type=int, default=5, help="Messages per client")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--retrieval-ms", type=float, default=15)
+    parser.add_argument("--llm-concurrency", type=int, default=64)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
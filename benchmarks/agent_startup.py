@@ -0,0 +1,153 @@
+"""
+Startup cost of the chatbot retriever and agent.
+
+Builds a synthetic index of ``--vectors`` vectors with its metadata store, then, each
+in a fresh subprocess, measures:
+
+* import: ``import processing.retriever`` (loads nothing since the retriever is lazy);
+* load: ``Retriever.load()`` with the index read into memory, then memory-mapped;
+* first query: load, then the first ``retrieve_chunks``;
+* agent: seconds from spawning the agent until GET /health answers, and until
+  GET /ready reports the retriever loaded by the background warm-up.
+
+RSS is read from /proc/self/status after loading.
+
+``--embedder synthetic`` replaces the sentence-transformers model with a stand-in of
+the same dimension (no torch import), to measure everything else or to run offline.
+
+Usage (from the repository root):
+    python benchmarks/agent_startup.py --vectors 100000
+    python benchmarks/agent_startup.py --vectors 1000000 --embedder synthetic
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CHATBOT_DIR = os.path.abspath(os.path.join(BENCH_DIR, "..", "chatbot"))
+sys.path.insert(0, CHATBOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from agent_load import free_port  # noqa: E402
+
+SETUP = r"""
+import os, sys, time, zlib
+start = time.perf_counter()
+sys.path.insert(0, {chatbot_dir!r})
+os.chdir({workdir!r})
+if {embedder!r} == "synthetic":
+    import numpy as np
+    import processing.embedder as embedder
+
+    class SyntheticModel:
+        def encode(self, texts, **kwargs):
+            return np.stack([np.random.default_rng(zlib.crc32(t.encode())).standard_normal(384) for t in texts])
+
+    embedder.load_model = lambda model_name=embedder.EMBEDDING_MODEL: SyntheticModel()
+"""
+
+PROBE = SETUP + r"""
+import json
+import processing.retriever as retriever_module
+if {embedder!r} == "synthetic":
+    retriever_module.load_model = embedder.load_model
+imported = time.perf_counter()
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+
+retriever = retriever_module.Retriever(mmap={mmap})
+if {mode!r} != "import":
+    retriever.load()
+loaded = time.perf_counter()
+if {mode!r} == "first_query":
+    retriever.retrieve_chunks("How much protein is in lentils?")
+print(json.dumps({{"import_s": imported - start, "load_s": loaded - imported,
+                  "query_s": time.perf_counter() - loaded, "rss_mb": rss_mb()}}))
+"""
+
+AGENT = SETUP + r"""
+import asyncio
+import agent
+asyncio.run(agent.Agent().start_server("127.0.0.1", {port}))
+"""
+
+
+def build_corpus(workdir: str, vectors: int, dim: int = 384):
+    from utils.metadata_store import MetadataStore
+    from utils.vector_db_utils import build_faiss_index, write_index
+
+    embeddings = np.random.default_rng(0).standard_normal((vectors, dim)).astype("float32")
+    store = MetadataStore(os.path.join(workdir, "data", "embeddings", "metadata.db"))
+    ids = store.append({"chunk_id": i, "source": "synthetic.pdf#page=1", "text": f"passage {i} about protein"}
+                       for i in range(vectors))
+    store.close()
+    write_index(build_faiss_index(embeddings, "flat", ids=ids), os.path.join(workdir, "data", "embeddings", "index.faiss"))
+
+
+def probe(workdir: str, embedder: str, mode: str, mmap: bool) -> dict:
+    code = PROBE.format(chatbot_dir=CHATBOT_DIR, workdir=workdir, embedder=embedder, mode=mode, mmap=mmap)
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def agent_startup(workdir: str, embedder: str, timeout: float = 120):
+    port = free_port()
+    code = AGENT.format(chatbot_dir=CHATBOT_DIR, workdir=workdir, embedder=embedder, port=port)
+    env = dict(os.environ, GROQ_API_KEY=os.getenv("GROQ_API_KEY", "test"))
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", code], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    times = {}
+    try:
+        while len(times) < 2 and time.perf_counter() - start < timeout:
+            for path in ("/health", "/ready"):
+                if path in times:
+                    continue
+                try:
+                    urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=1)
+                    times[path] = time.perf_counter() - start
+                except (urllib.error.URLError, ConnectionError, OSError):
+                    pass
+            time.sleep(0.01)
+    finally:
+        process.terminate()
+        process.wait()
+    return times.get("/health"), times.get("/ready")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--embedder", choices=("model", "synthetic"), default="model")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        build_corpus(workdir, args.vectors)
+        print(f"=== {args.vectors} vectors, {args.embedder} embedder ===")
+        result = probe(workdir, args.embedder, "import", True)
+        print(f"import processing.retriever | {result['import_s'] * 1000:8.1f} ms | RSS {result['rss_mb']:7.1f} MB")
+        for mmap in (False, True):
+            name = "mmap" if mmap else "read"
+            result = probe(workdir, args.embedder, "load", mmap)
+            print(f"load ({name:<4})                 | {result['load_s'] * 1000:8.1f} ms | RSS {result['rss_mb']:7.1f} MB")
+            result = probe(workdir, args.embedder, "first_query", mmap)
+            print(f"load + first query ({name:<4})   | {(result['load_s'] + result['query_s']) * 1000:8.1f} ms "
+                  f"| first query {result['query_s'] * 1000:7.1f} ms")
+        health, ready = agent_startup(workdir, args.embedder)
+        fmt = lambda seconds: f"{seconds * 1000:8.1f} ms" if seconds is not None else "     n/a"  # noqa: E731
+        print(f"agent: /health after {fmt(health)} | /ready after {fmt(ready)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Recall@k versus query latency of the FAISS index types in chatbot/utils/vector_db_utils.py.
+
+Generates a synthetic corpus shaped like sentence embeddings (normalised vectors drawn
+around a few hundred topic centres), builds every index type with
+``build_faiss_index`` and compares it with the exact flat index. Queries are run one
+at a time, as the retriever does. Each configuration reports build time, index size
+and, for each nprobe / efSearch value, recall@k against the exact neighbours and the
+mean latency per query.
+
+Usage (from the repository root):
+    python benchmarks/ann_index.py --sizes 10000 100000 --nprobe 4 16 64 --ef-search 16 64 256
+    python benchmarks/ann_index.py --sizes 1000000 --types ivf_pq hnsw  # several GB of RAM
+"""
+import argparse
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+CHATBOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "chatbot"))
+sys.path.insert(0, CHATBOT_DIR)
+
+from utils.vector_db_utils import INDEX_TYPES, build_faiss_index, set_search_params  # noqa: E402
+
+
+def synthetic_corpus(size: int, dim: int, queries: int, topics: int = 256, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((topics, dim)).astype("float32")
+    corpus = centres[rng.integers(0, topics, size)] + 0.6 * rng.standard_normal((size, dim)).astype("float32")
+    corpus /= np.linalg.norm(corpus, axis=1, keepdims=True)
+    # Queries are perturbed corpus vectors, like questions phrased close to a passage
+    query = corpus[rng.integers(0, size, queries)] + 0.3 * rng.standard_normal((queries, dim)).astype("float32")
+    query /= np.linalg.norm(query, axis=1, keepdims=True)
+    return corpus, query.astype("float32")
+
+
+def search_one_at_a_time(index, queries, k):
+    results = np.empty((len(queries), k), dtype=np.int64)
+    start = time.perf_counter()
+    for i, q in enumerate(queries):
+        results[i] = index.search(q[None], k)[1][0]
+    return results, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def recall(found, truth):
+    k = truth.shape[1]
+    return np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--types", nargs="+", default=[t for t in INDEX_TYPES if t != "flat"], choices=INDEX_TYPES)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--threads", type=int, default=1, help="FAISS OpenMP threads (the retriever's per-query case is 1)")
+    args = parser.parse_args()
+    faiss.omp_set_num_threads(args.threads)
+
+    for size in args.sizes:
+        corpus, queries = synthetic_corpus(size, args.dim, args.queries)
+        flat = build_faiss_index(corpus, "flat")
+        truth, flat_ms = search_one_at_a_time(flat, queries, args.k)
+        print(f"\n=== {size} vectors x {args.dim} dims, recall@{args.k} ===")
+        print(f"{'flat':<9} | build {0:7.2f} s | {faiss.serialize_index(flat).nbytes / 2**20:8.1f} MB "
+              f"| exact        | recall=1.000 | {flat_ms:7.3f} ms/query")
+
+        for index_type in args.types:
+            start = time.perf_counter()
+            index = build_faiss_index(corpus, index_type)
+            build_s = time.perf_counter() - start
+            size_mb = faiss.serialize_index(index).nbytes / 2**20
+            if index_type == "hnsw":
+                settings = [("efSearch", ef, dict(ef_search=ef)) for ef in args.ef_search]
+            else:
+                settings = [("nprobe", n, dict(nprobe=n)) for n in args.nprobe]
+            for name, value, params in settings:
+                set_search_params(index, **params)
+                found, ms = search_one_at_a_time(index, queries, args.k)
+                print(f"{index_type:<9} | build {build_s:7.2f} s | {size_mb:8.1f} MB | {f'{name}={value}':<12} "
+                      f"| recall={recall(found, truth):.3f} | {ms:7.3f} ms/query ({flat_ms / ms:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Parity check and benchmark of the onnxruntime backend against the PyTorch path.
+
+Runs the same fixed image set through ultralytics (PyTorch eager) and through
+``OnnxDetector`` (onnxruntime + NumPy NMS), matches detections by class and IoU,
+and reports mean latency per image for both. The ONNX model is exported first when
+``--onnx`` does not exist. Exits with status 1 when the match rate is below
+``--min-match``.
+
+Usage (from the repository root):
+    python benchmarks/backend_parity.py --weights models/cstam.pt --images data
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+
+API_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "api"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from preprocess_parity import match  # noqa: E402
+
+
+def run(model, images, conf, imgsz, repeats):
+    from backends import to_detections
+    from predict import extract_detected_items
+
+    outputs = [extract_detected_items(d) for d in to_detections(model.predict(images, conf=conf, imgsz=imgsz, verbose=False))]
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for image in images:
+            model.predict([image], conf=conf, imgsz=imgsz, verbose=False)
+    elapsed = (time.perf_counter() - start) / (repeats * len(images))
+    return outputs, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights", default="models/cstam.pt", help="PyTorch weights (relative to api/)")
+    parser.add_argument("--onnx", default=None, help="ONNX model, exported from --weights if missing")
+    parser.add_argument("--int8", action="store_true", help="Export an INT8-quantized model")
+    parser.add_argument("--images", default="data", help="Directory of test images (relative to api/)")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--min-match", type=float, default=0.9)
+    args = parser.parse_args()
+
+    os.chdir(API_DIR)
+    sys.path.insert(0, API_DIR)
+    from ultralytics import YOLO
+    from backends import OnnxDetector, export_onnx
+    from images import load_image
+
+    onnx_path = args.onnx or os.path.splitext(args.weights)[0] + ("_int8.onnx" if args.int8 else ".onnx")
+    if not os.path.exists(onnx_path):
+        onnx_path = export_onnx(args.weights, args.imgsz, args.int8)
+
+    paths = sorted(p for ext in ("*.jpg", "*.jpeg", "*.png") for p in glob.glob(os.path.join(args.images, ext)))
+    images = []
+    for path in paths:
+        with open(path, "rb") as f:
+            images.append(load_image(f.read()))
+    if not images:
+        print("No images found")
+        return
+
+    torch_items, torch_latency = run(YOLO(args.weights), images, args.conf, args.imgsz, args.repeats)
+    onnx_items, onnx_latency = run(OnnxDetector(onnx_path), images, args.conf, args.imgsz, args.repeats)
+
+    total = sum(len(items) for items in torch_items)
+    matched = sum(match(ref, cand, 0.5) for ref, cand in zip(torch_items, onnx_items))
+    rate = matched / total if total else 1.0
+    print(f"🔥 PyTorch:     {torch_latency * 1000:7.1f} ms/image")
+    print(f"⚡ onnxruntime: {onnx_latency * 1000:7.1f} ms/image ({torch_latency / onnx_latency:.2f}x)")
+    print(f"✅ Match rate: {matched}/{total} = {rate:.1%}")
+    print(f"   Confidence deltas: max {max_conf_delta(torch_items, onnx_items):.3f}")
+    if rate < args.min_match:
+        sys.exit(1)
+
+
+def max_conf_delta(reference, candidate):
+    deltas = [
+        abs(r["confidence"] - c["confidence"])
+        for ref, cand in zip(reference, candidate)
+        for r, c in zip(sorted(ref, key=lambda d: -d["confidence"]), sorted(cand, key=lambda d: -d["confidence"]))
+    ]
+    return float(np.max(deltas)) if deltas else 0.0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Prompt size per turn of a long conversation, before and after bounded memory.
+
+Replays ``--turns`` questions with synthetic retrieved chunks (consecutive questions
+share some chunks, like follow-ups do) and counts prompt tokens with the agent's
+local tokenizer. The previous agent appended a full RAG system prompt and the user
+message every turn, so its prompt grows without limit; ``ConversationMemory`` keeps
+one current system prompt, recent turns and a short summary within the budget.
+
+Usage (from the repository root):
+    python benchmarks/conversation_memory.py --turns 40 --budget 6000
+"""
+import argparse
+import os
+import sys
+
+CHATBOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "chatbot"))
+sys.path.insert(0, CHATBOT_DIR)
+
+from memory import BASE_SYSTEM_PROMPT, ConversationMemory, count_tokens, format_chunk  # noqa: E402
+
+PASSAGE = (
+    "Whole grains such as couscous, bulgur and barley provide fibre, B vitamins and slow-release "
+    "carbohydrates. Pair them with legumes and vegetables to build a balanced plate. "
+)
+ANSWER = (
+    "A good rule of thumb is to fill half your plate with vegetables, a quarter with lean protein "
+    "and a quarter with whole grains, and to keep sweets and fried food for occasional treats. "
+) * 2
+
+
+def chunks_for_turn(turn: int, top_k: int = 5) -> list:
+    # Consecutive turns overlap by two chunks
+    return [
+        {"chunk_id": turn * 3 + i, "source": f"guide.pdf#page={turn * 3 + i}", "text": PASSAGE * 3}
+        for i in range(top_k)
+    ]
+
+
+def system_prompt(context: str, question: str) -> str:
+    sys.path.insert(0, CHATBOT_DIR)
+    from agent import Agent
+    return Agent.getSystemPrompt(None, context, question)
+
+
+def count_messages(messages) -> int:
+    return sum(count_tokens(m["content"]) + 4 for m in messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--budget", type=int, default=6000)
+    args = parser.parse_args()
+
+    legacy = [{"role": "system", "content": BASE_SYSTEM_PROMPT}]
+    memory = ConversationMemory(budget=args.budget)
+    legacy_total = bounded_total = 0
+    for turn in range(args.turns):
+        question = f"Question {turn}: is couscous a healthy choice for dinner?"
+        chunks = chunks_for_turn(turn)
+
+        context = "\n\n".join(format_chunk(c) for c in chunks)
+        legacy.append({"role": "system", "content": system_prompt(context, question)})
+        legacy.append({"role": "user", "content": question})
+        legacy_tokens = count_messages(legacy)
+        legacy.append({"role": "assistant", "content": ANSWER})
+
+        messages = memory.build(question, chunks, lambda ctx: system_prompt(ctx, question))
+        bounded_tokens = count_messages(messages)
+        memory.record(question, ANSWER)
+
+        legacy_total += legacy_tokens
+        bounded_total += bounded_tokens
+        if turn in (0, 1, 4, 9) or (turn + 1) % 10 == 0:
+            print(f"turn={turn + 1:<4} | stacked prompt={legacy_tokens:7d} tokens | bounded prompt={bounded_tokens:6d} "
+                  f"tokens (estimate {memory.last_prompt_tokens}, {len(memory.turns)} turns kept)")
+    print(f"total prompt tokens over {args.turns} turns: stacked={legacy_total} bounded={bounded_total} "
+          f"({legacy_total / bounded_total:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
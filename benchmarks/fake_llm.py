@@ -0,0 +1,157 @@
+"""
+Local stand-in for the Groq (OpenAI-compatible) chat completions API.
+
+Answers ``POST .../chat/completions`` after a configurable delay with a canned reply,
+so the chatbot can be load-tested without network access or an API key. Each request
+is served on its own thread, like a real provider handling concurrent calls. Requests
+with ``"stream": true`` get server-sent ``chat.completion.chunk`` events, one per word,
+with ``--latency-ms`` before the first one and ``--token-ms`` between the next ones;
+non-streaming requests are answered after the same total time.
+
+Usage:
+    python benchmarks/fake_llm.py --port 8900 --latency-ms 500
+    GROQ_BASE_URL=http://127.0.0.1:8900 GROQ_API_KEY=test python chatbot/agent.py
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = (
+    "Aim for a plate that is half vegetables, a quarter lean protein and a quarter whole grains. "
+    "Drink water regularly and keep portions of sweets and fried food small."
+)
+
+
+class FakeLLMServer:
+    """
+    Threaded HTTP server speaking the chat completions protocol.
+
+    Args:
+        host (str): Interface to bind.
+        port (int): Port to bind, 0 picks a free one.
+        latency_ms (float): Delay before answering each request (before the first token when streaming).
+        token_ms (float): Delay between streamed tokens.
+        reply (str): Assistant message returned for every request.
+        echo (bool): Prefix the reply with the last user message, so callers can check
+            that each answer reached the client that asked.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 200, reply: str = DEFAULT_REPLY,
+                 echo: bool = False, token_ms: float = 0):
+        self.latency = latency_ms / 1000.0
+        self.token_latency = token_ms / 1000.0
+        self.reply = reply
+        self.echo = echo
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                server.requests += 1
+                server.handle(self, body)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def content(self, body) -> str:
+        if not self.echo:
+            return self.reply
+        questions = [m["content"] for m in body.get("messages", []) if m.get("role") == "user"]
+        return f"[{questions[-1] if questions else ''}] {self.reply}"
+
+    def handle(self, handler, body):
+        content = self.content(body)
+        tokens = re.findall(r"\S+\s*", content)
+        if body.get("stream"):
+            self.handle_stream(handler, body, tokens)
+            return
+
+        time.sleep(self.latency + self.token_latency * max(len(tokens) - 1, 0))
+        payload = json.dumps({
+            "id": f"chatcmpl-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model") or "fake-llm",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }).encode()
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    def handle_stream(self, handler, body, tokens):
+        completion_id, created = f"chatcmpl-{self.requests}", int(time.time())
+        model = body.get("model") or "fake-llm"
+
+        def chunk(delta, finish_reason=None):
+            event = json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            })
+            return f"data: {event}\n\n"
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+
+        def write(text):
+            data = text.encode()
+            handler.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            handler.wfile.flush()
+
+        time.sleep(self.latency)
+        write(chunk({"role": "assistant", "content": ""}))
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self.token_latency)
+            write(chunk({"content": token}))
+        write(chunk({}, "stop") + "data: [DONE]\n\n")
+        handler.wfile.write(b"0\r\n\r\n")
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--token-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    server = FakeLLMServer(args.host, args.port, args.latency_ms, token_ms=args.token_ms)
+    print(f"🤖 Fake LLM listening on {server.base_url}")
+    server.httpd.serve_forever()
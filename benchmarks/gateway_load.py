@@ -0,0 +1,146 @@
+"""
+End-to-end check of the chatbot gateway (chatbot/main.py) with many simultaneous users.
+
+Starts ``FakeLLMServer`` in echo mode, an ``Agent`` with a synthetic retriever and the
+gateway app under uvicorn, then opens N frontend websockets that each ask
+``--messages`` distinct questions. Replies are streamed; time to the first delta
+(TTFT) and to the end frame are reported separately. Every reply must quote the
+question of the client that received it, so replies routed to the wrong user are
+counted as errors. With ``--restart-agent`` the agent is stopped and started again
+between rounds to check that the gateway reconnects on its own.
+
+Agent, gateway and clients share one process here, so at high client counts the
+numbers are bounded by this process relaying frames, not by the services.
+
+Usage (from the repository root):
+    python benchmarks/gateway_load.py --clients 1 16 64 --llm-latency-ms 300 --token-ms 20 --restart-agent
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import websockets
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CHATBOT_DIR = os.path.abspath(os.path.join(BENCH_DIR, "..", "chatbot"))
+sys.path.insert(0, BENCH_DIR)
+
+from agent_load import free_port, synthetic_retriever  # noqa: E402
+from fake_llm import FakeLLMServer  # noqa: E402
+
+
+async def ask(ws, question: str):
+    """Send a question to the gateway and collect the streamed reply."""
+    start = time.perf_counter()
+    await ws.send(question)
+    parts, first_token = [], None
+    while True:
+        frame = json.loads(await ws.recv())
+        if frame["type"] == "delta":
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            parts.append(frame["text"])
+        elif frame["type"] == "error":
+            return frame["text"], None, time.perf_counter() - start
+        elif frame["type"] == "end":
+            return "".join(parts), first_token, time.perf_counter() - start
+
+
+async def run_clients(url: str, clients: int, messages: int):
+    first_tokens, latencies, mismatches = [], [], 0
+
+    async def client(client_id):
+        nonlocal mismatches
+        async with websockets.connect(url) as ws:
+            for i in range(messages):
+                question = f"client {client_id} question {i}"
+                reply, first_token, latency = await ask(ws, question)
+                first_tokens.append(first_token or latency)
+                latencies.append(latency)
+                if not reply.startswith(f"[{question}]"):
+                    mismatches += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(clients)))
+    elapsed = time.perf_counter() - start
+    return (len(latencies) / elapsed, np.percentile(first_tokens, 50) * 1000,
+            np.percentile(latencies, 50) * 1000, np.percentile(latencies, 99) * 1000, mismatches)
+
+
+async def wait_for(predicate, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise TimeoutError("condition not met")
+        await asyncio.sleep(0.05)
+
+
+async def main_async(args):
+    llm = FakeLLMServer(latency_ms=args.llm_latency_ms, echo=True, token_ms=args.token_ms).start()
+    agent_port, gateway_port = free_port(), free_port()
+    os.environ["GROQ_BASE_URL"] = llm.base_url
+    os.environ.setdefault("GROQ_API_KEY", "test")
+    os.environ.setdefault("GROQ_MODEL", "fake-llm")
+    os.environ["LLM_MAX_CONCURRENCY"] = str(args.llm_concurrency)
+    os.environ["AGENT_WS_URL"] = f"ws://127.0.0.1:{agent_port}"
+    os.environ["AGENT_POOL_SIZE"] = str(args.pool_size)
+    os.environ["AGENT_RECONNECT_MAX"] = "1"
+
+    sys.path.insert(0, CHATBOT_DIR)
+    import uvicorn
+    from agent import Agent
+    from main import app, pool
+
+    agent = Agent(retriever=synthetic_retriever(args.retrieval_ms))
+    agent_server = asyncio.ensure_future(agent.start_server("127.0.0.1", agent_port))
+    await asyncio.sleep(0.3)
+
+    gateway = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=gateway_port, log_level="warning"))
+    gateway_task = asyncio.ensure_future(gateway.serve())
+    await wait_for(lambda: gateway.started and pool.connected)
+    url = f"ws://127.0.0.1:{gateway_port}/ws"
+
+    failures = 0
+    for clients in args.clients:
+        throughput, ttft, p50, p99, mismatches = await run_clients(url, clients, args.messages)
+        failures += mismatches
+        print(f"clients={clients:<4} | {throughput:7.2f} msg/s | ttft p50={ttft:8.1f} ms | p50={p50:8.1f} ms "
+              f"| p99={p99:8.1f} ms | misrouted={mismatches}")
+
+        if args.restart_agent:
+            agent_server.cancel()
+            await wait_for(lambda: not pool.connected)
+            async with websockets.connect(url) as ws:
+                print(f"  agent down -> {(await ask(ws, 'anyone there?'))[0]}")
+            agent_server = asyncio.ensure_future(agent.start_server("127.0.0.1", agent_port))
+            await wait_for(lambda: pool.stats()["connected"] == args.pool_size)
+            print(f"  agent restarted -> {pool.stats()}")
+
+    gateway.should_exit = True
+    await gateway_task
+    agent_server.cancel()
+    llm.stop()
+    if failures:
+        raise SystemExit(f"{failures} replies were delivered to the wrong client")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--messages", type=int, default=5, help="Messages per client")
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="Time to the first LLM token")
+    parser.add_argument("--token-ms", type=float, default=20, help="Delay between LLM tokens")
+    parser.add_argument("--retrieval-ms", type=float, default=15)
+    parser.add_argument("--llm-concurrency", type=int, default=64)
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--restart-agent", action="store_true", help="Restart the agent between rounds")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
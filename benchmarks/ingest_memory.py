@@ -0,0 +1,126 @@
+"""
+Peak memory and wall time of ingesting one large PDF: list-based versus streaming.
+
+Generates a synthetic ``--pages`` page PDF of nutrition-like text, then ingests it,
+each run in a fresh subprocess, with:
+
+* list: ``extract_text_from_pdf`` -> ``chunk_documents`` -> ``embed_chunks`` ->
+  ``save_faiss_index``, every stage holding the whole document;
+* stream: ``ingest.ingest``, pages parsed by a process pool and streamed through
+  ``iter_chunks`` into fixed-size embedding batches that are written as they go.
+
+Peak RSS of the ingesting process is reported above its RSS after imports and the
+model load. Parser workers are forked and share those pages, so they are not counted.
+
+``--embedder synthetic`` replaces the sentence-transformers model with random unit
+vectors of the same dimension, to measure the pipeline without the model (or offline).
+
+Usage (from the repository root):
+    python benchmarks/ingest_memory.py --pages 2000
+    python benchmarks/ingest_memory.py --pages 2000 --embedder synthetic --workers 1 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+CHATBOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "chatbot"))
+
+WORDS = ("protein fibre vitamin mineral calcium iron zinc intake energy carbohydrate fat sodium potassium "
+         "diet serving portion guideline adult child recommended daily allowance absorption metabolism").split()
+
+PROBE = r"""
+import json, os, resource, sys, time, zlib
+sys.path.insert(0, {chatbot_dir!r})
+os.chdir({workdir!r})
+import numpy as np
+import processing.embedder as embedder
+
+if {embedder!r} == "synthetic":
+    class SyntheticModel:
+        def get_sentence_embedding_dimension(self):
+            return 384
+
+        def encode(self, texts, **kwargs):
+            vectors = np.stack([np.random.default_rng(zlib.crc32(t.encode())).standard_normal(384) for t in texts])
+            return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype("float32")
+
+    embedder.load_model = lambda model_name=embedder.EMBEDDING_MODEL: SyntheticModel()
+embedder.load_model()
+
+import ingest
+from processing.chunker import chunk_documents
+from utils.pdf_parser import extract_text_from_pdf
+from utils.vector_db_utils import save_faiss_index
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+
+before = rss_mb()
+start = time.perf_counter()
+if {mode!r} == "list":
+    chunks = chunk_documents(extract_text_from_pdf({pdf!r}))
+    save_faiss_index(embedder.embed_chunks(chunks), "index.faiss", "metadata.db")
+    total = len(chunks)
+else:
+    total = ingest.ingest([{pdf!r}], "index.faiss", "metadata.db", workers={workers}, batch_size={batch_size})["chunks"]
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "elapsed_s": elapsed, "chunks": total,
+    "peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 - before,
+}}))
+"""
+
+
+def make_pdf(path: str, pages: int, chars_per_page: int = 2500, seed: int = 0):
+    import random
+
+    import fitz
+
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for number in range(pages):
+        words, length = [], 0
+        while length < chars_per_page:
+            words.append(rng.choice(WORDS))
+            length += len(words[-1]) + 1
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(36, 36, 576, 806), f"Chapter {number // 20 + 1}. " + " ".join(words), fontsize=7)
+    doc.save(path)
+
+
+def probe(mode: str, pdf: str, embedder: str, workers: int, batch_size: int) -> dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        code = PROBE.format(chatbot_dir=CHATBOT_DIR, workdir=workdir, pdf=pdf, mode=mode, embedder=embedder,
+                            workers=workers, batch_size=batch_size)
+        output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--embedder", choices=("model", "synthetic"), default="model")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = os.path.join(tmp, "reference.pdf")
+        make_pdf(pdf, args.pages)
+        print(f"=== {args.pages} pages, {os.path.getsize(pdf) / 2**20:.1f} MB PDF, {args.embedder} embeddings ===")
+        runs = [("list", 1)] + [("stream", workers) for workers in args.workers]
+        for mode, workers in runs:
+            result = probe(mode, pdf, args.embedder, workers, args.batch_size)
+            label = mode if mode == "list" else f"stream x{workers}"
+            print(f"{label:<10} | {result['chunks']} chunks | {result['elapsed_s']:7.2f} s "
+                  f"| {args.pages / result['elapsed_s']:7.1f} pages/s | peak RSS +{result['peak_mb']:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
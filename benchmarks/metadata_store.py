@@ -0,0 +1,98 @@
+"""
+Startup time, memory and lookup latency of chunk metadata: metadata.json versus sqlite.
+
+Builds a metadata.json of ``--copies`` times the repository's chunks (to model a
+growing corpus), migrates it with ``migrate_json`` and then, each in a fresh
+subprocess, measures:
+
+* json: ``json.load`` of the whole file at startup, then top-k lookups by list index;
+* sqlite: opening ``MetadataStore``, then ``get_many`` of the top-k ids.
+
+RSS is read from /proc/self/status before and after loading.
+
+Usage (from the repository root):
+    python benchmarks/metadata_store.py --copies 1 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+CHATBOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "chatbot"))
+REPO_METADATA = os.path.join(CHATBOT_DIR, "data", "embeddings", "metadata.json")
+sys.path.insert(0, CHATBOT_DIR)
+
+PROBE = r"""
+import json, os, random, sys, time
+sys.path.insert(0, {chatbot_dir!r})
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+
+from utils.metadata_store import MetadataStore
+before = rss_mb()
+start = time.perf_counter()
+if {mode!r} == "json":
+    with open({json_path!r}, encoding="utf-8") as f:
+        metadata = json.load(f)
+    total = len(metadata)
+    lookup = lambda ids: [metadata[i] for i in ids]
+else:
+    store = MetadataStore({db_path!r})
+    total = len(store)
+    lookup = store.get_many
+load_s = time.perf_counter() - start
+loaded = rss_mb()
+
+rng = random.Random(0)
+queries = [[rng.randrange(total) for _ in range({k})] for _ in range(2000)]
+start = time.perf_counter()
+for ids in queries:
+    lookup(ids)
+lookup_us = (time.perf_counter() - start) / len(queries) * 1e6
+print(json.dumps({{"load_s": load_s, "rss_mb": loaded - before, "lookup_us": lookup_us, "rows": total}}))
+"""
+
+
+def probe(mode: str, json_path: str, db_path: str, k: int) -> dict:
+    code = PROBE.format(chatbot_dir=CHATBOT_DIR, mode=mode, json_path=json_path, db_path=db_path, k=k)
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--copies", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    from utils.metadata_store import migrate_json
+
+    with open(REPO_METADATA, encoding="utf-8") as f:
+        chunks = json.load(f)
+
+    for copies in args.copies:
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path, db_path = os.path.join(tmp, "metadata.json"), os.path.join(tmp, "metadata.db")
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(chunks * copies, f, ensure_ascii=False, indent=2)
+            start = time.perf_counter()
+            migrate_json(json_path, db_path).close()
+            migrate_s = time.perf_counter() - start
+
+            print(f"\n=== {len(chunks) * copies} chunks | json {os.path.getsize(json_path) / 2**20:.1f} MB "
+                  f"| sqlite {os.path.getsize(db_path) / 2**20:.1f} MB | migration {migrate_s:.2f} s ===")
+            for mode in ("json", "sqlite"):
+                result = probe(mode, json_path, db_path, args.k)
+                print(f"{mode:<6} | startup {result['load_s'] * 1000:8.1f} ms | RSS +{result['rss_mb']:7.1f} MB "
+                      f"| top-{args.k} lookup {result['lookup_us']:7.1f} us")
+
+
+if __name__ == "__main__":
+    main()
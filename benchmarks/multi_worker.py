@@ -0,0 +1,271 @@
+"""
+Memory per worker and throughput against the number of worker processes.
+
+For each count in ``--workers`` it starts the service both ways and loads it:
+
+* api, spawn: ``uvicorn main:app --workers N``, every worker loading its own model;
+* api, prefork: ``python serve.py --workers N``, the model loaded and warmed up once
+  before forking (a randomly initialised YOLOv8n unless ``--weights``), driven by
+  ``--clients`` clients posting distinct synthetic JPEGs;
+* agent, separate: N independent ``agent.py`` processes on consecutive ports;
+* agent, prefork: ``AGENT_WORKERS=N``, the embedding model, FAISS index (memory-mapped)
+  and metadata store loaded before forking. Both run over a synthetic index of
+  ``--vectors`` vectors with a randomly initialised embedding model of MiniLM's shape,
+  and are driven through the gateway's ``AgentPool`` against ``FakeLLMServer``.
+
+Every agent reply quotes how many user messages the LLM saw, so a session moved to an
+agent without its history counts as an error. Memory is read from /proc after the
+load: PSS splits shared pages between the processes sharing them, so the sum over the
+process tree is what the service really uses, and USS is what each worker alone holds.
+On one core throughput cannot grow with workers; the memory columns still apply.
+
+Usage (from the repository root):
+    python benchmarks/multi_worker.py --workers 1 2 4
+    python benchmarks/multi_worker.py --services agent --vectors 500000
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.abspath(os.path.join(BENCH_DIR, "..", "api"))
+CHATBOT_DIR = os.path.abspath(os.path.join(BENCH_DIR, "..", "chatbot"))
+sys.path.insert(0, BENCH_DIR)
+
+from agent_load import free_port  # noqa: E402
+from fake_llm import FakeLLMServer  # noqa: E402
+
+AGENT = r"""
+import asyncio, sys
+sys.path.insert(0, {chatbot_dir!r})
+import agent
+sys.path.insert(0, {bench_dir!r})
+from query_batching import SyntheticModel
+import processing.retriever as retriever_module
+
+model = SyntheticModel()
+retriever_module.load_model = lambda model_name=None: model
+agent.configure_logging("WARNING")
+if {workers} > 1:
+    agent.serve_workers({workers}, "127.0.0.1", {port})
+else:
+    asyncio.run(agent.Agent().start_server("127.0.0.1", {port}))
+"""
+
+
+class CountingLLM(FakeLLMServer):
+    """Replies with the number of user messages in the request, i.e. the turns the agent remembered."""
+
+    def content(self, body) -> str:
+        turns = sum(m.get("role") == "user" for m in body.get("messages", []))
+        return f"[{turns}] {self.reply}"
+
+
+def children(pid: int) -> list:
+    pids = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        try:
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def process_tree(pid: int) -> list:
+    return [pid] + [descendant for child in children(pid) for descendant in process_tree(child)]
+
+
+def memory_mb(pid: int) -> dict:
+    """RSS, PSS and USS (private pages) of one process from smaps_rollup."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {"rss": fields["Rss"], "pss": fields["Pss"],
+            "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)}
+
+
+def tree_memory(pids: list) -> dict:
+    """
+    Total PSS of the processes and their descendants, and the mean RSS/USS of the workers:
+    the processes without children (not the supervisor or preloading parent).
+    """
+    tree = [pid for root in pids for pid in process_tree(root)]
+    memories = {pid: memory_mb(pid) for pid in tree}
+    workers = [memories[pid] for pid in tree if not children(pid)]
+    return {"pss_total": sum(m["pss"] for m in memories.values()),
+            "worker_rss": float(np.mean([m["rss"] for m in workers])),
+            "worker_uss": float(np.mean([m["uss"] for m in workers]))}
+
+
+def wait_http(url: str, timeout: float = 300):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=5)
+            return
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.2)
+    raise TimeoutError(f"{url} did not answer")
+
+
+def stop(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def run_api(mode: str, workers: int, weights: str, warm_up: list, images: list, clients: int) -> dict:
+    import httpx
+
+    port = free_port()
+    command = ([sys.executable, "-m", "uvicorn", "main:app", "--workers", str(workers)] if mode == "spawn"
+               else [sys.executable, "serve.py", "--workers", str(workers)])
+    env = dict(os.environ, MODELS=f"default={weights}", LOG_LEVEL="WARNING")
+    process = subprocess.Popen(command + ["--host", "127.0.0.1", "--port", str(port)], cwd=API_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    started = time.perf_counter()
+    try:
+        wait_http(f"http://127.0.0.1:{port}/models")
+        startup = time.perf_counter() - started
+
+        async def load(images):
+            latencies, errors = [], 0
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=300) as client:
+                async def user(offset):
+                    nonlocal errors
+                    for image in images[offset::clients]:
+                        start = time.perf_counter()
+                        response = await client.post("/upload_image/file", content=image,
+                                                     headers={"Content-Type": "image/jpeg"})
+                        errors += response.status_code != 200
+                        latencies.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                await asyncio.gather(*(user(c) for c in range(clients)))
+                return latencies, errors, time.perf_counter() - start
+
+        # Other images to warm up every worker, so the measured ones miss the detection cache
+        asyncio.run(load(warm_up))
+        latencies, errors, elapsed = asyncio.run(load(images))
+        memory = tree_memory([process.pid])
+    finally:
+        stop([process])
+    return {"throughput": len(latencies) / elapsed, "p50_ms": float(np.percentile(latencies, 50) * 1000),
+            "errors": errors, "startup_s": startup, **memory}
+
+
+def run_agent(mode: str, workers: int, workdir: str, llm_url: str, clients: int, messages: int) -> dict:
+    sys.path.insert(0, CHATBOT_DIR)
+    from agent_client import AgentPool
+
+    base_port = free_port()
+    env = dict(os.environ, GROQ_BASE_URL=llm_url, GROQ_API_KEY=os.getenv("GROQ_API_KEY", "test"),
+               GROQ_MODEL="fake-llm", RETRIEVAL_MIN_SCORE="-1", LOG_LEVEL="WARNING",
+               HYBRID_SEARCH=os.getenv("HYBRID_SEARCH", "0"))
+    launches = [(workers, base_port)] if mode == "prefork" else [(1, base_port + i) for i in range(workers)]
+    processes = [subprocess.Popen([sys.executable, "-c", AGENT.format(chatbot_dir=CHATBOT_DIR, bench_dir=BENCH_DIR,
+                                                                      workers=count, port=port)],
+                                  cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                 for count, port in launches]
+    started = time.perf_counter()
+    try:
+        for i in range(workers):
+            wait_http(f"http://127.0.0.1:{base_port + i}/ready")
+        startup = time.perf_counter() - started
+
+        async def load():
+            pool = AgentPool(",".join(f"ws://127.0.0.1:{base_port + i}" for i in range(workers)), size=1)
+            await pool.start()
+            # Sessions only stay on their agent once every agent is connected
+            while pool.stats()["connected"] < workers:
+                await asyncio.sleep(0.05)
+            latencies, errors = [], 0
+
+            async def session(client_id):
+                nonlocal errors
+                for i in range(messages):
+                    start = time.perf_counter()
+                    reply = await pool.request(f"session-{client_id}", f"question {i} about protein from {client_id}")
+                    latencies.append(time.perf_counter() - start)
+                    errors += not reply.startswith(f"[{i + 1}]")
+
+            start = time.perf_counter()
+            await asyncio.gather(*(session(c) for c in range(clients)))
+            elapsed = time.perf_counter() - start
+            await pool.close()
+            return latencies, errors, elapsed
+
+        latencies, errors, elapsed = asyncio.run(load())
+        memory = tree_memory([process.pid for process in processes])
+    finally:
+        stop(processes)
+    return {"throughput": len(latencies) / elapsed, "p50_ms": float(np.percentile(latencies, 50) * 1000),
+            "errors": errors, "startup_s": startup, **memory}
+
+
+def report(service: str, mode: str, workers: int, row: dict):
+    print(f"{service:<5} {mode:<8} | workers={workers} | {row['throughput']:7.2f} req/s | p50 {row['p50_ms']:8.1f} ms "
+          f"| startup {row['startup_s']:5.1f} s | PSS total {row['pss_total']:7.1f} MB "
+          f"({row['pss_total'] / workers:6.1f} per worker) | worker RSS {row['worker_rss']:6.1f} MB, "
+          f"USS {row['worker_uss']:6.1f} MB | errors {row['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--services", nargs="+", choices=("api", "agent"), default=["api", "agent"])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--uploads", type=int, default=32, help="Uploads per round")
+    parser.add_argument("--weights", help="Detection weights (default: randomly initialised yolov8n)")
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--messages", type=int, default=4, help="Messages per chat session")
+    parser.add_argument("--llm-latency-ms", type=float, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if "api" in args.services:
+            from suite import synthetic_images
+
+            weights = args.weights
+            if weights is None:
+                from ultralytics import YOLO
+                weights = os.path.join(workdir, "yolov8n-random.pt")
+                YOLO("yolov8n.yaml").save(weights)
+            images = synthetic_images(args.uploads)
+            warm_up = synthetic_images(args.clients * 2, seed=1)
+            for workers in args.workers:
+                for mode in ("spawn", "prefork"):
+                    report("api", mode, workers, run_api(mode, workers, os.path.abspath(weights), warm_up, images,
+                                                         args.clients))
+
+        if "agent" in args.services:
+            sys.path.insert(0, CHATBOT_DIR)
+            from agent_startup import build_corpus
+
+            build_corpus(workdir, args.vectors)
+            llm = CountingLLM(latency_ms=args.llm_latency_ms).start()
+            for workers in args.workers:
+                for mode in ("separate", "prefork"):
+                    report("agent", mode, workers, run_agent(mode, workers, workdir, llm.base_url, args.clients,
+                                                             args.messages))
+            llm.stop()
+
+
+if __name__ == "__main__":
+    main()
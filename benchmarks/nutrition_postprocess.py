@@ -0,0 +1,103 @@
+"""
+Microbenchmark of detection postprocessing and nutrition aggregation.
+
+Builds synthetic ultralytics ``Results`` (no model needed) with a given number of
+detections per image and compares the previous per-box Python loop (one
+tensor-to-host sync per attribute per box, scalar sums) against
+``Detections.from_ultralytics`` + ``summarize_detections`` (one copy per result,
+array lookups and vector sums).
+
+Usage (from the repository root):
+    python benchmarks/nutrition_postprocess.py --detections 10 100 500 --images 1 8
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+API_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "api"))
+sys.path.insert(0, API_DIR)
+
+from backends import Detections  # noqa: E402
+from model import FOOD_DATABASE, summarize_detections  # noqa: E402
+
+
+def legacy_summary(results):
+    """The per-box loop detect_meals used before vectorization."""
+    detected_items = []
+    total_calories = total_protein = total_carbs = total_fat = 0
+    for result in results:
+        for box in result.boxes:
+            class_id = int(box.cls[0])
+            confidence = float(box.conf[0])
+            if class_id in FOOD_DATABASE:
+                food_data = FOOD_DATABASE[class_id]
+                detected_items.append({
+                    "name": food_data["name"],
+                    "confidence": confidence,
+                    "calories": food_data["calories"],
+                    "protein": food_data["protein"],
+                    "carbs": food_data["carbs"],
+                    "fat": food_data["fat"]
+                })
+                total_calories += food_data["calories"]
+                total_protein += food_data["protein"]
+                total_carbs += food_data["carbs"]
+                total_fat += food_data["fat"]
+    return detected_items, total_calories, total_protein, total_carbs, total_fat
+
+
+def synthetic_results(num_images, num_detections, num_classes=6, seed=0):
+    rng = np.random.default_rng(seed)
+    image = np.zeros((640, 640, 3), dtype=np.uint8)
+    names = {i: str(i) for i in range(num_classes)}
+    results = []
+    for _ in range(num_images):
+        xy = rng.uniform(0, 500, (num_detections, 2))
+        data = np.concatenate([
+            xy, xy + rng.uniform(10, 140, (num_detections, 2)),
+            rng.uniform(0.5, 1, (num_detections, 1)),
+            rng.integers(0, num_classes, (num_detections, 1)),
+        ], axis=1)
+        results.append(Results(image, path="synthetic", names=names, boxes=torch.tensor(data, dtype=torch.float32)))
+    return results
+
+
+def timeit(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--detections", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--images", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    for num_images in args.images:
+        for num_detections in args.detections:
+            results = synthetic_results(num_images, num_detections)
+
+            # Same totals, value and type, from both implementations
+            legacy_totals = [legacy_summary([r])[1:] for r in results]
+            summaries = summarize_detections([Detections.from_ultralytics(r) for r in results])
+            vector_totals = [tuple(s[f"total_{n}"] for n in ("calories", "protein", "carbs", "fat")) for s in summaries]
+            assert [[(v, type(v)) for v in t] for t in legacy_totals] == [[(v, type(v)) for v in t] for t in vector_totals]
+
+            legacy_ms = timeit(lambda: [legacy_summary([r]) for r in results], args.repeats)
+            vector_ms = timeit(lambda: summarize_detections([Detections.from_ultralytics(r) for r in results]), args.repeats)
+            print(
+                f"images={num_images:<3} detections/image={num_detections:<5} | loop={legacy_ms:8.2f} ms "
+                f"| vectorized={vector_ms:7.2f} ms | {legacy_ms / vector_ms:5.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
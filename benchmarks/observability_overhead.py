@@ -0,0 +1,61 @@
+"""
+Cost of the instrumentation on the hot path, per call.
+
+Compares, in this process and with stderr redirected to /dev/null:
+
+* ``print`` of a request line, as the services did before (the agent also printed
+  the first 80 characters of every reply);
+* the same line through ``logging`` at DEBUG while the service runs at INFO (skipped)
+  and at DEBUG (written);
+* one ``span`` (a histogram observation, plus the skipped debug line).
+
+Usage (from the repository root):
+    python benchmarks/observability_overhead.py --calls 200000
+"""
+import argparse
+import contextlib
+import logging
+import os
+import sys
+import time
+
+CHATBOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "chatbot"))
+sys.path.insert(0, CHATBOT_DIR)
+
+from observability import configure_logging, logger, span  # noqa: E402
+
+
+def per_call(function, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+
+    message = "How much protein is there in a bowl of lentil soup with rice? " * 4
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        configure_logging("INFO")
+        results = [("print", per_call(lambda: print(f"📨 Received from client: {message}"), args.calls)),
+                   ("logger.debug at INFO", per_call(lambda: logger.debug("📨 Received from client: %s", message),
+                                                     args.calls))]
+        logger.setLevel(logging.DEBUG)
+        results.append(("logger.debug at DEBUG", per_call(lambda: logger.debug("📨 Received from client: %s",
+                                                                              message), args.calls // 10)))
+        logger.setLevel(logging.INFO)
+
+        def timed():
+            with span("benchmark"):
+                pass
+        results.append(("span", per_call(timed, args.calls)))
+
+    for name, microseconds in results:
+        print(f"{name:<22} | {microseconds:7.2f} µs per call")
+
+
+if __name__ == "__main__":
+    main()
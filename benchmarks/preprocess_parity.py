@@ -0,0 +1,99 @@
+"""
+Parity and timing check for the pre-resize/letterbox stage.
+
+For every image it runs detection twice: on the full-resolution decode (today's path)
+and on the output of ``Preprocessor`` (draft decode + resize + letterbox), maps the
+pre-resized boxes back to original pixels and matches detections by class and IoU.
+Also reports the decode/resize CPU time of both paths. Exits with status 1 when the
+match rate falls below ``--min-match``.
+
+Usage (from the repository root):
+    python benchmarks/preprocess_parity.py --images api/data --imgsz 640
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+
+API_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "api"))
+
+
+def iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match(reference, candidate, iou_threshold):
+    """Greedily pair detections of the same class; returns the number of matches."""
+    unused = list(candidate)
+    matched = 0
+    for ref in sorted(reference, key=lambda d: -d["confidence"]):
+        best = max(
+            (c for c in unused if c["item"] == ref["item"]),
+            key=lambda c: iou(ref["box"], c["box"]),
+            default=None,
+        )
+        if best is not None and iou(ref["box"], best["box"]) >= iou_threshold:
+            unused.remove(best)
+            matched += 1
+    return matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default=os.path.join(API_DIR, "data"), help="Directory of test images")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--iou", type=float, default=0.5)
+    parser.add_argument("--min-match", type=float, default=0.9)
+    args = parser.parse_args()
+
+    paths = sorted(
+        p for ext in ("*.jpg", "*.jpeg", "*.png")
+        for p in glob.glob(os.path.join(os.path.abspath(args.images), ext))
+    )
+    os.chdir(API_DIR)
+    sys.path.insert(0, API_DIR)
+    from images import load_image
+    from predict import run_model, extract_detected_items
+    from preprocess import Preprocessor
+
+    preprocessor = Preprocessor(args.imgsz)
+    total_ref = total_matched = 0
+    full_times, fast_times = [], []
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+
+        start = time.perf_counter()
+        full = load_image(data)
+        full_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        small, letterbox = preprocessor(data)
+        fast_times.append(time.perf_counter() - start)
+
+        reference = extract_detected_items(run_model([full], imgsz=args.imgsz)[0])
+        candidate = extract_detected_items(run_model([small], imgsz=args.imgsz)[0], letterbox)
+        matched = match(reference, candidate, args.iou)
+        total_ref += len(reference)
+        total_matched += matched
+        print(f"{os.path.basename(path)}: {matched}/{len(reference)} matched ({len(candidate)} pre-resized detections)")
+
+    if not paths:
+        print("No images found")
+        return
+    rate = total_matched / total_ref if total_ref else 1.0
+    print(f"🖼️ Decode+resize: full={np.mean(full_times) * 1000:.1f} ms, pre-resize={np.mean(fast_times) * 1000:.1f} ms")
+    print(f"✅ Match rate: {rate:.1%} (IoU >= {args.iou})")
+    if rate < args.min_match:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Throughput and latency of question retrieval with and without micro-batching.
+
+Builds a synthetic index of ``--vectors`` vectors (see agent_startup.py), then runs
+``--questions`` questions from ``--concurrency`` threads through a Retriever:
+
+* per-query: the previous path, one ``encode`` and one FAISS search per question;
+* batched: QueryEmbedder and batched FAISS search, cache disabled;
+* batched+cache: the same with the LRU embedding cache.
+
+A ``--repeat`` fraction of the questions is drawn from 20 popular ones, asked with
+varying case and spacing. Reports questions/s, p50/p95 latency, the batch size
+distribution of embedding and search, and the cache hit rate.
+
+``--embedder synthetic`` replaces the model with a randomly initialised one of the same
+architecture (same cost, no download) to run offline; set EMBEDDING_BACKEND=onnxruntime
+to measure the ONNX export instead of PyTorch. Keyword search is left out unless
+HYBRID_SEARCH=1, since it costs the same in every mode.
+
+Usage (from the repository root):
+    python benchmarks/query_batching.py --vectors 20000 --concurrency 16
+    python benchmarks/query_batching.py --embedder synthetic --repeat 0.5
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CHATBOT_DIR = os.path.abspath(os.path.join(BENCH_DIR, "..", "chatbot"))
+sys.path.insert(0, CHATBOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+# Keyword search costs the same in every mode; HYBRID_SEARCH=1 includes it
+os.environ.setdefault("HYBRID_SEARCH", "0")
+
+from agent_startup import build_corpus  # noqa: E402
+import processing.retriever as retriever_module  # noqa: E402
+from processing.embedder import QueryEmbedder, normalize  # noqa: E402
+from processing.hybrid import search_index  # noqa: E402
+
+WORDS = ("protein fibre iron lentils rice salmon spinach vitamin calcium breakfast snack sugar salt "
+         "diabetes pregnancy athletes water coffee eggs yogurt beans nuts oats fat calories").split()
+
+
+class SyntheticModel:
+    """Randomly initialised model with MiniLM-L6's shape (6 layers, 384 hidden), hashed tokens, mean pooled."""
+
+    def __init__(self):
+        import torch
+        from transformers import BertConfig, BertModel
+
+        torch.manual_seed(0)
+        self.torch = torch
+        self.model = BertModel(BertConfig(hidden_size=384, num_hidden_layers=6, num_attention_heads=12,
+                                          intermediate_size=1536)).eval()
+
+    def encode(self, texts, **kwargs) -> np.ndarray:
+        torch = self.torch
+        tokens = [[101] + [1000 + zlib.crc32(w.encode()) % 29000 for w in t.lower().split()][:62] + [102]
+                  for t in texts]
+        ids = torch.zeros((len(tokens), max(map(len, tokens))), dtype=torch.long)
+        mask = torch.zeros_like(ids)
+        for row, row_tokens in enumerate(tokens):
+            ids[row, :len(row_tokens)] = torch.tensor(row_tokens)
+            mask[row, :len(row_tokens)] = 1
+        with torch.inference_mode():
+            hidden = self.model(input_ids=ids, attention_mask=mask).last_hidden_state
+        return ((hidden * mask[..., None]).sum(1) / mask.sum(1, keepdim=True)).numpy()
+
+
+def questions(count: int, repeat: float, seed: int = 0):
+    rng = random.Random(seed)
+    popular = [" ".join(rng.sample(WORDS, 5)) for _ in range(20)]
+    asked = []
+    for i in range(count):
+        if rng.random() < repeat:
+            words = rng.choice(popular).split()
+            asked.append(("  " if i % 2 else " ").join(w.upper() if i % 3 == 0 else w for w in words))
+        else:
+            asked.append(" ".join(rng.sample(WORDS, 5)) + f" {i}")
+    return asked
+
+
+def per_query(retriever):
+    """Retrieval as before micro-batching: one encode and one FAISS search per question."""
+    def retrieve(query):
+        embedding = normalize(retriever.load().model.encode([query]))[0]
+        retriever.index_version()
+        return search_index(retriever.index, retriever.metadata, embedding, 5, retriever_module.RETRIEVAL_MIN_SCORE,
+                            query)
+    return retrieve
+
+
+def run(retrieve, asked, concurrency: int):
+    latencies = []
+
+    def timed(query):
+        start = time.perf_counter()
+        retrieve(query)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(timed, asked))
+    elapsed = time.perf_counter() - start
+    return len(asked) / elapsed, np.percentile(latencies, 50) * 1000, np.percentile(latencies, 95) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--questions", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--repeat", type=float, default=0.3, help="Fraction of popular, repeated questions")
+    parser.add_argument("--embedder", choices=("model", "synthetic"), default="model")
+    args = parser.parse_args()
+
+    if args.embedder == "synthetic":
+        model = SyntheticModel()
+        retriever_module.load_model = lambda model_name=None: model
+
+    with tempfile.TemporaryDirectory() as workdir:
+        build_corpus(workdir, args.vectors)
+        os.chdir(workdir)
+        asked = questions(args.questions, args.repeat)
+        print(f"=== {args.questions} questions, {args.concurrency} threads, {args.vectors} vectors, "
+              f"{args.repeat:.0%} repeated, {args.embedder} embedder ===")
+        for name in ("per-query", "batched", "batched+cache"):
+            retriever = retriever_module.Retriever()
+            retriever.load()
+            if name == "batched":
+                retriever.embedder = QueryEmbedder(retriever._encode, cache_size=0)
+            retrieve = per_query(retriever) if name == "per-query" else retriever.retrieve_chunks
+            retrieve(asked[0])  # Warm up outside the measurement
+            qps, p50, p95 = run(retrieve, asked, args.concurrency)
+            print(f"{name:<14} | {qps:7.1f} q/s | p50 {p50:7.1f} ms | p95 {p95:7.1f} ms")
+            if name != "per-query":
+                stats = retriever.stats()
+                print(f"{'':<14} | embedding batches {stats['embedding']['batch_sizes']} "
+                      f"| cache hit rate {stats['embedding']['cache_hit_rate']:.1%}")
+                print(f"{'':<14} | search batches {stats['search']['batch_sizes']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Offline evaluation of retrieval: dense-only versus hybrid (BM25 + FAISS, reciprocal
+rank fusion), optionally with a cross-encoder reranker.
+
+Builds a temporary index and metadata store from ``--metadata`` (the repository's
+chunks by default) and runs each query through ``processing.hybrid.search_index``.
+A query is answered when one of the top-k chunks comes from a relevant source page;
+reports recall@k, MRR and per-query search latency (embedding excluded).
+
+Queries come from ``--queries`` (JSON lines with "query" and a "sources" list) or are
+generated from sampled chunks: "term" queries ask about the chunk's two rarest words,
+like a dish or nutrient name; "phrase" queries reuse a few words of the chunk.
+
+``--embedder hashing`` replaces the embedding model with hashed word features to run
+the harness offline; its dense results are themselves lexical, so use the model for
+real numbers.
+
+Usage (from the repository root):
+    python benchmarks/retrieval_eval.py --queries 300 --k 1 5 10
+    python benchmarks/retrieval_eval.py --reranker cross-encoder/ms-marco-MiniLM-L-6-v2
+    python benchmarks/retrieval_eval.py --queries-file eval.jsonl
+"""
+import argparse
+import json
+import math
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import zlib
+from collections import Counter
+
+import numpy as np
+
+CHATBOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "chatbot"))
+sys.path.insert(0, CHATBOT_DIR)
+
+from processing.hybrid import search_index  # noqa: E402
+from utils.metadata_store import STOPWORDS, migrate_json  # noqa: E402
+from utils.vector_db_utils import build_faiss_index  # noqa: E402
+
+REPO_METADATA = os.path.join(CHATBOT_DIR, "data", "embeddings", "metadata.json")
+WORD = re.compile(r"[a-z]{4,}")
+
+
+def hashing_embed(texts, dim: int = 384) -> np.ndarray:
+    vectors = np.zeros((len(texts), dim), dtype="float32")
+    for row, text in enumerate(texts):
+        for word in re.findall(r"\w+", text.lower()):
+            h = zlib.crc32(word.encode())
+            vectors[row, h % dim] += 1 if h & 1 << 31 else -1
+    return vectors
+
+
+def synthetic_queries(chunks, count: int, seed: int = 0):
+    document_frequency = Counter(w for c in chunks for w in set(WORD.findall(c["text"].lower())))
+    rng = random.Random(seed)
+    queries = []
+    while len(queries) < count:
+        chunk = rng.choice(chunks)
+        words = [w for w in WORD.findall(chunk["text"].lower()) if w not in STOPWORDS]
+        if len(words) < 8:
+            continue
+        if len(queries) % 2 == 0:
+            rare = sorted(set(words), key=lambda w: document_frequency[w])[:2]
+            queries.append({"query": f"what is {' and '.join(rare)}", "sources": [chunk["source"]], "kind": "term"})
+        else:
+            start = rng.randrange(len(words) - 6)
+            phrase = [w for w in words[start:start + 8] if rng.random() > 0.25]
+            queries.append({"query": " ".join(phrase), "sources": [chunk["source"]], "kind": "phrase"})
+    return queries
+
+
+def evaluate(index, store, queries, embeddings, ks, **options):
+    latencies, ranks = [], []
+    for query, embedding in zip(queries, embeddings):
+        start = time.perf_counter()
+        results = search_index(index, store, embedding, max(ks), query=query["query"], **options)
+        latencies.append(time.perf_counter() - start)
+        relevant = set(query["sources"])
+        ranks.append(next((r for r, c in enumerate(results, start=1) if c["source"] in relevant), math.inf))
+    ranks = np.array(ranks)
+    return {
+        "recall": {k: float(np.mean(ranks <= k)) for k in ks},
+        "mrr": float(np.mean(1 / ranks)),
+        "mean_ms": float(np.mean(latencies) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--metadata", default=REPO_METADATA, help="metadata.json list of chunks")
+    parser.add_argument("--queries", type=int, default=300, help="Synthetic queries to generate")
+    parser.add_argument("--queries-file", help="JSON lines with 'query' and 'sources'")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 5, 10])
+    parser.add_argument("--embedder", choices=("model", "hashing"), default="model")
+    parser.add_argument("--reranker", default="", help="Cross-encoder model for a reranked run")
+    parser.add_argument("--candidates", type=int, default=50)
+    parser.add_argument("--rerank-candidates", type=int, default=20)
+    args = parser.parse_args()
+
+    with open(args.metadata, encoding="utf-8") as f:
+        chunks = json.load(f)
+    if args.queries_file:
+        with open(args.queries_file, encoding="utf-8") as f:
+            queries = [json.loads(line) for line in f if line.strip()]
+    else:
+        queries = synthetic_queries(chunks, args.queries)
+
+    if args.embedder == "model":
+        from processing.embedder import embed_texts
+    else:
+        embed_texts = hashing_embed
+    start = time.perf_counter()
+    corpus = embed_texts([c["text"] for c in chunks])
+    print(f"Embedded {len(chunks)} chunks in {time.perf_counter() - start:.1f} s ({args.embedder})")
+    query_embeddings = embed_texts([q["query"] for q in queries])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = migrate_json(args.metadata, os.path.join(tmp, "metadata.db"))
+        index = build_faiss_index(corpus, "flat", ids=np.arange(len(chunks)))
+        runs = [("dense", dict(hybrid=False, reranker="")),
+                ("hybrid", dict(hybrid=True, candidates=args.candidates, reranker=""))]
+        if args.reranker:
+            runs.append(("hybrid+rerank", dict(hybrid=True, candidates=args.candidates, reranker=args.reranker,
+                                               rerank_candidates=args.rerank_candidates)))
+
+        kinds = sorted({q.get("kind", "all") for q in queries})
+        print(f"=== {len(queries)} queries over {len(chunks)} chunks ===")
+        for name, options in runs:
+            for kind in kinds:
+                subset = [i for i, q in enumerate(queries) if q.get("kind", "all") == kind]
+                result = evaluate(index, store, [queries[i] for i in subset], query_embeddings[subset], args.k,
+                                  **options)
+                recall = " ".join(f"R@{k}={r:.3f}" for k, r in result["recall"].items())
+                print(f"{name:<14} | {kind:<6} | {recall} | MRR={result['mrr']:.3f} "
+                      f"| {result['mean_ms']:6.2f} ms mean, {result['p95_ms']:6.2f} ms p95")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
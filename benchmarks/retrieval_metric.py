@@ -0,0 +1,67 @@
+"""
+Retrieval quality of L2 over raw embeddings versus cosine (inner product over
+normalised embeddings), and how often the relevance threshold skips the LLM.
+
+Generates a synthetic corpus shaped like sentence embeddings whose norms vary
+(``--norm-spread``), as embeddings stored without normalisation do. Questions are
+either on-topic (perturbed corpus vectors) or off-topic (random directions). For
+each metric, built with ``build_faiss_index``, reports recall@k against the exact
+cosine neighbours and, with the retriever's score conversion, the share of
+on-topic and off-topic questions that keep at least one chunk at each
+``--min-score``.
+
+Usage (from the repository root):
+    python benchmarks/retrieval_metric.py --size 20000 --min-score 0.2 0.3 0.4
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+CHATBOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "chatbot"))
+sys.path.insert(0, CHATBOT_DIR)
+
+from utils.vector_db_utils import build_faiss_index, normalize, similarities  # noqa: E402
+
+
+def synthetic_corpus(size: int, dim: int, queries: int, norm_spread: float, topics: int = 256, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((topics, dim)).astype("float32")
+    corpus = centres[rng.integers(0, topics, size)] + 0.6 * rng.standard_normal((size, dim)).astype("float32")
+    corpus *= rng.uniform(1, norm_spread, (size, 1)).astype("float32") / np.linalg.norm(corpus, axis=1, keepdims=True)
+    on_topic = normalize(corpus[rng.integers(0, size, queries)]) + 0.05 * rng.standard_normal((queries, dim))
+    off_topic = rng.standard_normal((queries, dim))
+    return corpus, normalize(on_topic), normalize(off_topic)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--norm-spread", type=float, default=3.0, help="Largest / smallest embedding norm")
+    parser.add_argument("--min-score", type=float, nargs="+", default=[0.2, 0.3, 0.4])
+    args = parser.parse_args()
+
+    corpus, on_topic, off_topic = synthetic_corpus(args.size, args.dim, args.queries, args.norm_spread)
+    truth = np.argsort(-(on_topic @ normalize(corpus).T), axis=1)[:, :args.k]
+
+    print(f"=== {args.size} vectors x {args.dim} dims, norms 1-{args.norm_spread:g}, recall@{args.k} ===")
+    for metric in ("l2", "cosine"):
+        index = build_faiss_index(corpus, "flat", metric=metric)
+        _, found = index.search(on_topic, args.k)
+        recall = np.mean([len(set(f) & set(t)) / args.k for f, t in zip(found, truth)])
+        kept = []
+        for queries in (on_topic, off_topic):
+            distances, _ = index.search(queries, 1)
+            # Scores of L2 distances only mean cosine when the stored vectors are normalised
+            kept.append(similarities(distances[:, 0], metric))
+        line = " | ".join(f"min_score={t:.2f}: on-topic {np.mean(kept[0] >= t):.2f} off-topic {np.mean(kept[1] >= t):.2f}"
+                          for t in args.min_score)
+        print(f"{metric:<6} | recall={recall:.3f} | {line}")
+
+
+if __name__ == "__main__":
+    main()
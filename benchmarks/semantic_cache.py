@@ -0,0 +1,105 @@
+"""
+Effect of the agent's semantic cache on a workload of repeated and paraphrased questions.
+
+Replays ``--questions`` questions drawn from ``--topics`` topics with a Zipf
+distribution, each asked in one of ``--phrasings`` wordings, through
+``Agent.answer`` with a fresh conversation per question (the common "first
+question" case). Embeddings are synthetic: all wordings of a topic are close
+(cosine ~0.92, enough to reuse chunks) and repeating the exact wording is
+identical (reuses the answer). Runs once with the cache disabled and once enabled,
+then rebuilds the "index" to show that the cache is invalidated.
+
+Usage (from the repository root):
+    python benchmarks/semantic_cache.py --questions 300 --topics 40 --llm-latency-ms 300
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import zlib
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CHATBOT_DIR = os.path.abspath(os.path.join(BENCH_DIR, "..", "chatbot"))
+sys.path.insert(0, BENCH_DIR)
+
+from agent_load import SyntheticRetriever  # noqa: E402
+from fake_llm import FakeLLMServer  # noqa: E402
+
+
+class ParaphraseRetriever(SyntheticRetriever):
+    """Questions "topic K wording V": one base vector per topic, plus per-wording noise."""
+
+    def embed_query(self, query: str) -> np.ndarray:
+        time.sleep(self.delay)
+        topic, _, wording = query.partition(" wording ")
+        base = np.random.default_rng(zlib.crc32(topic.encode())).standard_normal(self.dim)
+        noise = np.random.default_rng(zlib.crc32(query.encode())).standard_normal(self.dim)
+        return (base + 0.3 * noise).astype(np.float32)
+
+
+async def replay(agent, questions, concurrency: int = 8):
+    from memory import ConversationMemory
+
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def ask(question):
+        async with semaphore:
+            start = time.perf_counter()
+            await agent.answer(ConversationMemory(), question)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(0, len(questions), concurrency):
+        await asyncio.gather(*(ask(q) for q in questions[i:i + concurrency]))
+    return time.perf_counter() - start, np.mean(latencies) * 1000
+
+
+async def main_async(args):
+    llm = FakeLLMServer(latency_ms=args.llm_latency_ms).start()
+    os.environ["GROQ_BASE_URL"] = llm.base_url
+    os.environ.setdefault("GROQ_API_KEY", "test")
+    os.environ.setdefault("GROQ_MODEL", "fake-llm")
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+    sys.path.insert(0, CHATBOT_DIR)
+    from agent import Agent
+    from semantic_cache import SemanticCache
+
+    rng = np.random.default_rng(0)
+    topics = np.minimum(rng.zipf(1.3, args.questions), args.topics) - 1
+    wordings = rng.integers(0, args.phrasings, args.questions)
+    questions = [f"topic {t} wording {w}" for t, w in zip(topics, wordings)]
+
+    retriever = ParaphraseRetriever(args.retrieval_ms)
+    agent = Agent(retriever=retriever)
+    for name, cache in (("disabled", SemanticCache(chunk_threshold=2.0)), ("enabled", SemanticCache())):
+        agent.cache = cache
+        before = llm.requests
+        elapsed, mean_ms = await replay(agent, questions)
+        stats = cache.stats()
+        print(f"cache {name:<8} | {elapsed:6.2f} s | mean latency={mean_ms:7.1f} ms | LLM calls={llm.requests - before:4d} "
+              f"| chunk hit rate={stats['hit_rate']:.2f} | answer hit rate={stats['answer_hit_rate']:.2f}")
+
+    retriever.version += 1
+    await replay(agent, questions[:8])
+    print(f"after index rebuild: {agent.cache.stats()}")
+    llm.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=300)
+    parser.add_argument("--topics", type=int, default=40)
+    parser.add_argument("--phrasings", type=int, default=3)
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--retrieval-ms", type=float, default=15)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+"""
+End-to-end benchmark suite with local stand-ins, compared against a stored baseline.
+
+Each target runs in a fresh subprocess, so its peak RSS is its own:
+
+* upload: ``api/main.py`` under uvicorn, ``--upload-clients`` clients posting distinct
+  synthetic JPEGs to ``/upload_image/file``, detected by a randomly initialised YOLO
+  built from ``yolov8n.yaml`` (or ``--weights``). Random weights detect almost nothing,
+  so nutrition lookup is barely exercised; decoding, preprocessing and the model are.
+* retrieval: ``Retriever.retrieve_chunks`` from ``--retrieval-clients`` threads over a
+  synthetic flat index of ``--vectors`` vectors (see agent_startup.py and query_batching.py).
+* chat: the gateway (``chatbot/main.py``) and the ``Agent``, with the real retriever over
+  the same synthetic corpus, against ``FakeLLMServer`` streaming replies after
+  ``--llm-latency-ms``. Every reply must reach the client that asked.
+
+The embedding model is a randomly initialised one of MiniLM-L6's shape unless
+``--embedder model``. Keyword search is left out unless HYBRID_SEARCH=1 (the synthetic
+chunks share their words). Every target reports throughput, p50/p95/p99 latency in ms,
+peak RSS in MB and errors, written as JSON with the machine and commit they ran on.
+
+With a baseline (``--baseline``, written by ``--save-baseline``) each metric is compared
+with it: latency and RSS more than ``--tolerance`` above, or throughput more than
+``--tolerance`` below, is a regression, and the suite exits with status 1. Targets run
+with different settings than their baseline are not compared. Baselines only compare
+on the machine they were recorded on.
+
+Usage (from the repository root):
+    python benchmarks/suite.py --save-baseline
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --targets retrieval chat --tolerance 0.25
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+API_DIR = os.path.join(ROOT_DIR, "api")
+CHATBOT_DIR = os.path.join(ROOT_DIR, "chatbot")
+sys.path.insert(0, BENCH_DIR)
+
+TARGETS = ("upload", "retrieval", "chat")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+# Metrics compared with the baseline: name -> True when higher is better
+COMPARED = {"throughput": True, "p50_ms": False, "p95_ms": False, "p99_ms": False, "peak_rss_mb": False}
+
+
+def summarize(latencies, elapsed: float, errors: int = 0, **extra) -> dict:
+    """Throughput (per second) and latency percentiles (ms) of one run."""
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000 if latencies else (0.0, 0.0, 0.0)
+    return {"requests": len(latencies), "errors": errors, "throughput": len(latencies) / elapsed,
+            "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99), **extra}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def synthetic_images(count: int, width: int = 1280, height: int = 960, seed: int = 0) -> list:
+    """Distinct JPEGs of coloured blobs on a plate, so no upload hits the detection cache."""
+    from PIL import Image, ImageDraw
+
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        image = Image.new("RGB", (width, height), tuple(int(c) for c in rng.integers(0, 255, 3)))
+        draw = ImageDraw.Draw(image)
+        draw.ellipse((width * 0.1, height * 0.1, width * 0.9, height * 0.9), fill=(235, 235, 230))
+        for _ in range(6):
+            x, y = rng.integers(width // 5, width * 4 // 5), rng.integers(height // 5, height * 4 // 5)
+            r = int(rng.integers(40, 160))
+            draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(int(c) for c in rng.integers(0, 255, 3)))
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+
+def use_synthetic_embedder():
+    from query_batching import SyntheticModel
+    import processing.retriever as retriever_module
+
+    model = SyntheticModel()
+    retriever_module.load_model = lambda model_name=None: model
+
+
+def run_upload(args, workdir: str) -> dict:
+    weights = args.weights
+    if weights is None:
+        from ultralytics import YOLO
+        weights = os.path.join(workdir, "yolov8n-random.pt")
+        YOLO("yolov8n.yaml").save(weights)
+    os.environ["MODELS"] = f"default={os.path.abspath(weights)}"
+    os.chdir(workdir)
+    sys.path.insert(0, API_DIR)
+
+    import httpx
+    import uvicorn
+    from agent_load import free_port
+    from main import app
+
+    images = synthetic_images(args.upload_clients * args.upload_requests)
+    port = free_port()
+
+    async def main_async():
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        task = asyncio.ensure_future(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+
+        latencies, errors = [], 0
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120) as client:
+            async def post(image):
+                response = await client.post("/upload_image/file", content=image,
+                                             headers={"Content-Type": "image/jpeg"})
+                return response.status_code == 200
+
+            await post(synthetic_images(1, seed=1)[0])  # Warm up outside the measurement
+
+            async def user(offset):
+                nonlocal errors
+                for image in images[offset::args.upload_clients]:
+                    start = time.perf_counter()
+                    if not await post(image):
+                        errors += 1
+                    latencies.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(user(c) for c in range(args.upload_clients)))
+            elapsed = time.perf_counter() - start
+
+        server.should_exit = True
+        await task
+        return summarize(latencies, elapsed, errors, unit="uploads/s")
+
+    return asyncio.run(main_async())
+
+
+def run_retrieval(args, workdir: str) -> dict:
+    from query_batching import questions
+
+    sys.path.insert(0, CHATBOT_DIR)
+    import processing.retriever as retriever_module
+
+    if args.embedder == "synthetic":
+        use_synthetic_embedder()
+    os.chdir(workdir)
+    asked = questions(args.retrieval_questions, repeat=0)
+
+    retriever = retriever_module.Retriever()
+    retriever.load()
+    retriever.retrieve_chunks("warm up")
+    latencies = []
+
+    def timed(query):
+        start = time.perf_counter()
+        retriever.retrieve_chunks(query)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.retrieval_clients) as pool:
+        list(pool.map(timed, asked))
+    return summarize(latencies, time.perf_counter() - start, unit="questions/s")
+
+
+def run_chat(args, workdir: str) -> dict:
+    from agent_load import free_port
+    from fake_llm import FakeLLMServer
+    from gateway_load import ask, wait_for
+
+    llm = FakeLLMServer(latency_ms=args.llm_latency_ms, echo=True, token_ms=args.token_ms).start()
+    agent_port, gateway_port = free_port(), free_port()
+    os.environ.update({
+        "GROQ_BASE_URL": llm.base_url,
+        "GROQ_API_KEY": os.getenv("GROQ_API_KEY", "test"),
+        "GROQ_MODEL": "fake-llm",
+        "AGENT_WS_URL": f"ws://127.0.0.1:{agent_port}",
+        # Random embeddings are not similar to any chunk; let every question reach the LLM
+        "RETRIEVAL_MIN_SCORE": "-1",
+    })
+    sys.path.insert(0, CHATBOT_DIR)
+    import uvicorn
+    import websockets
+    from agent import Agent
+    from main import app, pool
+
+    # After the chatbot imports: query_batching puts benchmarks/ first on the path
+    if args.embedder == "synthetic":
+        use_synthetic_embedder()
+    os.chdir(workdir)
+
+    async def main_async():
+        agent = Agent()
+        agent_server = asyncio.ensure_future(agent.start_server("127.0.0.1", agent_port))
+        gateway = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=gateway_port, log_level="warning"))
+        gateway_task = asyncio.ensure_future(gateway.serve())
+        await wait_for(lambda: gateway.started and pool.connected, timeout=120)
+        url = f"ws://127.0.0.1:{gateway_port}/ws"
+        async with websockets.connect(url) as ws:
+            await ask(ws, "warm up")
+
+        first_tokens, latencies, errors = [], [], 0
+
+        async def user(client_id):
+            nonlocal errors
+            async with websockets.connect(url) as ws:
+                for i in range(args.chat_messages):
+                    question = f"user {client_id} asks about protein and fibre, question {i}"
+                    reply, first_token, latency = await ask(ws, question)
+                    latencies.append(latency)
+                    first_tokens.append(first_token or latency)
+                    if not reply.startswith(f"[{question}]"):
+                        errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user(c) for c in range(args.chat_clients)))
+        elapsed = time.perf_counter() - start
+
+        gateway.should_exit = True
+        await gateway_task
+        agent_server.cancel()
+        llm.stop()
+        return summarize(latencies, elapsed, errors, unit="messages/s",
+                         ttft_p50_ms=float(np.percentile(first_tokens, 50) * 1000),
+                         ttft_p95_ms=float(np.percentile(first_tokens, 95) * 1000))
+
+    return asyncio.run(main_async())
+
+
+def settings(args, target: str) -> dict:
+    """The arguments a target's numbers depend on; runs are only compared when they match."""
+    names = {
+        "upload": ("upload_clients", "upload_requests", "weights"),
+        "retrieval": ("retrieval_clients", "retrieval_questions", "vectors", "embedder"),
+        "chat": ("chat_clients", "chat_messages", "llm_latency_ms", "token_ms", "vectors", "embedder"),
+    }[target]
+    return {name: getattr(args, name) for name in names}
+
+
+def run_target_in_subprocess(target: str, workdir: str) -> dict:
+    env = dict(os.environ, HF_HUB_OFFLINE=os.getenv("HF_HUB_OFFLINE", "1"), LOG_LEVEL="WARNING")
+    env.setdefault("HYBRID_SEARCH", "0")
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), *sys.argv[1:], "--child", target,
+                                "--workdir", workdir],
+                               env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else
+                f"exit status {completed.returncode}"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"), "commit": commit,
+            "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Print each metric against the baseline and return the regressions."""
+    regressions = []
+    for target, result in results.items():
+        before = baseline.get("targets", {}).get(target)
+        if "error" in result or not before or "error" in before:
+            print(f"{target:<10} | no baseline to compare with")
+            continue
+        if before.get("settings") != result["settings"]:
+            print(f"{target:<10} | baseline ran with {before.get('settings')}, not compared")
+            continue
+        for metric, higher_is_better in COMPARED.items():
+            old, new = before[metric], result[metric]
+            change = (new - old) / old if old else 0.0
+            worse = change < -tolerance if higher_is_better else change > tolerance
+            if worse:
+                regressions.append(f"{target} {metric}")
+            print(f"{target:<10} | {metric:<12} | {old:10.2f} -> {new:10.2f} | {change:+7.1%}"
+                  f"{'  REGRESSION' if worse else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=list(TARGETS))
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative change before a regression")
+    parser.add_argument("--upload-clients", type=int, default=8)
+    parser.add_argument("--upload-requests", type=int, default=8, help="Uploads per client")
+    parser.add_argument("--weights", help="Detection weights (default: randomly initialised yolov8n)")
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--embedder", choices=("model", "synthetic"), default="synthetic")
+    parser.add_argument("--retrieval-clients", type=int, default=16)
+    parser.add_argument("--retrieval-questions", type=int, default=1000)
+    parser.add_argument("--chat-clients", type=int, default=16)
+    parser.add_argument("--chat-messages", type=int, default=5, help="Messages per client")
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="Time to the first LLM token")
+    parser.add_argument("--token-ms", type=float, default=20, help="Delay between LLM tokens")
+    parser.add_argument("--child", choices=TARGETS, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = {"upload": run_upload, "retrieval": run_retrieval, "chat": run_chat}[args.child](args, args.workdir)
+        result["peak_rss_mb"] = peak_rss_mb()
+        print(json.dumps(result))
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        if {"retrieval", "chat"} & set(args.targets):
+            # Built here, so the targets' peak RSS is the services' own
+            sys.path.insert(0, CHATBOT_DIR)
+            from agent_startup import build_corpus
+            build_corpus(workdir, args.vectors)
+        for target in args.targets:
+            results[target] = run_target_in_subprocess(target, workdir)
+    for target, result in results.items():
+        result["settings"] = settings(args, target)
+        results[target] = result
+        if "error" in result:
+            print(f"{target:<10} | failed: {result['error']}")
+        else:
+            print(f"{target:<10} | {result['throughput']:8.2f} {result['unit']:<12} | p50 {result['p50_ms']:8.1f} ms "
+                  f"| p95 {result['p95_ms']:8.1f} ms | p99 {result['p99_ms']:8.1f} ms "
+                  f"| peak RSS {result['peak_rss_mb']:7.1f} MB | errors {result['errors']}")
+    report = {"environment": environment(), "targets": results}
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    failed = [target for target, result in results.items() if "error" in result or result.get("errors")]
+    regressions = []
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"=== Compared with the baseline from {baseline['environment']['timestamp']} "
+              f"(commit {baseline['environment']['commit']}), tolerance {args.tolerance:.0%} ===")
+        regressions = compare(results, baseline, args.tolerance)
+    else:
+        print(f"No baseline at {args.baseline}; record one with --save-baseline")
+    if failed or regressions:
+        raise SystemExit(f"Failed: {failed or 'none'}; regressions: {regressions or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
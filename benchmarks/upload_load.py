@@ -0,0 +1,99 @@
+"""
+Load benchmark for the meal detection path.
+
+Compares today's path (``predict_meal`` called directly inside the async handler,
+blocking the event loop) against the batched ``InferenceEngine`` at several levels
+of concurrency, and reports throughput and p50/p99 latency.
+
+Usage (from the repository root):
+    python benchmarks/upload_load.py --image api/data/meal_20251117_204800.png
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+API_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "api"))
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+
+async def run_clients(call, image_path, clients, requests_per_client):
+    latencies = []
+
+    async def client():
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            await call(image_path)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", default=os.path.join(API_DIR, "data", "meal_20251117_204800.png"))
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=8, help="Requests per client")
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    parser.add_argument("--json", help="Optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    image_path = os.path.abspath(args.image)
+    # predict.py resolves the model path relative to the api directory
+    os.chdir(API_DIR)
+    sys.path.insert(0, API_DIR)
+    from predict import predict_meal, predict_batch
+    from inference import InferenceEngine
+
+    async def legacy(path):
+        return predict_meal(path)
+
+    engine = InferenceEngine(
+        predict_batch,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        queue_size=max(args.clients) * 2,
+    )
+    engine.start()
+
+    # Warm up both paths so model initialisation is not measured
+    predict_meal(image_path)
+    asyncio.run(engine.predict(image_path))
+
+    results = []
+    for clients in args.clients:
+        for name, call in (("legacy", legacy), ("batched", engine.predict)):
+            row = asyncio.run(run_clients(call, image_path, clients, args.requests))
+            row["path"] = name
+            results.append(row)
+            print(
+                f"{name:>8} | clients={clients:<3} | {row['throughput_rps']:7.2f} req/s "
+                f"| p50={row['p50_ms']:8.1f} ms | p99={row['p99_ms']:8.1f} ms"
+            )
+    engine.stop()
+    print(f"📊 Engine stats: {engine.stats()}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
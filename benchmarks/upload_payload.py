@@ -0,0 +1,97 @@
+"""
+Memory/throughput benchmark for upload body handling.
+
+Compares the JSON endpoint (data-URL string parsed by pydantic, split, base64-decoded)
+with the streaming /upload_image/file path (raw body collected chunk by chunk into a
+single buffer) on synthetic 4, 8 and 12 MP phone-sized JPEGs. Only the body handling
+is measured; image decoding and detection are identical for both paths.
+
+Usage (from the repository root):
+    python benchmarks/upload_payload.py --megapixels 4 8 12
+"""
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+from pydantic import BaseModel
+
+API_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "api"))
+sys.path.insert(0, API_DIR)
+
+from images import decode_data_url  # noqa: E402
+from uploads import read_stream  # noqa: E402
+
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadImageRequest(BaseModel):
+    # Same schema as api/main.py, redeclared so the model is not loaded
+    image: str
+
+
+def synthetic_photo(megapixels: float) -> bytes:
+    """Encode a noisy 4:3 JPEG of roughly the requested size."""
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    noise = rng.normal(0, 25, (height, width, 3)).astype(np.float32)
+    pixels = np.clip(gradient + noise, 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def json_path(body: bytes) -> int:
+    request = UploadImageRequest(**json.loads(body))
+    return len(decode_data_url(request.image))
+
+
+def raw_path(body: bytes) -> int:
+    async def chunks():
+        for i in range(0, len(body), CHUNK_SIZE):
+            yield body[i:i + CHUNK_SIZE]
+    return len(asyncio.run(read_stream(chunks(), len(body))))
+
+
+def measure(fn, body: bytes, repeats: int):
+    tracemalloc.start()
+    fn(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(body)
+    elapsed = time.perf_counter() - start
+    return peak, repeats / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[4, 8, 12])
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    for mp in args.megapixels:
+        photo = synthetic_photo(mp)
+        json_body = json.dumps({"image": "data:image/jpeg;base64," + base64.b64encode(photo).decode()}).encode()
+        print(f"📷 {mp:g} MP photo: {len(photo) / 1e6:.1f} MB JPEG")
+        for name, fn, body in (("json", json_path, json_body), ("stream", raw_path, photo)):
+            peak, rate = measure(fn, body, args.repeats)
+            print(
+                f"{name:>8} | body={len(body) / 1e6:6.1f} MB | peak alloc={peak / 1e6:6.1f} MB "
+                f"({peak / len(photo):4.1f}x photo) | {rate:7.1f} uploads/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,78 @@
 import asyncio
+import json
+import logging
+import time
 import websockets
 import groq
 import os
+from collections import OrderedDict
+from http import HTTPStatus
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from dotenv import load_dotenv
+from memory import ConversationMemory
+from observability import TURNS, configure_logging, metrics, observe, request_id_var, span
+from semantic_cache import SemanticCache
 import nest_asyncio
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from processing.retriever import retrieve_chunks  
 
 # Load environment variables
 load_dotenv()
 nest_asyncio.apply()
 
+AGENT_HOST = os.getenv("AGENT_HOST", "localhost")
+AGENT_PORT = int(os.getenv("AGENT_PORT", "8765"))
+# Threads running embedding + FAISS search, so retrieval never blocks the event loop
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", "4"))
+# Maximum LLM requests in flight across all connections
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+# Conversations kept for multiplexed clients (least recently used dropped first)
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "1000"))
+# Load the retriever in the background as soon as the server starts (otherwise on the first question)
+AGENT_WARM_UP = os.getenv("AGENT_WARM_UP", "1") == "1"
+# Agent processes, on consecutive ports from AGENT_PORT, forked after loading the retriever once
+AGENT_WORKERS = int(os.getenv("AGENT_WORKERS", "1"))
+
+logger = logging.getLogger("chatbot.agent")
+
+NO_CONTEXT_REPLY = "I’m sorry, the context provided does not contain enough detail about this topic."
+
+
+class LLMError(RuntimeError):
+    """Raised when the LLM fails or times out while generating a reply."""
+
 
 class Agent:
     _instance = None
 
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
-            cls._instance = super(Agent, cls).__new__(cls, *args, **kwargs)
+            cls._instance = super(Agent, cls).__new__(cls)
         return cls._instance
 
-    def __init__(self):
+    def __init__(self, retriever=None, client=None, cache=None):
         if hasattr(self, '_initialized') and self._initialized:
             return
         self._initialized = True
-        self.client = groq.Client(api_key=os.getenv("GROQ_API_KEY"))
+        self.client = client or groq.AsyncGroq(
+            api_key=os.getenv("GROQ_API_KEY"),
+            timeout=LLM_TIMEOUT,
+        )
         self.system_prompt_template = None
-        self.retriever = retrieve_chunks
+        if retriever is None:
+            # Anything with embed_query(query), search(embedding, top_k, query=...) and index_version();
+            # optionally ready, status(), stats(), warm_up() and submit_embedding(query)
+            from processing.retriever import retriever
+        self.retriever = retriever
+        self.cache = cache or SemanticCache()
+        self.executor = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="retrieval")
+        self.llm_semaphore = None  # Created lazily inside the running event loop
+        self.sessions = OrderedDict()  # session id -> (lock, memory)
+        self.turns = 0
+        self.prompt_tokens = 0
+        self.no_context = 0  # questions answered without an LLM call: nothing scored above the threshold
 
     def getSystemPrompt(self, top_k_chunks, user_question):
         return f"""
@@ -52,70 +97,369 @@ class Agent:
             Your Answer (Based on Context Only):
             """
     
-    async def handle_connection(self, websocket, path=None):
-        print("🤖 Agent ready for queries.")
-        messages = [{"role": "system", "content": "You are a helpful nutrition assistant."}]
+    def _embed(self, query: str):
+        return self.retriever.embed_query(query), self.retriever.index_version()
 
-        while True:
+    async def embed(self, query: str):
+        """
+        Embed the question on the retrieval thread pool, or, when the retriever batches
+        embeddings, await its batch without holding a pool thread.
+
+        Returns:
+            Tuple[np.ndarray, Any]: The query embedding and the version of the index it will be searched against.
+        """
+        loop = asyncio.get_running_loop()
+        submit = getattr(self.retriever, "submit_embedding", None)
+        with span("embed"):
+            if submit is None:
+                return await loop.run_in_executor(self.executor, self._embed, query)
+            embedding = await asyncio.wrap_future(submit(query))
+        return embedding, await loop.run_in_executor(self.executor, self.retriever.index_version)
+
+    async def search(self, embedding, top_k: int = 5, query: str = None):
+        """
+        Run the (CPU-bound) FAISS and keyword search on the retrieval thread pool.
+        """
+        loop = asyncio.get_running_loop()
+        with span("search"):
+            return await loop.run_in_executor(self.executor, partial(self.retriever.search, embedding, top_k=top_k,
+                                                                     query=query))
+
+    async def stream_complete(self, messages):
+        """
+        Stream the LLM reply as text deltas, bounded by LLM_MAX_CONCURRENCY.
+
+        LLM_TIMEOUT applies to the first token and to every gap between tokens.
+        """
+        if self.llm_semaphore is None:
+            self.llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        async with self.llm_semaphore:
+            with span("llm"):
+                start = time.perf_counter()
+                first_token = True
+                stream = await asyncio.wait_for(
+                    self.client.chat.completions.create(
+                        model=os.getenv("GROQ_MODEL"),
+                        messages=messages,
+                        stream=True
+                    ),
+                    timeout=LLM_TIMEOUT
+                )
+                # Closing releases the HTTP connection and stops the LLM generating (and billing)
+                # tokens nobody reads: on cancellation, timeout or when the consumer stops early
+                async with stream:
+                    chunks = stream.__aiter__()
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), timeout=LLM_TIMEOUT)
+                        except StopAsyncIteration:
+                            break
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            if first_token:
+                                first_token = False
+                                observe("llm_first_token", time.perf_counter() - start)
+                            yield chunk.choices[0].delta.content
+
+    async def answer_stream(self, memory: ConversationMemory, message: str):
+        """
+        Answer one user message with retrieved context, yielding the reply as it is generated.
+        The turn is added to the conversation memory once the reply is complete.
+
+        Args:
+            memory (ConversationMemory): Conversation history for this user.
+            message (str): The user's question.
+
+        Raises:
+            LLMError: The LLM failed or timed out; text already yielded is partial.
+        """
+        # A near-identical question asked before reuses its chunks, and its answer in a fresh conversation
+        embedding, version = await self.embed(message)
+        standalone = not memory.turns and not memory.earlier_questions
+        hit = self.cache.lookup(embedding, version)
+        if hit is not None and hit.answer is not None and standalone:
+            memory.record(message, hit.answer)
+            TURNS.labels("cached_answer").inc()
+            yield hit.answer
+            return
+
+        # Retrieve context; chunks below the relevance threshold are already dropped
+        relevant_chunks = hit.chunks if hit is not None else await self.search(embedding, top_k=5, query=message)
+        if not relevant_chunks:
+            self.no_context += 1
+            TURNS.labels("no_context").inc()
+            yield NO_CONTEXT_REPLY
+            return
+
+        # Single current system prompt, recent history and the question, within the token budget
+        loop = asyncio.get_running_loop()
+        with span("prompt"):
+            messages = await loop.run_in_executor(self.executor, partial(
+                memory.build, message, relevant_chunks, lambda context: self.getSystemPrompt(context, message)))
+        self.turns += 1
+        self.prompt_tokens += memory.last_prompt_tokens
+        logger.debug("🧮 Prompt tokens: %d (%d past turns kept)", memory.last_prompt_tokens, len(memory.turns))
+
+        # Stream LLM response safely
+        parts = []
+        try:
+            deltas = self.stream_complete(messages)
             try:
-                message = await websocket.recv()
-                print(f"📨 Received from client: {message}")
+                async for delta in deltas:
+                    parts.append(delta)
+                    yield delta
+            finally:
+                # Closed explicitly, so the LLM stream is released even if this generator is abandoned
+                await deltas.aclose()
+        except asyncio.TimeoutError:
+            error = LLMError("❌ Error generating response from LLM: request timed out")
+        except Exception as e:
+            error = LLMError(f"❌ Error generating response from LLM: {e}")
+        else:
+            reply = "".join(parts)
+            memory.record(message, reply)
+            self.cache.put(embedding, relevant_chunks, reply if standalone else None, version)
+            TURNS.labels("answered").inc()
+            return
+        TURNS.labels("llm_error").inc()
+        logger.warning("%s", error)
+        raise error
 
-                # Retrieve context
-                relevant_chunks = self.retriever(message, top_k=5)
-                if not relevant_chunks:
-                    await websocket.send("I’m sorry, the context provided does not contain enough detail about this topic.")
-                    continue
+    async def answer(self, memory: ConversationMemory, message: str) -> str:
+        """
+        Non-streaming form of `answer_stream`; LLM errors are returned as the reply text.
+        """
+        parts = []
+        try:
+            async for delta in self.answer_stream(memory, message):
+                parts.append(delta)
+        except LLMError as e:
+            return str(e)
+        return "".join(parts)
 
-                # Prepare context string
-                context = "\n\n".join([
-                    f"[Source: {os.path.basename(chunk['source'])}]\n{chunk['text']}"
-                    for chunk in relevant_chunks
-                ])
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self.sessions),
+            "turns": self.turns,
+            "prompt_tokens": self.prompt_tokens,
+            "avg_prompt_tokens": self.prompt_tokens / self.turns if self.turns else 0.0,
+            "no_context": self.no_context,
+            "retriever": self.readiness()["retriever"],
+            "retrieval": self.retriever.stats() if hasattr(self.retriever, "stats") else None,
+            "semantic_cache": self.cache.stats(),
+        }
 
-                # Prepare system prompt
-                system_prompt = self.getSystemPrompt(context, message)
+    def readiness(self) -> dict:
+        """Whether questions can be answered without waiting for the retriever to load."""
+        status = getattr(self.retriever, "status", None)
+        return {
+            "ready": getattr(self.retriever, "ready", True),
+            "retriever": status() if status is not None else None,
+        }
 
-                # Add messages
-                messages.append({"role": "system", "content": system_prompt})
-                messages.append({"role": "user", "content": message})
+    def session(self, session_id: str):
+        """
+        Lock and history of a multiplexed session, created on first use.
+        """
+        if session_id in self.sessions:
+            self.sessions.move_to_end(session_id)
+        else:
+            self.sessions[session_id] = (asyncio.Lock(), ConversationMemory())
+            while len(self.sessions) > MAX_SESSIONS:
+                self.sessions.popitem(last=False)
+        return self.sessions[session_id]
 
-                # Get LLM response safely
-                try:
-                    response = self.client.chat.completions.create(
-                        model=os.getenv("GROQ_MODEL"),
-                        messages=messages
-                    )
-                    llm_reply = response.choices[0].message.content
-                except Exception as e:
-                    llm_reply = f"❌ Error generating response from LLM: {e}"
+    async def handle_request(self, websocket, request: dict):
+        """
+        Serve one framed request: {"id": ..., "session": ..., "message": ...}.
+
+        The reply is streamed back as frames carrying the request id:
+        {"type": "start"}, any number of {"type": "delta", "text": ...}, then
+        {"type": "end"} or {"type": "error", "text": ...}.
+
+        Requests of different sessions run concurrently; requests of the same session
+        are serialised so its history stays in order.
+        """
+        request_id = request["id"]
+        request_id_var.set(str(request_id))  # This task's context: tags its logs
+        lock, memory = self.session(str(request.get("session", request_id)))
+
+        async def send(frame_type, text=None):
+            frame = {"id": request_id, "type": frame_type}
+            if text is not None:
+                frame["text"] = text
+            await websocket.send(json.dumps(frame))
+
+        try:
+            async with lock:
+                await send("start")
+                async for delta in self.answer_stream(memory, request["message"]):
+                    await send("delta", delta)
+            await send("end")
+        except websockets.ConnectionClosed:
+            pass
+        except LLMError as e:
+            await self._send_error(send, str(e))
+        except Exception as e:
+            logger.exception("⚠️ Unexpected error: %s", e)
+            await self._send_error(send, f"❌ Unexpected error: {e}")
+
+    @staticmethod
+    async def _send_error(send, text):
+        try:
+            await send("error", text)
+        except websockets.ConnectionClosed:
+            pass
+
+    @staticmethod
+    def parse_request(message):
+        """Return the request dict if `message` is a framed request or cancellation, else None."""
+        if not isinstance(message, str) or not message.startswith("{"):
+            return None
+        try:
+            request = json.loads(message)
+        except json.JSONDecodeError:
+            return None
+        if isinstance(request, dict) and "id" in request and (
+                "message" in request or request.get("type") in ("cancel", "status")):
+            return request
+        return None
+
+    async def handle_connection(self, websocket, path=None):
+        """
+        Serve a client connection.
+
+        Framed JSON requests (sent by the gateway) are multiplexed: each one runs in its
+        own task and streams its reply under the request id; {"id": ..., "type": "cancel"}
+        stops a request the client gave up on, and {"id": ..., "type": "status"} is
+        answered with the agent's readiness. Plain-text messages keep the original
+        one-question-one-answer behaviour with a per-connection history.
+        """
+        logger.info("🤖 Agent ready for queries.")
+        memory = ConversationMemory()
+        tasks = {}  # request id -> task
+
+        while True:
+            try:
+                message = await websocket.recv()
+                request = self.parse_request(message)
+                if request is not None:
+                    request_id = request["id"]
+                    if request.get("type") == "cancel":
+                        if request_id in tasks:
+                            tasks[request_id].cancel()
+                        continue
+                    if request.get("type") == "status":
+                        await websocket.send(json.dumps({"id": request_id, "type": "status",
+                                                         "status": self.readiness()}))
+                        continue
+                    task = asyncio.ensure_future(self.handle_request(websocket, request))
+                    tasks[request_id] = task
+                    task.add_done_callback(lambda _, request_id=request_id: tasks.pop(request_id, None))
+                    continue
+
+                logger.debug("📨 Received from client: %s", message)
+                llm_reply = await self.answer(memory, message)
 
                 # Send reply to client
                 await websocket.send(llm_reply)
-                print(f"🤖 Sent: {llm_reply[:80]}...")
-
-                # Append assistant response
-                messages.append({"role": "assistant", "content": llm_reply})
+                logger.debug("🤖 Sent: %.80s...", llm_reply)
 
             except websockets.ConnectionClosed:
-                print("❌ Client disconnected.")
+                logger.info("❌ Client disconnected.")
+                for task in list(tasks.values()):
+                    task.cancel()
                 break
             except Exception as e:
-                print(f"⚠️ Unexpected error: {e}")
+                logger.exception("⚠️ Unexpected error: %s", e)
                 await websocket.send(f"❌ Unexpected error: {e}")
 
-    async def start_server(self):
+    def process_request(self, connection, request):
+        """
+        Plain HTTP endpoints on the websocket port: GET /health (the process is up),
+        GET /ready (200 once the retriever is loaded, 503 before) and GET /metrics
+        (Prometheus). Other paths are websocket handshakes.
+        """
+        if request.path == "/metrics":
+            body, content_type = metrics()
+            response = connection.respond(HTTPStatus.OK, body.decode())
+        elif request.path in ("/health", "/ready"):
+            status = {"status": "ok"} if request.path == "/health" else self.readiness()
+            ok = request.path == "/health" or status["ready"]
+            response = connection.respond(HTTPStatus.OK if ok else HTTPStatus.SERVICE_UNAVAILABLE,
+                                          json.dumps(status) + "\n")
+            content_type = "application/json"
+        else:
+            return None
+        del response.headers["Content-Type"]
+        response.headers["Content-Type"] = content_type
+        return response
+
+    async def start_server(self, host=AGENT_HOST, port=AGENT_PORT):
+        if AGENT_WARM_UP and hasattr(self.retriever, "warm_up"):
+            self.retriever.warm_up()
         async with websockets.serve(
             self.handle_connection,
-            "localhost",
-            8765,
+            host,
+            port,
+            process_request=self.process_request,
             ping_interval=3600,
             ping_timeout=3600
         ):
-            print("WebSocket server started on ws://localhost:8765")
+            logger.info("WebSocket server started on ws://%s:%s", host, port)
             await asyncio.Future()
 
 
+def limit_threads(threads: int):
+    """Size the PyTorch and FAISS thread pools, of those already imported."""
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+    if "faiss" in sys.modules:
+        sys.modules["faiss"].omp_set_num_threads(threads)
+
+
+def serve_workers(workers: int = AGENT_WORKERS, host=AGENT_HOST, port=AGENT_PORT):
+    """
+    Run `workers` agent processes on ports `port` to `port + workers - 1`.
+
+    The embedding model, FAISS index and metadata store are loaded once, here, and
+    shared copy-on-write with the forked processes (the index is memory-mapped, so its
+    pages are shared anyway; see common/prefork.py). Conversations live in the process
+    that serves them: list every port in the gateway's AGENT_WS_URL, which keeps each
+    session on one agent. With the onnxruntime embedder every process loads its own retriever.
+    """
+    from common.prefork import run_workers
+    from processing.embedder import EMBEDDING_BACKEND
+    from processing.retriever import retriever
+
+    preloaded = EMBEDDING_BACKEND != "onnxruntime"
+    if preloaded:
+        try:
+            retriever.load()
+            limit_threads(1)  # Before the warm-up starts a pool
+            retriever.preload()
+        except Exception as e:
+            logger.warning("⚠️ Retriever not preloaded, each agent will load its own: %s", e)
+            preloaded = False
+    urls = ",".join(f"ws://{host}:{port + i}" for i in range(workers))
+    logger.info("Starting %d agents, set AGENT_WS_URL=%s on the gateway", workers, urls)
+
+    def serve(index: int):
+        # The loop nest_asyncio made at import would share its epoll instance with the other processes
+        asyncio.get_event_loop().close()
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        nest_asyncio.apply(loop)
+        if preloaded:
+            retriever.after_fork()
+        asyncio.run(Agent().start_server(host, port + index))
+
+    run_workers(workers, serve, limit_threads)
+
+
 if __name__ == "__main__":
-    agent = Agent()
-    asyncio.run(agent.start_server())
+    configure_logging()
+    if AGENT_WORKERS > 1:
+        serve_workers()
+    else:
+        agent = Agent()
+        asyncio.run(agent.start_server())
@@ -0,0 +1,329 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import uuid
+import zlib
+
+import websockets
+
+# Several agent processes are listed separated by commas; each session sticks to one of them
+AGENT_WS_URL = os.getenv("AGENT_WS_URL", "ws://localhost:8765")
+# Websocket connections kept open to each agent
+AGENT_POOL_SIZE = int(os.getenv("AGENT_POOL_SIZE", "2"))
+# Requests a single connection carries at once; further requests wait for a slot
+AGENT_MAX_IN_FLIGHT = int(os.getenv("AGENT_MAX_IN_FLIGHT", "32"))
+# Requests allowed to wait or run across the pool before new ones are refused
+AGENT_MAX_PENDING = int(os.getenv("AGENT_MAX_PENDING", "256"))
+AGENT_REQUEST_TIMEOUT = float(os.getenv("AGENT_REQUEST_TIMEOUT", "90"))
+AGENT_STATUS_TIMEOUT = float(os.getenv("AGENT_STATUS_TIMEOUT", "2"))  # Seconds to wait for a readiness report
+AGENT_RECONNECT_MIN = float(os.getenv("AGENT_RECONNECT_MIN", "0.5"))
+AGENT_RECONNECT_MAX = float(os.getenv("AGENT_RECONNECT_MAX", "30"))
+
+logger = logging.getLogger("chatbot.agent_client")
+
+
+class AgentUnavailableError(ConnectionError):
+    """Raised when no connection to the agent is open or it dropped mid-request."""
+
+
+class AgentBusyError(RuntimeError):
+    """Raised when the pool already holds its maximum number of pending requests."""
+
+
+class AgentConnection:
+    """
+    One websocket to the agent carrying many concurrent requests.
+
+    Every request is sent as a JSON frame with a unique id; a single reader task
+    routes the agent's frames back to the waiting request by that id. When the
+    socket drops, pending requests fail with `AgentUnavailableError` and the
+    connection is re-opened with exponential backoff.
+
+    Args:
+        url (str): Agent websocket URL.
+        max_in_flight (int): Concurrent requests on this connection.
+    """
+
+    def __init__(self, url: str, max_in_flight: int = AGENT_MAX_IN_FLIGHT):
+        self.url = url
+        self.max_in_flight = max_in_flight
+        self.ws = None
+        self.pending = {}  # request id -> asyncio.Queue of frames
+        self.slots = asyncio.Semaphore(max_in_flight)
+        self.connected = asyncio.Event()
+        self.reconnects = 0
+        self._task = None
+        self._closing = False
+
+    @property
+    def load(self) -> int:
+        return len(self.pending)
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def close(self):
+        self._closing = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self.ws is not None:
+            await self.ws.close()
+        self._fail_pending("Agent connection closed")
+
+    async def _run(self):
+        delay = AGENT_RECONNECT_MIN
+        while not self._closing:
+            try:
+                self.ws = await websockets.connect(self.url, ping_interval=20, ping_timeout=20)
+            except (OSError, websockets.WebSocketException) as e:
+                logger.warning("❌ Failed to connect to Agent: %s, retrying in %.1fs", e, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, AGENT_RECONNECT_MAX)
+                continue
+
+            logger.info("✅ Connected to Agent WebSocket %s", self.url)
+            delay = AGENT_RECONNECT_MIN
+            self.connected.set()
+            ws = self.ws
+            try:
+                async for raw in ws:
+                    self._dispatch(raw)
+            except websockets.ConnectionClosed:
+                pass
+            except Exception:
+                # Whatever broke the reader, drop this connection and start a fresh one
+                logger.exception("❌ Agent connection reader failed")
+                await ws.close()
+            finally:
+                self.connected.clear()
+                self.ws = None
+                self._fail_pending("Agent connection lost")
+            if not self._closing:
+                self.reconnects += 1
+                logger.warning("🔌 Agent connection lost, reconnecting...")
+
+    def _dispatch(self, raw):
+        try:
+            frame = json.loads(raw)
+        except json.JSONDecodeError:
+            frame = None
+        if not isinstance(frame, dict):
+            logger.warning("⚠️ Ignoring unframed agent message: %.80s", raw)
+            return
+        queue = self.pending.get(frame.get("id"))
+        if queue is not None:  # Late frames of timed-out requests are dropped
+            queue.put_nowait(frame)
+
+    def _fail_pending(self, reason: str):
+        for queue in self.pending.values():
+            queue.put_nowait({"type": "error", "text": reason, "unavailable": True})
+
+    async def stream(self, session: str, message: str, deadline: float, request_id: str = None):
+        """
+        Send one message and yield the agent's frames for it (start, delta..., end or error).
+
+        Args:
+            deadline (float): Event loop time by which the reply must be complete.
+            request_id (str): Frame id, which the agent also logs; a new one when None or already in use.
+
+        Raises:
+            AgentUnavailableError: The connection is down or dropped before the reply.
+            asyncio.TimeoutError: The deadline passed; the agent is told to stop.
+        """
+        loop = asyncio.get_running_loop()
+        async with self.slots:
+            if self.ws is None:
+                raise AgentUnavailableError("Agent is not connected")
+            if request_id is None or request_id in self.pending:
+                request_id = uuid.uuid4().hex
+            queue = self.pending[request_id] = asyncio.Queue()
+            finished = False
+            try:
+                await self.ws.send(json.dumps({"id": request_id, "session": session, "message": message}))
+                while True:
+                    frame = await asyncio.wait_for(queue.get(), max(deadline - loop.time(), 0))
+                    if frame.get("unavailable"):
+                        finished = True
+                        raise AgentUnavailableError(frame["text"])
+                    finished = frame["type"] in ("end", "error")
+                    yield frame
+                    if finished:
+                        return
+            except websockets.ConnectionClosed as e:
+                finished = True
+                raise AgentUnavailableError(str(e))
+            finally:
+                del self.pending[request_id]
+                if not finished:
+                    await self._cancel(request_id)
+
+    async def status(self, timeout: float) -> dict:
+        """
+        The agent's readiness report, {"ready": ..., "retriever": ...}.
+
+        Raises:
+            AgentUnavailableError: The connection is down or dropped before the reply.
+            asyncio.TimeoutError: No reply within `timeout` seconds.
+        """
+        if self.ws is None:
+            raise AgentUnavailableError("Agent is not connected")
+        request_id = uuid.uuid4().hex
+        queue = self.pending[request_id] = asyncio.Queue()
+        try:
+            await self.ws.send(json.dumps({"id": request_id, "type": "status"}))
+            frame = await asyncio.wait_for(queue.get(), timeout)
+        except websockets.ConnectionClosed as e:
+            raise AgentUnavailableError(str(e))
+        finally:
+            del self.pending[request_id]
+        if frame.get("unavailable"):
+            raise AgentUnavailableError(frame["text"])
+        return frame["status"]
+
+    async def _cancel(self, request_id: str):
+        """Stop the agent working on a request nobody waits for anymore."""
+        try:
+            if self.ws is not None:
+                await self.ws.send(json.dumps({"id": request_id, "type": "cancel"}))
+        except websockets.ConnectionClosed:
+            pass
+
+
+class AgentPool:
+    """
+    Fixed set of multiplexed agent connections shared by all gateway clients.
+
+    New requests go to the least loaded open connection. With several agent processes,
+    each session is routed to one agent by rendezvous hashing of its id, since its
+    conversation history lives in that process; only when that agent is unreachable do
+    its sessions move to another (starting a new history there). At most `max_pending`
+    requests may be queued or running at once, beyond that `AgentBusyError` is
+    raised so the gateway can shed load instead of piling up waiters; each request
+    is also bounded by `timeout` seconds.
+
+    Args:
+        url (str): Agent websocket URL, or several separated by commas.
+        size (int): Number of connections to each agent.
+        max_in_flight (int): Concurrent requests per connection.
+        max_pending (int): Requests accepted across the pool.
+        timeout (float): Seconds to wait for a reply.
+    """
+
+    def __init__(self, url: str = AGENT_WS_URL, size: int = AGENT_POOL_SIZE,
+                 max_in_flight: int = AGENT_MAX_IN_FLIGHT, max_pending: int = AGENT_MAX_PENDING,
+                 timeout: float = AGENT_REQUEST_TIMEOUT):
+        self.urls = [u.strip() for u in url.split(",") if u.strip()]
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.connections = [AgentConnection(u, max_in_flight) for u in self.urls for _ in range(size)]
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._order = itertools.count()
+
+    @property
+    def connected(self) -> bool:
+        return any(c.connected.is_set() for c in self.connections)
+
+    async def start(self, wait: float = 5.0):
+        """Open the connections, waiting up to `wait` seconds for the first one."""
+        for connection in self.connections:
+            connection.start()
+        waiters = [asyncio.ensure_future(c.connected.wait()) for c in self.connections]
+        done, _ = await asyncio.wait(waiters, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+        for waiter in waiters:
+            waiter.cancel()
+        if not done:
+            logger.warning("⚠️ Agent not reachable yet, requests will fail until it is")
+
+    async def close(self):
+        await asyncio.gather(*(c.close() for c in self.connections))
+
+    def _pick(self, session: str = None, agent: str = None) -> AgentConnection:
+        open_connections = [c for c in self.connections if c.connected.is_set()]
+        if not open_connections:
+            raise AgentUnavailableError("Agent is not connected")
+        if agent is None and session is not None and len(self.urls) > 1:
+            # The same agent for a session as long as it is reachable, from any gateway process
+            agent = max({c.url for c in open_connections}, key=lambda u: zlib.crc32(f"{u} {session}".encode()))
+        if agent is not None:
+            open_connections = [c for c in open_connections if c.url == agent]
+            if not open_connections:
+                raise AgentUnavailableError(f"Agent {agent} is not connected")
+        # Least loaded first, round robin between equally loaded connections
+        turn = next(self._order)
+        return min(open_connections,
+                   key=lambda c: (c.load, (self.connections.index(c) - turn) % len(self.connections)))
+
+    async def stream(self, session: str, message: str, request_id: str = None):
+        """
+        Ask the agent `message` on behalf of `session`, yielding its reply frames as they arrive:
+        {"type": "start"}, {"type": "delta", "text": ...}, then {"type": "end"} or
+        {"type": "error", "text": ...}. `request_id` is sent as the frame id, so the agent's
+        logs carry the gateway's id for the message.
+
+        Raises:
+            AgentBusyError: Too many requests pending.
+            AgentUnavailableError: No open connection, or it dropped mid-request.
+            asyncio.TimeoutError: The reply did not complete within the timeout.
+        """
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise AgentBusyError("Agent is busy")
+        self.pending += 1
+        try:
+            deadline = asyncio.get_running_loop().time() + self.timeout
+            async for frame in self._pick(session).stream(session, message, deadline, request_id):
+                yield frame
+            self.completed += 1
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.pending -= 1
+
+    async def request(self, session: str, message: str) -> str:
+        """
+        Non-streaming form of `stream`: the complete reply, or the error text.
+        """
+        parts = []
+        async for frame in self.stream(session, message):
+            if frame["type"] in ("delta", "error"):
+                parts.append(frame["text"])
+        return "".join(parts)
+
+    async def status(self, timeout: float = AGENT_STATUS_TIMEOUT) -> dict:
+        """
+        Readiness report of the agent, asked over the least loaded connection. With several
+        agents, {"ready", "agents": {url: report}}, ready only when every agent is.
+        """
+        if len(self.urls) == 1:
+            return await self._pick().status(timeout)
+
+        async def report(url):
+            try:
+                return await self._pick(agent=url).status(timeout)
+            except (AgentUnavailableError, asyncio.TimeoutError) as e:
+                return {"ready": False, "error": str(e) or "Agent did not answer"}
+
+        reports = dict(zip(self.urls, await asyncio.gather(*(report(url) for url in self.urls))))
+        return {"ready": all(r["ready"] for r in reports.values()), "agents": reports}
+
+    def stats(self) -> dict:
+        return {
+            "agents": len(self.urls),
+            "connections": len(self.connections),
+            "connected": sum(c.connected.is_set() for c in self.connections),
+            "reconnects": sum(c.reconnects for c in self.connections),
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
@@ -0,0 +1,240 @@
+"""
+Ingest PDF documents into the FAISS index and metadata store.
+
+Page ranges are parsed in a process pool and streamed, in document order, through the
+chunker into fixed-size embedding batches (one model, loaded once); each batch is added
+to the index and store as soon as it is embedded. Files whose content hash is already in the
+store are skipped; a file whose content changed replaces its previous vectors.
+
+Usage (from the chatbot directory):
+    python ingest.py data/uploads/uploaded_docs          # every PDF under a directory
+    python ingest.py guide.pdf --workers 8 --batch-size 256
+    python ingest.py --remove guide.pdf
+    python ingest.py --list
+"""
+import argparse
+import hashlib
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List
+
+import faiss
+
+from processing.chunker import iter_chunks
+from processing.embedder import embed_texts
+from utils.metadata_store import METADATA_DB_PATH, open_store
+from utils.pdf_parser import extract_text_from_pdf, page_count
+from utils.vector_db_utils import (
+    FAISS_METRIC, METRICS, add_vectors, load_faiss_index, rebuild_index, remove_vectors, write_index,
+)
+
+INDEX_PATH = "data/embeddings/index.faiss"
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))  # Chunks embedded per model call
+INGEST_PAGES_PER_TASK = int(os.getenv("INGEST_PAGES_PER_TASK", "32"))  # Pages parsed per pool task
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def find_pdfs(paths: Iterable[str]) -> List[str]:
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                found.extend(os.path.join(root, name) for name in sorted(files) if name.lower().endswith(".pdf"))
+        else:
+            found.append(path)
+    return [os.path.normpath(path) for path in found]
+
+
+def _open(index_path: str, metadata_path: str):
+    if not os.path.exists(index_path):
+        store = open_store(metadata_path)
+        if len(store):
+            print(f"⚠️ {index_path} is missing, clearing {len(store)} chunks from {metadata_path}")
+            store.clear()
+        return None, store
+    index, store = load_faiss_index(index_path, metadata_path)
+    if len(store) > index.ntotal:
+        discarded = store.discard_unindexed()
+        if discarded:
+            print(f"🧹 Discarded {discarded} chunks of an interrupted ingestion")
+    if len(store) != index.ntotal:
+        raise ValueError(f"Index has {index.ntotal} vectors but metadata has {len(store)} rows")
+    return index, store
+
+
+def _submit(pool, paths: List[str], pages_per_task: int) -> Iterator:
+    for path in paths:
+        try:
+            count = page_count(path)
+        except Exception as e:
+            yield path, e
+            continue
+        for start in range(0, count, pages_per_task):
+            yield path, pool.submit(extract_text_from_pdf, path, start, start + pages_per_task)
+
+
+def _result(path: str, job):
+    try:
+        return path, job if isinstance(job, Exception) else job.result()
+    except Exception as e:
+        return path, e
+
+
+def parse_in_pool(paths: List[str], workers: int, pages_per_task: int = INGEST_PAGES_PER_TASK) -> Iterator:
+    """
+    (path, pages or exception) for each range of `pages_per_task` pages, in document
+    order. Ranges are parsed by a process pool with at most two per worker in flight, so
+    memory does not grow with the size of the documents.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        for task in _submit(pool, paths, pages_per_task):
+            in_flight.append(task)
+            if len(in_flight) >= 2 * workers:
+                yield _result(*in_flight.popleft())
+        while in_flight:
+            yield _result(*in_flight.popleft())
+
+
+def ingest(paths: Iterable[str], index_path: str = INDEX_PATH, metadata_path: str = METADATA_DB_PATH,
+           workers: int = INGEST_WORKERS, batch_size: int = INGEST_BATCH_SIZE,
+           pages_per_task: int = INGEST_PAGES_PER_TASK) -> Dict:
+    """
+    Add new and changed PDFs to the index and store.
+
+    Pages stream from the parser through the chunker into fixed-size embedding batches,
+    and each batch is added to the index and store before the next one is built, so
+    memory is bounded by the batch size (plus the index itself), not by document size.
+
+    Returns:
+        Dict: Counts of files, pages and chunks, and throughput.
+    """
+    start = time.perf_counter()
+    index, store = _open(index_path, metadata_path)
+    stats = {"files": 0, "skipped": 0, "replaced": 0, "failed": 0, "pages": 0, "chunks": 0, "embed_s": 0.0}
+
+    pending, hashes = [], {}
+    for path in find_pdfs(paths):
+        digest = file_hash(path)
+        duplicate = store.find_document(digest) or next((p for p, d in hashes.items() if d == digest), None)
+        if duplicate is not None:
+            print(f"⏭️ Skipping {path}: {'unchanged' if duplicate == path else f'same content as {duplicate}'}")
+            stats["skipped"] += 1
+            continue
+        if store.document_ids(path):
+            stats["replaced"] += 1
+        pending.append(path)
+        hashes[path] = digest
+
+    first_new = store.next_id()
+    counts = {path: [0, 0] for path in pending}  # pages, chunks
+    failed = set()
+    batch = []
+
+    def flush():
+        nonlocal index
+        began = time.perf_counter()
+        embeddings = embed_texts([chunk["text"] for chunk in batch])
+        stats["embed_s"] += time.perf_counter() - began
+        if index is None:
+            index = faiss.IndexIDMap2(faiss.IndexFlat(embeddings.shape[1], METRICS[FAISS_METRIC]))
+            store.set_info("metric", FAISS_METRIC)
+        index = add_vectors(index, embeddings, store.append(batch))
+        batch.clear()
+
+    # Pages of the next ranges are parsed while this process chunks and embeds
+    for path, pages in parse_in_pool(pending, workers, pages_per_task) if pending else ():
+        if path in failed:
+            continue
+        if isinstance(pages, Exception):
+            print(f"❌ Failed to parse {path}: {pages}")
+            failed.add(path)
+            batch[:] = [chunk for chunk in batch if chunk["document"] != path]
+            continue
+        counts[path][0] += len(pages)
+        for chunk in iter_chunks(pages):
+            chunk["document"] = path
+            counts[path][1] += 1
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                flush()
+    if batch:
+        flush()
+
+    documents = [(path, hashes[path], *counts[path]) for path in pending if path not in failed]
+    for path, _, pages, chunks in documents:
+        print(f"📄 {path}: {pages} pages, {chunks} chunks")
+        stats["files"] += 1
+        stats["pages"] += pages
+        stats["chunks"] += chunks
+    stats["failed"] = len(failed)
+
+    # Previous vectors of replaced files, and vectors already added for files that failed
+    removed = [i for path, *_ in documents for i in store.document_ids(path) if i < first_new]
+    removed += [i for path in failed for i in store.document_ids(path) if i >= first_new]
+    if index is not None and (documents or removed):
+        index = rebuild_index(remove_vectors(index, removed))
+        write_index(index, index_path)
+    store.record_documents(documents, removed)
+    store.close()
+
+    elapsed = time.perf_counter() - start
+    stats.update(elapsed_s=elapsed, pages_per_s=stats["pages"] / elapsed, chunks_per_s=stats["chunks"] / elapsed)
+    return stats
+
+
+def remove(paths: Iterable[str], index_path: str = INDEX_PATH, metadata_path: str = METADATA_DB_PATH) -> int:
+    """
+    Remove documents' vectors and metadata.
+
+    Returns:
+        int: Number of chunks removed.
+    """
+    index, store = _open(index_path, metadata_path)
+    paths = [os.path.normpath(path) for path in paths]
+    ids = [i for path in paths for i in store.document_ids(path)]
+    if index is not None and ids:
+        write_index(remove_vectors(index, ids), index_path)
+    removed = sum(store.remove_document(path) for path in paths)
+    store.close()
+    return removed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", help="PDF files or directories")
+    parser.add_argument("--remove", action="store_true", help="Remove the given files instead of ingesting them")
+    parser.add_argument("--list", action="store_true", help="List ingested files")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument("--pages-per-task", type=int, default=INGEST_PAGES_PER_TASK)
+    parser.add_argument("--index", default=INDEX_PATH)
+    parser.add_argument("--metadata", default=METADATA_DB_PATH)
+    args = parser.parse_args()
+    # Show the store and index messages (e.g. a legacy metadata migration) alongside the prints
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.list:
+        store = open_store(args.metadata)
+        for doc in store.documents():
+            print(f"{doc['path']} | {doc['pages']} pages | {doc['chunks']} chunks | sha256 {doc['sha256'][:12]}")
+        store.close()
+    elif args.remove:
+        print(f"🗑️ Removed {remove(args.paths, args.index, args.metadata)} chunks")
+    else:
+        result = ingest(args.paths, args.index, args.metadata, args.workers, args.batch_size, args.pages_per_task)
+        print(f"✅ {result['files']} files ingested ({result['replaced']} replaced), {result['skipped']} skipped, "
+              f"{result['failed']} failed | {result['pages']} pages, {result['chunks']} chunks in "
+              f"{result['elapsed_s']:.1f} s | {result['pages_per_s']:.1f} pages/s, "
+              f"{result['chunks_per_s']:.1f} chunks/s (embedding {result['embed_s']:.1f} s)")
@@ -1,38 +1,34 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-import websockets
+from fastapi.responses import JSONResponse
 import asyncio
+import json
+import logging
+import time
+import uuid
 from contextlib import asynccontextmanager
 
-AGENT_WS_URL = "ws://localhost:8765"  # Connection to your AI Agent
-agent_ws = None  # Global persistent connection
+from agent_client import AGENT_WS_URL, AgentBusyError, AgentPool, AgentUnavailableError
+from observability import configure_logging, metrics, new_request_id, observe, request_id_var, span
+
+configure_logging()
+logger = logging.getLogger("chatbot.gateway")
+pool = AgentPool(AGENT_WS_URL)  # Multiplexed connections shared by all clients
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     Manages startup and shutdown events.
-    Establishes a persistent connection with the AI agent.
+    Opens the pool of connections to the AI agent; dropped connections are re-opened in the background.
     """
-    global agent_ws
-    print("🔗 Connecting to Agent WebSocket...")
-
-    try:
-        agent_ws = await websockets.connect(
-            AGENT_WS_URL,
-            ping_interval=3600,
-            ping_timeout=3600
-        )
-        print("✅ Connected to Agent WebSocket")
-    except Exception as e:
-        print(f"❌ Failed to connect to Agent: {e}")
-        agent_ws = None
+    logger.info("🔗 Connecting to Agent WebSocket...")
+    await pool.start()
 
     yield
 
-    if agent_ws:
-        await agent_ws.close()
-        print("🔌 Agent connection closed")
+    await pool.close()
+    logger.info("🔌 Agent connection closed")
 
 
 app = FastAPI(lifespan=lifespan)
@@ -52,38 +48,82 @@ async def root():
     return {"message": "FastAPI Chat Server is running ✅"}
 
 
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready():
+    """
+    Ready when the agent is connected and its retriever is loaded; 503 otherwise, so a
+    load balancer keeps traffic away while the agent is still starting.
+    """
+    try:
+        status = await pool.status()
+    except (AgentUnavailableError, asyncio.TimeoutError) as e:
+        return JSONResponse({"ready": False, "error": str(e) or "Agent did not answer"}, status_code=503)
+    return JSONResponse({"ready": status["ready"], "agent": status}, status_code=200 if status["ready"] else 503)
+
+
+@app.get("/agent/stats")
+async def agent_stats():
+    return pool.stats()
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Gateway metrics in Prometheus format; the agent serves its own on its websocket port."""
+    body, content_type = metrics()
+    return Response(content=body, media_type=content_type)
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """
     Bridge between frontend WebSocket and AI Agent WebSocket.
+    Each client gets its own agent session, so replies and history are never mixed between users.
+
+    Replies are relayed token by token as JSON frames, {"id", "type": "start" | "delta" | "end" | "error", "text"},
+    where `id` identifies the user message being answered. The same id is sent to the agent
+    and tags the logs of both services.
     """
-    global agent_ws
-    print("🔌 New WebSocket connection from client...")
+    logger.debug("🔌 New WebSocket connection from client...")
     await websocket.accept()
+    session_id = uuid.uuid4().hex
 
-    if not agent_ws:
-        await websocket.send_text("❌ Agent is not connected. Please try again later.")
-        await websocket.close()
-        return
+    async def send_frame(message_id, frame_type, text=None):
+        frame = {"id": message_id, "type": frame_type}
+        if text is not None:
+            frame["text"] = text
+        await websocket.send_text(json.dumps(frame))
 
     try:
         while True:
             # Receive message from frontend
             user_message = await websocket.receive_text()
-            print(f"👤 Client says: {user_message}")
-
-            # Forward message to AI Agent
-            await agent_ws.send(user_message)
-
-            # Wait for agent's reply
-            ai_reply = await agent_ws.recv()
-            print(f"🤖 Agent replies: {ai_reply}")
-
-            # Send AI reply back to frontend
-            await websocket.send_text(ai_reply)
+            message_id = new_request_id()
+            request_id_var.set(message_id)
+            logger.debug("👤 Client says: %s", user_message)
+
+            # Forward message to AI Agent and relay its reply frames as they arrive
+            try:
+                with span("agent_reply"):
+                    start, first_delta = time.perf_counter(), True
+                    async for frame in pool.stream(session_id, user_message, message_id):
+                        if first_delta and frame["type"] == "delta":
+                            first_delta = False
+                            observe("agent_first_delta", time.perf_counter() - start)
+                        await send_frame(message_id, frame["type"], frame.get("text"))
+            except AgentUnavailableError:
+                await send_frame(message_id, "error", "❌ Agent is not connected. Please try again later.")
+            except AgentBusyError:
+                await send_frame(message_id, "error", "❌ Agent is busy. Please try again in a moment.")
+            except asyncio.TimeoutError:
+                await send_frame(message_id, "error", "❌ Agent took too long to reply. Please try again.")
 
     except WebSocketDisconnect:
-        print("❌ Client disconnected.")
+        logger.debug("❌ Client disconnected.")
     except Exception as e:
-        print(f"⚠️ Error: {e}")
-        await websocket.send_text(f"Error: {str(e)}")
+        logger.exception("⚠️ Error: %s", e)
+        await websocket.send_text(json.dumps({"type": "error", "text": f"Error: {str(e)}"}))
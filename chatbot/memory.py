@@ -0,0 +1,181 @@
+import logging
+import os
+import threading
+from functools import lru_cache
+
+# Prompt tokens allowed per LLM call (instructions, context, history and question)
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "6000"))
+# Most recent question/answer pairs kept verbatim
+MEMORY_MAX_TURNS = int(os.getenv("MEMORY_MAX_TURNS", "10"))
+# Tokens allowed for the running list of older questions
+MEMORY_SUMMARY_TOKENS = int(os.getenv("MEMORY_SUMMARY_TOKENS", "200"))
+# Local tokenizer used for counting: a Hugging Face repo already in the local cache, or a tokenizer.json path
+MEMORY_TOKENIZER = os.getenv("MEMORY_TOKENIZER", "sentence-transformers/multi-qa-MiniLM-L6-cos-v1")
+
+BASE_SYSTEM_PROMPT = "You are a helpful nutrition assistant."
+MESSAGE_OVERHEAD = 4  # Role and separator tokens added per chat message
+SUMMARY_HEADER = "Earlier in this conversation the user asked:"
+
+logger = logging.getLogger("chatbot.memory")
+
+
+_tokenizer_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _load_tokenizer():
+    # Only files already on disk (downloaded with the embedding model); never blocks on the network
+    try:
+        from huggingface_hub import try_to_load_from_cache
+        from tokenizers import Tokenizer
+
+        if os.path.isfile(MEMORY_TOKENIZER):
+            path = MEMORY_TOKENIZER
+        else:
+            path = try_to_load_from_cache(MEMORY_TOKENIZER, "tokenizer.json")
+        if not isinstance(path, str):
+            raise FileNotFoundError("tokenizer.json not in the local cache")
+        tokenizer = Tokenizer.from_file(path)
+        tokenizer.no_truncation()
+        tokenizer.no_padding()
+        return tokenizer
+    except Exception as e:
+        logger.warning("⚠️ Tokenizer %s unavailable (%s), estimating tokens from length", MEMORY_TOKENIZER, e)
+        return None
+
+
+def _tokenizer():
+    with _tokenizer_lock:
+        return _load_tokenizer()
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens in `text`, or an estimate of ~4 characters per token without a tokenizer."""
+    tokenizer = _tokenizer()
+    if tokenizer is None:
+        return (len(text) + 3) // 4
+    return len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+def format_chunk(chunk: dict) -> str:
+    return f"[Source: {os.path.basename(chunk['source'])}]\n{chunk['text']}"
+
+
+def chunk_key(chunk: dict):
+    return chunk.get("chunk_id", chunk["text"]), chunk.get("source")
+
+
+class ConversationMemory:
+    """
+    History of one conversation, turned into a prompt that fits a token budget.
+
+    Each prompt carries a single, current RAG system prompt instead of one per past
+    turn. Budget goes first to the current question and its retrieved context, then
+    to the most recent turns; turns that no longer fit (or exceed `max_turns`) are
+    evicted and only their questions are kept as a short summary. Context chunks
+    retrieved for the previous question are carried over when there is room left,
+    without repeating chunks that were retrieved again.
+
+    Args:
+        budget (int): Maximum prompt tokens.
+        max_turns (int): Question/answer pairs kept verbatim.
+        summary_tokens (int): Maximum tokens for the summary of evicted turns.
+    """
+
+    def __init__(self, budget: int = MEMORY_TOKEN_BUDGET, max_turns: int = MEMORY_MAX_TURNS,
+                 summary_tokens: int = MEMORY_SUMMARY_TOKENS):
+        self.budget = budget
+        self.max_turns = max_turns
+        self.summary_tokens = summary_tokens
+        self.turns = []  # (question, answer, tokens), oldest first
+        self.earlier_questions = []  # Questions of evicted turns, oldest first
+        self.previous_chunks = []
+        self.last_prompt_tokens = 0
+
+    def build(self, question: str, chunks: list, render_system_prompt) -> list:
+        """
+        Chat messages for answering `question`.
+
+        Args:
+            question (str): The user's message.
+            chunks (list): Chunks retrieved for it, most relevant first.
+            render_system_prompt (Callable[[str], str]): Builds the RAG system prompt from the context text.
+
+        Returns:
+            list: Messages to send to the LLM; their token count is in `last_prompt_tokens`.
+        """
+        current, seen = [], set()
+        for chunk in chunks:
+            if chunk_key(chunk) not in seen:
+                seen.add(chunk_key(chunk))
+                current.append(chunk)
+        carried = [c for c in self.previous_chunks if chunk_key(c) not in seen]
+        self.previous_chunks = current
+
+        chunk_tokens = [count_tokens(format_chunk(c)) + 2 for c in current]
+        fixed = (count_tokens(BASE_SYSTEM_PROMPT) + count_tokens(render_system_prompt(""))
+                 + count_tokens(question) + 3 * MESSAGE_OVERHEAD)
+        # The least relevant chunks go first if the question and its context alone overflow
+        while len(current) > 1 and fixed + sum(chunk_tokens) > self.budget:
+            current.pop()
+            chunk_tokens.pop()
+        used = fixed + sum(chunk_tokens)
+
+        # Newest turns first; older ones are evicted into the summary
+        reserve = 0
+        if self.turns or self.earlier_questions:
+            reserve = self.summary_tokens + count_tokens(SUMMARY_HEADER) + MESSAGE_OVERHEAD
+        kept = []
+        for turn in reversed(self.turns[-self.max_turns:]):
+            if used + reserve + turn[2] > self.budget:
+                break
+            kept.append(turn)
+            used += turn[2]
+        kept.reverse()
+        for evicted in self.turns[:len(self.turns) - len(kept)]:
+            self.earlier_questions.append(evicted[0])
+        self.turns = kept
+        summary = self._summary()
+        if summary:
+            used += count_tokens(summary) + MESSAGE_OVERHEAD
+
+        # Context of the previous question, if it still fits
+        for chunk in carried:
+            tokens = count_tokens(format_chunk(chunk)) + 2
+            if used + tokens > self.budget:
+                break
+            current.append(chunk)
+            used += tokens
+
+        context = "\n\n".join(format_chunk(c) for c in current)
+        messages = [{"role": "system", "content": BASE_SYSTEM_PROMPT}]
+        if summary:
+            messages.append({"role": "system", "content": summary})
+        for past_question, answer, _ in kept:
+            messages.append({"role": "user", "content": past_question})
+            messages.append({"role": "assistant", "content": answer})
+        messages.append({"role": "system", "content": render_system_prompt(context)})
+        messages.append({"role": "user", "content": question})
+        self.last_prompt_tokens = used
+        return messages
+
+    def record(self, question: str, answer: str):
+        """Store a completed turn."""
+        tokens = count_tokens(question) + count_tokens(answer) + 2 * MESSAGE_OVERHEAD
+        self.turns.append((question, answer, tokens))
+
+    def _summary(self) -> str:
+        if not self.earlier_questions:
+            return ""
+        # Keep the most recent questions that fit the summary budget
+        lines, tokens = [], 0
+        for question in reversed(self.earlier_questions):
+            cost = count_tokens(question) + 2
+            if tokens + cost > self.summary_tokens:
+                break
+            lines.append(f"- {question}")
+            tokens += cost
+        self.earlier_questions = self.earlier_questions[-len(lines):] if lines else []
+        if not lines:
+            return ""
+        return SUMMARY_HEADER + "\n" + "\n".join(reversed(lines))
@@ -0,0 +1,33 @@
+import logging
+import os
+import sys
+import uuid
+
+from prometheus_client import Counter, Histogram
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # For common/, shared with the API
+from common.observability import LOG_LEVEL, StageTimer, metrics, request_id_var  # noqa: E402,F401
+from common.observability import configure_logging as _configure_logging  # noqa: E402
+
+# Seconds, from sub-millisecond cache hits to slow LLM replies
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_SECONDS = Histogram("chatbot_stage_seconds", "Time spent in each stage of answering a message",
+                          ["stage"], buckets=BUCKETS)
+TURNS = Counter("chatbot_turns_total", "Messages answered by the agent, by outcome", ["outcome"])
+
+logger = logging.getLogger("chatbot")
+
+# observe(stage, seconds) and `with span(stage):` record into chatbot_stage_seconds
+_stages = StageTimer(STAGE_SECONDS, logger)
+observe, span = _stages.observe, _stages.span
+
+
+def configure_logging(level: str = LOG_LEVEL):
+    """Log to stderr with the request id on every line: this service at `level`, libraries at WARNING."""
+    _configure_logging(logger, level)
+
+
+def new_request_id() -> str:
+    """Id of a message, made by the gateway and sent to the agent as the frame id."""
+    return uuid.uuid4().hex
@@ -0,0 +1,122 @@
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    Groups calls made concurrently from any thread into batches run by one worker thread.
+
+    The worker takes the first queued item, waits at most `max_wait_ms` for more (up to
+    `max_batch_size`), calls `process_batch` once for the whole batch and resolves each
+    item's future with its own result. With `max_wait_ms` 0 it only takes what is already
+    queued, so a lone call is never delayed and batches form while the worker is busy.
+    The worker starts on the first call.
+
+    Args:
+        process_batch (Callable): Takes a list of items, returns one result per item.
+        max_batch_size (int): Maximum items per call of `process_batch`.
+        max_wait_ms (float): How long to wait for a batch to fill up.
+        name (str): Worker thread name.
+    """
+
+    def __init__(self, process_batch: Callable[[List[Any]], List[Any]], max_batch_size: int = 32,
+                 max_wait_ms: float = 0.0, name: str = "micro-batcher"):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._batch_sizes = Counter()  # batch size -> batches of that size
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        with self._start_lock:
+            if self._thread is None:
+                return
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, item: Any) -> Future:
+        """
+        Queue an item for the next batch.
+
+        Returns:
+            Future: Resolved with the result for this item.
+        """
+        if self._thread is None:
+            self.start()
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item: Any) -> Any:
+        """Blocking form of `submit`."""
+        return self.submit(item).result()
+
+    def stats(self) -> dict:
+        sizes = dict(sorted(self._batch_sizes.items()))
+        batches = sum(sizes.values())
+        requests = sum(size * count for size, count in sizes.items())
+        return {
+            "batches": batches,
+            "requests": requests,
+            "avg_batch_size": requests / batches if batches else 0.0,
+            "batch_sizes": sizes,
+            "queued": self._queue.qsize(),
+        }
+
+    def _collect_batch(self) -> Tuple[List[Tuple[Any, Future]], bool]:
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._collect_batch()
+            # Drop items whose caller already gave up
+            batch = [(item, fut) for item, fut in batch if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                results = self.process_batch([item for item, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"Expected {len(batch)} results, got {len(results)}")
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+
+            self._batch_sizes[len(batch)] += 1
+            for (_, fut), result in zip(batch, results):
+                fut.set_result(result)
@@ -1,21 +1,25 @@
 from langchain_text_splitters import RecursiveCharacterTextSplitter # Text splitter for chunking documents based on character count
-from typing import List, Dict 
+from typing import Dict, Iterable, Iterator, List
 
 CHUNK_SIZE = 300
 CHUNK_OVERLAP = 50
 
-def chunk_documents(documents: List[Dict], chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> List[Dict]:
+def iter_chunks(documents: Iterable[Dict], chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> Iterator[Dict]:
+    """
+    Yield the chunks of each document (page) as it arrives, without holding earlier ones.
+    "title" and "sections" are only set when the document has them.
+    """
     splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    chunks = []
     for doc in documents:
-        texts = splitter.split_text(doc["text"])
-        for i, chunk in enumerate(texts):
-            chunks.append({
-                "title": doc.get("title", ""),
-                "sections": doc.get("sections", []),
+        extra = {key: doc[key] for key in ("title", "sections") if doc.get(key)}
+        for i, chunk in enumerate(splitter.split_text(doc["text"])):
+            yield {
+                **extra,
                 "text": chunk,
                 "source": doc["source"],
                 "page": doc["page"],
                 "chunk_id": i
-            })
-    return chunks
\ No newline at end of file
+            }
+
+def chunk_documents(documents: List[Dict], chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> List[Dict]:
+    return list(iter_chunks(documents, chunk_size, chunk_overlap))
@@ -1,6 +1,206 @@
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict
+import argparse
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Callable, List, Dict
+import numpy as np
+from processing.batcher import MicroBatcher
 EMBEDDING_MODEL = "sentence-transformers/multi-qa-MiniLM-L6-cos-v1"
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))  # Texts per forward pass of the model
+# "sentence-transformers" (PyTorch) or "onnxruntime", running the model exported by `export_onnx`
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "sentence-transformers")
+EMBEDDING_ONNX_PATH = os.getenv("EMBEDDING_ONNX_PATH", "models/embedder-onnx")
+EMBEDDING_ONNX_THREADS = int(os.getenv("EMBEDDING_ONNX_THREADS", "0"))  # 0 lets onnxruntime decide
+# Questions embedded concurrently are encoded together, waiting at most QUERY_MAX_WAIT_MS for a batch
+QUERY_MAX_BATCH_SIZE = int(os.getenv("QUERY_MAX_BATCH_SIZE", "32"))
+QUERY_MAX_WAIT_MS = float(os.getenv("QUERY_MAX_WAIT_MS", "2"))
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))  # Question embeddings kept (0 disables)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Rows of `vectors` scaled to unit L2 norm, as float32."""
+    vectors = np.asarray(vectors, dtype="float32")
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+class OnnxEmbedder:
+    """
+    Sentence embeddings on onnxruntime's CPU provider, from a directory written by
+    `export_onnx` (model.onnx with pooling included, and tokenizer.json).
+
+    `encode` accepts the SentenceTransformer.encode arguments used in this package.
+
+    Args:
+        path (str): Export directory.
+    """
+
+    def __init__(self, path: str):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        options = ort.SessionOptions()
+        if EMBEDDING_ONNX_THREADS:
+            options.intra_op_num_threads = EMBEDDING_ONNX_THREADS
+        self.session = ort.InferenceSession(os.path.join(path, "model.onnx"), options,
+                                            providers=["CPUExecutionProvider"])
+        self.tokenizer = Tokenizer.from_file(os.path.join(path, "tokenizer.json"))
+        if self.tokenizer.padding is None:
+            self.tokenizer.enable_padding()
+
+    def encode(self, texts: List[str], batch_size: int = 32, normalize_embeddings: bool = False,
+               **kwargs) -> np.ndarray:
+        outputs = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            outputs.append(self.session.run(None, {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            })[0])
+        embeddings = np.concatenate(outputs).astype("float32")
+        return normalize(embeddings) if normalize_embeddings else embeddings
+
+
+@lru_cache(maxsize=None)
+def load_model(model_name: str = EMBEDDING_MODEL):
+    """
+    The embedding model, loaded once per process (sentence-transformers and torch are imported here).
+    With EMBEDDING_BACKEND=onnxruntime, the export in EMBEDDING_ONNX_PATH is used instead.
+    """
+    if EMBEDDING_BACKEND == "onnxruntime":
+        return OnnxEmbedder(EMBEDDING_ONNX_PATH)
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+def export_onnx(output_dir: str, model_name: str = EMBEDDING_MODEL) -> str:
+    """
+    Export the embedding model, pooling and normalisation included, to `output_dir` for
+    the onnxruntime backend, with the tokenizer set to truncate and pad like the model.
+
+    Returns:
+        str: Path of the exported model.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu").eval()
+
+    class Pooled(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model({"input_ids": input_ids, "attention_mask": attention_mask})["sentence_embedding"]
+
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, "model.onnx")
+    sample = model.tokenizer(["warm up", "a longer sample question"], padding=True, return_tensors="pt")
+    dynamic = {0: "batch", 1: "tokens"}
+    torch.onnx.export(Pooled(), (sample["input_ids"], sample["attention_mask"]), path,
+                      input_names=["input_ids", "attention_mask"], output_names=["sentence_embedding"],
+                      dynamic_axes={"input_ids": dynamic, "attention_mask": dynamic,
+                                    "sentence_embedding": {0: "batch"}},
+                      opset_version=17, dynamo=False)
+
+    tokenizer = model.tokenizer.backend_tokenizer
+    tokenizer.enable_truncation(model.max_seq_length)
+    tokenizer.enable_padding(pad_id=model.tokenizer.pad_token_id, pad_token=model.tokenizer.pad_token)
+    tokenizer.save(os.path.join(output_dir, "tokenizer.json"))
+    print(f"✅ Exported {model_name} to {path}")
+    return path
+
+
+def query_key(query: str) -> str:
+    """Cache key of a question: whitespace collapsed and lower-cased (the default model is uncased)."""
+    return " ".join(query.lower().split())
+
+
+class QueryEmbedder:
+    """
+    Embeddings of user questions, micro-batched and cached.
+
+    Questions submitted concurrently from any thread are encoded together, one `encode`
+    call per batch (see MicroBatcher), and repeated questions are answered from an LRU
+    cache keyed by `query_key`. Vectors are L2-normalised float32 and read-only.
+
+    Args:
+        encode (Callable): Takes a list of texts, returns one embedding per text.
+        cache_size (int): Questions kept in the cache.
+        max_batch_size (int): Maximum questions per `encode` call.
+        max_wait_ms (float): How long to wait for a batch to fill up.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], cache_size: int = QUERY_CACHE_SIZE,
+                 max_batch_size: int = QUERY_MAX_BATCH_SIZE, max_wait_ms: float = QUERY_MAX_WAIT_MS):
+        self.encode = encode
+        self.cache_size = cache_size
+        self.batcher = MicroBatcher(self._embed_batch, max_batch_size, max_wait_ms, name="query-embedder")
+        self._cache = OrderedDict()  # key -> vector, least recently used first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _embed_batch(self, keys: List[str]) -> List[np.ndarray]:
+        unique = list(dict.fromkeys(keys))
+        vectors = normalize(self.encode(unique))
+        vectors.setflags(write=False)
+        by_key = dict(zip(unique, vectors))
+        with self._lock:
+            for key, vector in by_key.items():
+                self._cache[key] = vector
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return [by_key[key] for key in keys]
+
+    def submit(self, query: str) -> Future:
+        """
+        Embedding of a question, from the cache or the next batch.
+
+        Returns:
+            Future: Resolved with the normalised embedding.
+        """
+        key = query_key(query)
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if vector is None:
+            return self.batcher.submit(key)
+        future: Future = Future()
+        future.set_result(vector)
+        return future
+
+    def embed(self, query: str) -> np.ndarray:
+        """Blocking form of `submit`."""
+        return self.submit(query).result()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "cache_entries": len(self._cache),
+            "cache_hits": self.hits,
+            "cache_hit_rate": self.hits / lookups if lookups else 0.0,
+            **self.batcher.stats(),
+        }
+
+
+def embed_texts(texts: List[str], model_name: str = EMBEDDING_MODEL, batch_size: int = EMBED_BATCH_SIZE,
+                show_progress_bar: bool = False) -> np.ndarray:
+    """
+    Embeddings of `texts` as an L2-normalised float32 array, one row per text.
+    """
+    # Normalised so that inner product equals the cosine similarity the model is trained for
+    return load_model(model_name).encode(texts, batch_size=batch_size, show_progress_bar=show_progress_bar,
+                                         convert_to_numpy=True, normalize_embeddings=True).astype("float32")
+
+
 def embed_chunks(
     chunks: List[Dict],
     model_name: str = EMBEDDING_MODEL
@@ -15,10 +215,17 @@ def embed_chunks(
     Returns:
         List[Dict]: Same chunks with added 'embedding' field (as a list of floats).
     """
-    model = SentenceTransformer(model_name)
     texts = [chunk["text"] for chunk in chunks]
     print("🔄 Generating embeddings...")
-    embeddings = model.encode(texts, show_progress_bar=True, convert_to_numpy=True)
+    embeddings = embed_texts(texts, model_name, show_progress_bar=True)
     for i, chunk in enumerate(chunks):
         chunk["embedding"] = embeddings[i].tolist()  # convert NumPy array to list for serialization
-    return chunks
\ No newline at end of file
+    return chunks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the embedding model for the onnxruntime backend.")
+    parser.add_argument("--output", default=EMBEDDING_ONNX_PATH)
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    args = parser.parse_args()
+    export_onnx(args.output, args.model)
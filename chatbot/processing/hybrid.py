@@ -0,0 +1,110 @@
+import os
+from functools import lru_cache
+from itertools import islice
+from typing import Dict, List, Optional, Sequence
+
+import faiss
+import numpy as np
+
+from utils.metadata_store import MetadataStore
+from utils.vector_db_utils import metric_of, normalize, similarities
+
+# Combine FAISS with BM25 keyword search over the chunk texts
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") == "1"
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "50"))  # Results taken from each search before fusion
+RRF_K = int(os.getenv("RRF_K", "60"))  # Reciprocal rank fusion constant; larger flattens the rank weights
+# Local cross-encoder that reranks the fused candidates, e.g. cross-encoder/ms-marco-MiniLM-L-6-v2 (empty disables)
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = RRF_K) -> List[int]:
+    """Ids ranked by the sum of 1 / (k + rank) over the rankings they appear in."""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+@lru_cache(maxsize=None)
+def load_reranker(model_name: str = RERANKER_MODEL):
+    """The cross-encoder, loaded once per process."""
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(model_name)
+
+
+def rerank(query: str, chunks: List[Dict], model_name: str = RERANKER_MODEL,
+           batch_size: int = RERANK_BATCH_SIZE) -> List[Dict]:
+    """Chunks sorted by cross-encoder relevance to `query`, scored in batches as "rerank_score"."""
+    scores = load_reranker(model_name).predict([(query, chunk["text"]) for chunk in chunks], batch_size=batch_size)
+    for chunk, score in zip(chunks, scores):
+        chunk["rerank_score"] = float(score)
+    return sorted(chunks, key=lambda chunk: chunk["rerank_score"], reverse=True)
+
+
+def search_depth(top_k: int, query: Optional[str] = None, hybrid: bool = HYBRID_SEARCH,
+                 candidates: int = RETRIEVAL_CANDIDATES) -> int:
+    """Vector results `search_index` needs for a question."""
+    return max(top_k, candidates) if hybrid and query else top_k
+
+
+def dense_search(index: faiss.Index, query_embeddings: np.ndarray, k: int) -> List[Dict[int, float]]:
+    """
+    One FAISS search for a batch of query embeddings.
+
+    Returns:
+        List[Dict[int, float]]: Per query, chunk id -> cosine similarity, best first.
+    """
+    distances, indices = index.search(normalize(query_embeddings), k)
+    metric = metric_of(index)
+    return [{int(i): float(s) for i, s in zip(row, similarities(row_distances, metric)) if i >= 0}
+            for row, row_distances in zip(indices, distances)]
+
+
+def search_index(index: faiss.Index, store: MetadataStore, query_embedding: np.ndarray, top_k: int = 5,
+                 min_score: float = 0.0, query: Optional[str] = None, hybrid: bool = HYBRID_SEARCH,
+                 candidates: int = RETRIEVAL_CANDIDATES, reranker: Optional[str] = RERANKER_MODEL,
+                 rerank_candidates: int = RERANK_CANDIDATES, dense: Optional[Dict[int, float]] = None) -> List[Dict]:
+    """
+    Dense, or with `query` hybrid, search of an index and its metadata store.
+
+    Dense results below `min_score` (cosine) are dropped. In hybrid mode the remaining
+    ones are fused with the BM25 results for `query` by reciprocal rank fusion, so exact
+    terms such as dish or nutrient names are found even when their embedding is poor.
+    Keyword matches need dense support: they are only added when at least one dense
+    result reaches `min_score`, since almost any question shares a word with some chunk.
+    A question without one gets no chunks, and the agent answers it without the LLM.
+    With a reranker, at most `rerank_candidates` fused results are reranked by the
+    cross-encoder. `dense` takes this query's `dense_search` results when the search
+    was batched with others.
+
+    Returns:
+        List[Dict]: Chunks with metadata, best first. "score" is the cosine similarity of
+        dense results and None for keyword-only ones; "bm25" is set for keyword matches.
+    """
+    depth = search_depth(top_k, query, hybrid, candidates)
+    hybrid = hybrid and bool(query)
+    if dense is None:
+        dense = dense_search(index, query_embedding, depth)[0]
+    # A batched search may have returned more results than this query needs
+    dense = {i: s for i, s in islice(dense.items(), depth) if s >= min_score}
+    if not dense:
+        return []
+    if not hybrid:
+        ids, lexical = list(dense), {}
+    else:
+        lexical = dict(store.search_text(query, max(top_k, candidates)))
+        ids = reciprocal_rank_fusion([list(dense), list(lexical)])
+    pool = rerank_candidates if hybrid and reranker else top_k
+
+    # Only the returned rows are read from the metadata store
+    chunks = store.get_many(ids[:pool])
+    for chunk in chunks:
+        chunk["score"] = dense.get(chunk["id"])
+        if chunk["id"] in lexical:
+            chunk["bm25"] = lexical[chunk["id"]]
+    if hybrid and reranker and len(chunks) > 1:
+        chunks = rerank(query, chunks, reranker)
+    return chunks[:top_k]
@@ -1,36 +1,227 @@
+import logging
 import os
-from sentence_transformers import SentenceTransformer
-from utils.vector_db_utils import load_faiss_index
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional
+import numpy as np
+from processing.batcher import MicroBatcher
+from processing.embedder import EMBEDDING_MODEL, QueryEmbedder, load_model
+from observability import span
+from processing.hybrid import dense_search, search_depth, search_index
+from utils.metadata_store import MetadataStore
+from utils.vector_db_utils import load_faiss_index, read_index
 
-EMBEDDING_MODEL = "sentence-transformers/multi-qa-MiniLM-L6-cos-v1"
-INDEX_PATH = "data/embeddings/index.faiss"
-METADATA_PATH = "data/embeddings/metadata.json"
+logger = logging.getLogger("chatbot.retriever")
 
-# Load model
-model = SentenceTransformer(EMBEDDING_MODEL)
+INDEX_PATH = "data/embeddings/index.faiss"
+METADATA_PATH = "data/embeddings/metadata.db"
+LEGACY_METADATA_PATH = "data/embeddings/metadata.json"
+# Seconds between checks for a rebuilt index on disk
+INDEX_WATCH_INTERVAL = float(os.getenv("INDEX_WATCH_INTERVAL", "5"))
+# Minimum cosine similarity for a chunk to count as relevant (0 keeps every result)
+RETRIEVAL_MIN_SCORE = float(os.getenv("RETRIEVAL_MIN_SCORE", "0.3"))
+# Memory-map the index file instead of reading it: near-instant load, pages shared between processes
+INDEX_MMAP = os.getenv("INDEX_MMAP", "1") == "1"
+# Concurrent FAISS searches run as one batched search; by default only those already queued are grouped
+SEARCH_MAX_BATCH_SIZE = int(os.getenv("SEARCH_MAX_BATCH_SIZE", "32"))
+SEARCH_MAX_WAIT_MS = float(os.getenv("SEARCH_MAX_WAIT_MS", "0"))
 
-# Load index and metadata (must already be created and saved)
-if os.path.exists(INDEX_PATH) and os.path.exists(METADATA_PATH):
-    index, metadata = load_faiss_index(INDEX_PATH, METADATA_PATH)
-else:
-    raise FileNotFoundError("❌ FAISS index or metadata file not found. Run embedding first.")
 
-def retrieve_chunks(query: str, top_k: int = 5):
+class Retriever:
     """
-    Search the vector DB for the most relevant chunks to a query.
+    Embedding model, FAISS index and metadata store behind question search.
 
-    Args:
-        query (str): User question.
-        top_k (int): Number of results to return.
+    Nothing is loaded when the object is created: the first call that needs them (or
+    `warm_up`) loads all three once, under a lock, so the agent can start and report
+    that it is not ready yet instead of failing at import. A missing index raises
+    FileNotFoundError from that call and is retried on the next one.
+
+    Questions are embedded through a QueryEmbedder (micro-batched, LRU cached) and
+    concurrent vector searches are grouped into one FAISS search per batch.
 
-    Returns:
-        List[Dict]: List of top matching chunks with metadata.
+    Args:
+        index_path (str): FAISS index file.
+        metadata_path (str): Metadata store; a legacy metadata.json next to it is migrated.
+        model_name (str): Sentence-transformers model embedding the questions.
+        mmap (bool): Memory-map the index (read-only) instead of reading it into memory.
     """
-    query_embedding = model.encode([query]).astype("float32")
-    distances, indices = index.search(query_embedding, top_k)
-
-    results = []
-    for i in indices[0]:
-        if 0 <= i < len(metadata):
-            results.append(metadata[i])
-    return results
\ No newline at end of file
+
+    def __init__(self, index_path: str = INDEX_PATH, metadata_path: str = METADATA_PATH,
+                 model_name: str = EMBEDDING_MODEL, mmap: bool = INDEX_MMAP):
+        self.index_path = index_path
+        self.metadata_path = metadata_path
+        self.model_name = model_name
+        self.mmap = mmap
+        self.model = None
+        self.index = None
+        self.metadata = None
+        self.version = None
+        self.error = None  # Why the last load failed
+        self.load_seconds = None
+        self._load_lock = threading.Lock()
+        self._lock = threading.Lock()  # Guards index swaps
+        self._checked = 0.0
+        self._warm_up = None
+        self.embedder = QueryEmbedder(self._encode)
+        self.searches = MicroBatcher(self._search_batch, SEARCH_MAX_BATCH_SIZE, SEARCH_MAX_WAIT_MS,
+                                     name="faiss-search")
+
+    @property
+    def ready(self) -> bool:
+        return self.metadata is not None
+
+    def _files_version(self):
+        # The metadata store is read live, so only the index file needs watching
+        stat = os.stat(self.index_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self):
+        """Load the model, index and metadata store if not loaded yet; safe to call from any thread."""
+        if self.ready:
+            return self
+        with self._load_lock:
+            if self.ready:
+                return self
+            start = time.perf_counter()
+            try:
+                legacy_path = os.path.splitext(self.metadata_path)[0] + ".json"
+                if not os.path.exists(self.index_path) or not (
+                        os.path.exists(self.metadata_path) or os.path.exists(legacy_path)):
+                    raise FileNotFoundError("❌ FAISS index or metadata file not found. Run embedding first.")
+                model = load_model(self.model_name)
+                version = self._files_version()
+                self.index, metadata = load_faiss_index(self.index_path, self.metadata_path, self.mmap)
+                self.model, self.version, self._checked = model, version, time.monotonic()
+                self.metadata = metadata  # Set last: marks the retriever ready
+            except Exception as e:
+                self.error = str(e)
+                raise
+            self.error = None
+            self.load_seconds = time.perf_counter() - start
+            logger.info("📚 Retriever loaded in %.2f s (%d vectors)", self.load_seconds, self.index.ntotal)
+        return self
+
+    def preload(self):
+        """
+        Load everything and embed one question on this thread, in a process about to fork
+        agent workers (see common/prefork.py), so the model, the index mapping and what the
+        first inference initialises are shared with them. The sqlite connection must not
+        cross fork(), so the metadata store is closed here and reopened by `after_fork`.
+        """
+        self.load()
+        self.model.encode(["warm up"])
+        self.metadata.close()
+
+    def after_fork(self):
+        """Reopen the metadata store in a worker forked after `preload`."""
+        self.metadata = MetadataStore(self.metadata_path)
+
+    def warm_up(self) -> threading.Thread:
+        """Load everything and run one query on a background thread, so the first question is fast."""
+        def run():
+            try:
+                self.embed_query("warm up")
+            except Exception as e:
+                logger.warning("⚠️ Retriever warm-up failed: %s", e)
+
+        if self._warm_up is None or not self._warm_up.is_alive():
+            self._warm_up = threading.Thread(target=run, name="retriever-warm-up", daemon=True)
+            self._warm_up.start()
+        return self._warm_up
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "loading": self._load_lock.locked(),
+            "error": self.error,
+            "load_seconds": self.load_seconds,
+            "vectors": self.index.ntotal if self.ready else None,
+            "mmap": self.mmap,
+        }
+
+    def index_version(self):
+        """
+        Identifier of the index in use. Checks at most every INDEX_WATCH_INTERVAL seconds
+        whether the files were rebuilt and, if so, loads the new index first.
+        """
+        self.load()
+        with self._lock:
+            now = time.monotonic()
+            if now - self._checked >= INDEX_WATCH_INTERVAL:
+                self._checked = now
+                try:
+                    current = self._files_version()
+                    if current != self.version:
+                        self.index = read_index(self.index_path, self.mmap)
+                        self.version = current
+                        logger.info("🔄 Reloaded FAISS index (%d vectors)", self.index.ntotal)
+                except Exception as e:
+                    logger.warning("⚠️ Keeping previous FAISS index, reload failed: %s", e)
+            return self.version
+
+    def stats(self) -> dict:
+        """Batch size distribution of question embedding and FAISS search, and the embedding cache hit rate."""
+        return {"embedding": self.embedder.stats(), "search": self.searches.stats()}
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return self.load().model.encode(texts, batch_size=len(texts))
+
+    def _search_batch(self, requests) -> List[dict]:
+        with self._lock:
+            current_index = self.index
+        return dense_search(current_index, np.vstack([embedding for embedding, _ in requests]),
+                            max(depth for _, depth in requests))
+
+    def submit_embedding(self, query: str) -> Future:
+        """Embedding of a user question without blocking: a future resolved by the embedding batch."""
+        return self.embedder.submit(query)
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """Embedding of a user question, as a read-only L2-normalised float32 vector."""
+        return self.embedder.embed(query)
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 5, min_score: float = RETRIEVAL_MIN_SCORE,
+               query: Optional[str] = None):
+        """
+        Search the vector DB with an already computed query embedding and, when the question
+        text is given, BM25 keyword search (see processing.hybrid).
+
+        Args:
+            query_embedding (np.ndarray): Normalised query embedding.
+            top_k (int): Number of results to return.
+            min_score (float): Vector results with a lower cosine similarity are dropped.
+            query (str): The question, for keyword search and reranking.
+
+        Returns:
+            List[Dict]: Top matching chunks with metadata and a "score" (cosine similarity,
+            None for keyword-only matches), best first; empty when nothing is relevant enough.
+        """
+        self.index_version()
+        with span("faiss"):
+            dense = self.searches((query_embedding, search_depth(top_k, query)))
+        with self._lock:
+            current_index = self.index
+        return search_index(current_index, self.metadata, query_embedding, top_k, min_score, query, dense=dense)
+
+    def retrieve_chunks(self, query: str, top_k: int = 5, min_score: float = RETRIEVAL_MIN_SCORE):
+        """
+        Search the vector DB for the most relevant chunks to a query.
+
+        Args:
+            query (str): User question.
+            top_k (int): Number of results to return.
+            min_score (float): Minimum cosine similarity of a vector result.
+
+        Returns:
+            List[Dict]: List of top matching chunks with metadata and scores.
+        """
+        return self.search(self.embed_query(query), top_k, min_score, query)
+
+
+# Shared instance; importing this module loads nothing
+retriever = Retriever()
+embed_query = retriever.embed_query
+search = retriever.search
+index_version = retriever.index_version
+retrieve_chunks = retriever.retrieve_chunks
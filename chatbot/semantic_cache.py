@@ -0,0 +1,157 @@
+import os
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "1000"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+# Cosine similarity above which a previous question's retrieved chunks are reused
+SEMANTIC_CACHE_CHUNK_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_CHUNK_THRESHOLD", "0.9"))
+# Cosine similarity above which a previous question's answer is reused
+SEMANTIC_CACHE_ANSWER_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_ANSWER_THRESHOLD", "0.95"))
+
+
+class CacheHit(NamedTuple):
+    similarity: float
+    chunks: list
+    answer: Optional[str]  # None below the answer threshold or when no answer was stored
+
+
+class SemanticCache:
+    """
+    Questions seen recently, looked up by embedding similarity instead of exact text.
+
+    Query embeddings are kept normalised in one matrix, so a lookup is a single
+    matrix-vector product. Entries expire after `ttl` seconds, the least recently
+    used entry is evicted when full, and everything is dropped when the index
+    version changes (the FAISS index was rebuilt).
+
+    Args:
+        max_entries (int): Questions kept; 0 disables the cache.
+        ttl (float): Seconds an entry stays valid.
+        chunk_threshold (float): Minimum similarity to reuse retrieved chunks.
+        answer_threshold (float): Minimum similarity to reuse an answer.
+    """
+
+    def __init__(self, max_entries: int = SEMANTIC_CACHE_SIZE, ttl: float = SEMANTIC_CACHE_TTL,
+                 chunk_threshold: float = SEMANTIC_CACHE_CHUNK_THRESHOLD,
+                 answer_threshold: float = SEMANTIC_CACHE_ANSWER_THRESHOLD):
+        self.max_entries = max(max_entries, 0)
+        self.ttl = ttl
+        self.chunk_threshold = chunk_threshold
+        self.answer_threshold = answer_threshold
+        self.vectors = None  # max_entries x dim, allocated on first put
+        self.valid = np.zeros(self.max_entries, dtype=bool)
+        self.entries = OrderedDict()  # slot -> [created, chunks, answer], least recently used first
+        self.free = list(range(self.max_entries - 1, -1, -1))
+        self.version = None
+        self.lookups = 0
+        self.chunk_hits = 0
+        self.answer_hits = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        return embedding / (np.linalg.norm(embedding) + 1e-12)
+
+    def _check_version(self, version):
+        if version != self.version:
+            if self.entries:
+                self.invalidations += 1
+            self.clear()
+            self.version = version
+
+    def _nearest(self, query: np.ndarray):
+        if not self.entries or self.vectors is None or self.vectors.shape[1] != query.shape[0]:
+            return None, -1.0
+        scores = self.vectors @ query
+        scores[~self.valid] = -np.inf
+        slot = int(scores.argmax())
+        return slot, float(scores[slot])
+
+    def _remove(self, slot: int):
+        del self.entries[slot]
+        self.valid[slot] = False
+        self.free.append(slot)
+
+    def lookup(self, embedding: np.ndarray, version=None) -> Optional[CacheHit]:
+        """
+        Closest cached question to `embedding`, or None below the chunk threshold.
+
+        Args:
+            embedding (np.ndarray): Query embedding.
+            version: Index version the embedding is searched against.
+        """
+        if not self.enabled:
+            return None
+        self._check_version(version)
+        self.lookups += 1
+        slot, similarity = self._nearest(self._normalize(embedding))
+        if slot is None or similarity < self.chunk_threshold:
+            return None
+        created, chunks, answer = self.entries[slot]
+        if time.monotonic() - created > self.ttl:
+            self._remove(slot)
+            return None
+        self.entries.move_to_end(slot)
+        self.chunk_hits += 1
+        if answer is None or similarity < self.answer_threshold:
+            return CacheHit(similarity, chunks, None)
+        self.answer_hits += 1
+        return CacheHit(similarity, chunks, answer)
+
+    def put(self, embedding: np.ndarray, chunks: list, answer: Optional[str] = None, version=None):
+        """
+        Remember the chunks (and optionally the answer) for a question. A near-identical
+        cached question is updated in place instead of being stored twice.
+        """
+        if not self.enabled:
+            return
+        self._check_version(version)
+        query = self._normalize(embedding)
+        if self.vectors is None or self.vectors.shape[1] != query.shape[0]:
+            self.clear()
+            self.vectors = np.zeros((self.max_entries, query.shape[0]), dtype=np.float32)
+
+        slot, similarity = self._nearest(query)
+        if slot is not None and similarity >= self.answer_threshold:
+            entry = self.entries[slot]
+            entry[0], entry[1] = time.monotonic(), chunks
+            if answer is not None:
+                entry[2] = answer
+            self.entries.move_to_end(slot)
+            return
+
+        if not self.free and self.entries:
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+            self.evictions += 1
+        slot = self.free.pop()
+        self.vectors[slot] = query
+        self.valid[slot] = True
+        self.entries[slot] = [time.monotonic(), chunks, answer]
+
+    def clear(self):
+        self.entries.clear()
+        self.valid[:] = False
+        self.free = list(range(self.max_entries - 1, -1, -1))
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "lookups": self.lookups,
+            "chunk_hits": self.chunk_hits,
+            "answer_hits": self.answer_hits,
+            "hit_rate": self.chunk_hits / self.lookups if self.lookups else 0.0,
+            "answer_hit_rate": self.answer_hits / self.lookups if self.lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
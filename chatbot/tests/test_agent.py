@@ -0,0 +1,133 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import agent as agent_module
+from agent import NO_CONTEXT_REPLY, Agent, LLMError
+from memory import ConversationMemory
+from semantic_cache import SemanticCache
+
+
+class FakeRetriever:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def embed_query(self, query):
+        return np.random.default_rng(len(query)).standard_normal(8).astype(np.float32)
+
+    def index_version(self):
+        return 1
+
+    def search(self, embedding, top_k=5, query=None):
+        return self.chunks[:top_k]
+
+
+class FakeStream:
+    """Groq AsyncStream stand-in yielding one chunk per token, `delay` seconds apart."""
+
+    def __init__(self, tokens, delay):
+        self.tokens = tokens
+        self.delay = delay
+        self.sent = 0
+        self.closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        self.closed = True
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.sent == len(self.tokens):
+            raise StopAsyncIteration
+        await asyncio.sleep(self.delay)
+        self.sent += 1
+        delta = SimpleNamespace(content=self.tokens[self.sent - 1])
+        return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+class FakeClient:
+    def __init__(self, tokens, delay=0.0):
+        self.streams = []
+
+        async def create(**kwargs):
+            self.streams.append(FakeStream(tokens, delay))
+            return self.streams[-1]
+
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=create))
+
+
+@pytest.fixture
+def make_agent():
+    def make(tokens=("Eat ", "more ", "greens."), delay=0.0, chunks=None):
+        Agent._instance = None
+        client = FakeClient(list(tokens), delay)
+        chunks = [{"id": 0, "text": "Greens are rich in fibre.", "source": "guide.pdf"}] if chunks is None else chunks
+        return Agent(retriever=FakeRetriever(chunks), client=client, cache=SemanticCache()), client
+
+    yield make
+    Agent._instance = None
+
+
+async def collect(stream):
+    return [delta async for delta in stream]
+
+
+def test_complete_reply_closes_the_stream(make_agent):
+    agent, client = make_agent()
+    memory = ConversationMemory()
+    assert "".join(asyncio.run(collect(agent.answer_stream(memory, "What should I eat?")))) == "Eat more greens."
+    assert client.streams[0].closed
+    assert len(memory.turns) == 1
+
+
+def test_cancelled_request_closes_the_stream(make_agent):
+    agent, client = make_agent(tokens=["token "] * 100, delay=0.01)
+
+    async def main():
+        task = asyncio.ensure_future(collect(agent.answer_stream(ConversationMemory(), "What should I eat?")))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    [stream] = client.streams
+    assert stream.closed
+    assert stream.sent < 100
+
+
+def test_token_timeout_closes_the_stream(make_agent, monkeypatch):
+    monkeypatch.setattr(agent_module, "LLM_TIMEOUT", 0.05)
+    agent, client = make_agent(delay=0.5)
+    with pytest.raises(LLMError, match="timed out"):
+        asyncio.run(collect(agent.answer_stream(ConversationMemory(), "What should I eat?")))
+    assert client.streams[0].closed
+
+
+def test_consumer_stopping_early_closes_the_stream(make_agent):
+    agent, client = make_agent(tokens=["token "] * 100)
+
+    async def main():
+        stream = agent.answer_stream(ConversationMemory(), "What should I eat?")
+        async for _ in stream:
+            break
+        await stream.aclose()
+
+    asyncio.run(main())
+    assert client.streams[0].closed
+    assert client.streams[0].sent == 1
+
+
+def test_no_context_skips_the_llm(make_agent):
+    agent, client = make_agent(chunks=[])
+    assert asyncio.run(collect(agent.answer_stream(ConversationMemory(), "What should I eat?"))) == [NO_CONTEXT_REPLY]
+    assert client.streams == []
@@ -0,0 +1,250 @@
+import asyncio
+import json
+
+import pytest
+import websockets
+
+import agent_client
+from agent_client import AgentBusyError, AgentPool, AgentUnavailableError
+
+
+class StubAgent:
+    """
+    Websocket server speaking the agent's frame protocol. `handle(agent, frame)` is
+    awaited for every frame received; every frame is also recorded in `received`.
+    """
+
+    def __init__(self, handle):
+        self.handle = handle
+        self.received = []
+        self.connections = []
+        self.server = None
+
+    async def __aenter__(self):
+        self.server = await websockets.serve(self._serve, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.server.close()
+        await self.server.wait_closed()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"ws://{host}:{port}"
+
+    async def _serve(self, ws):
+        self.connections.append(ws)
+        tasks = []
+        try:
+            async for raw in ws:
+                frame = json.loads(raw)
+                self.received.append(frame)
+                # Each request is handled concurrently, like the real agent
+                tasks.append(asyncio.ensure_future(self.handle(ws, frame)))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def wait_for(self, predicate, timeout: float = 2):
+        async def poll():
+            while not any(predicate(frame) for frame in self.received):
+                await asyncio.sleep(0.01)
+        await asyncio.wait_for(poll(), timeout)
+
+
+async def send(ws, request_id, type, **fields):
+    await ws.send(json.dumps({"id": request_id, "type": type, **fields}))
+
+
+async def reply(ws, request_id, *parts, delay: float = 0):
+    await send(ws, request_id, "start")
+    for part in parts:
+        await asyncio.sleep(delay)
+        await send(ws, request_id, "delta", text=part)
+    await send(ws, request_id, "end")
+
+
+def run(coroutine):
+    return asyncio.run(asyncio.wait_for(coroutine, 10))
+
+
+@pytest.fixture(autouse=True)
+def fast_reconnect(monkeypatch):
+    monkeypatch.setattr(agent_client, "AGENT_RECONNECT_MIN", 0.05)
+
+
+def test_interleaved_replies_reach_their_request():
+    async def handle(ws, frame):
+        # Later messages answer faster, so replies to one connection interleave and finish out of order
+        delay = 0.03 if "first" in frame["message"] else 0.01
+        await reply(ws, frame["id"], f"{frame['message']}:", "a", "b", "c", delay=delay)
+
+    async def main():
+        async with StubAgent(handle) as agent:
+            pool = AgentPool(agent.url, size=1)
+            await pool.start()
+            replies = await asyncio.gather(*(pool.request(f"s{i}", m) for i, m in
+                                             enumerate(["first", "second", "third"])))
+            await pool.close()
+            return replies, agent
+
+    replies, agent = run(main())
+    assert replies == ["first:abc", "second:abc", "third:abc"]
+    assert len(agent.connections) == 1
+    assert len({frame["id"] for frame in agent.received}) == 3
+
+
+def test_dropped_connection_fails_pending_requests():
+    started = []
+
+    async def handle(ws, frame):
+        await send(ws, frame["id"], "start")
+        started.append(frame["id"])
+        if len(started) == 2:  # Both requests are waiting on the agent
+            await ws.close()
+
+    async def main():
+        async with StubAgent(handle) as agent:
+            pool = AgentPool(agent.url, size=1)
+            await pool.start()
+            results = await asyncio.gather(pool.request("a", "one"), pool.request("b", "two"),
+                                           return_exceptions=True)
+            stats = pool.stats()
+            await pool.close()
+            return results, stats
+
+    results, stats = run(main())
+    assert all(isinstance(result, AgentUnavailableError) for result in results)
+    assert stats["pending"] == 0
+
+
+def test_malformed_frames_are_ignored():
+    async def handle(ws, frame):
+        await ws.send("[]")  # Valid JSON, but not a frame
+        await reply(ws, frame["id"], "ok")
+
+    async def main():
+        async with StubAgent(handle) as agent:
+            pool = AgentPool(agent.url, size=1)
+            await pool.start()
+            replies = [await pool.request("a", "one"), await pool.request("a", "two")]
+            await pool.close()
+            return replies, agent
+
+    replies, agent = run(main())
+    assert replies == ["ok", "ok"]
+    assert len(agent.connections) == 1
+
+
+def test_requests_fail_fast_while_disconnected():
+    async def main():
+        async with StubAgent(lambda ws, frame: reply(ws, frame["id"], "ok")) as agent:
+            url = agent.url
+        pool = AgentPool(url, size=1)
+        await pool.start(wait=0.1)
+        try:
+            await pool.request("a", "hello")
+        finally:
+            await pool.close()
+
+    with pytest.raises(AgentUnavailableError):
+        run(main())
+
+
+def test_max_pending_rejects_with_busy():
+    release = None
+
+    async def handle(ws, frame):
+        await release.wait()
+        await reply(ws, frame["id"], "done")
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        async with StubAgent(handle) as agent:
+            pool = AgentPool(agent.url, size=1, max_pending=2)
+            await pool.start()
+            held = [asyncio.ensure_future(pool.request(f"s{i}", "wait")) for i in range(2)]
+            await agent.wait_for(lambda frame: True)
+            with pytest.raises(AgentBusyError):
+                await pool.request("s3", "one too many")
+            release.set()
+            replies = await asyncio.gather(*held)
+            stats = pool.stats()
+            await pool.close()
+            return replies, stats
+
+    replies, stats = run(main())
+    assert replies == ["done", "done"]
+    assert (stats["rejected"], stats["completed"], stats["pending"]) == (1, 2, 0)
+
+
+def test_timeout_sends_cancel_frame():
+    async def handle(ws, frame):
+        if frame.get("type") != "cancel":
+            await send(ws, frame["id"], "start")  # ...and never finishes
+
+    async def main():
+        async with StubAgent(handle) as agent:
+            pool = AgentPool(agent.url, size=1, timeout=0.2)
+            await pool.start()
+            with pytest.raises(asyncio.TimeoutError):
+                await pool.request("a", "slow question")
+            await agent.wait_for(lambda frame: frame.get("type") == "cancel")
+            stats = pool.stats()
+            await pool.close()
+            return agent.received, stats
+
+    received, stats = run(main())
+    request, cancel = received
+    assert cancel == {"id": request["id"], "type": "cancel"}
+    assert stats["timeouts"] == 1
+
+
+def test_abandoned_stream_sends_cancel_frame():
+    async def handle(ws, frame):
+        if frame.get("type") != "cancel":
+            await send(ws, frame["id"], "start")
+            await send(ws, frame["id"], "delta", text="partial")
+
+    async def main():
+        async with StubAgent(handle) as agent:
+            pool = AgentPool(agent.url, size=1)
+            await pool.start()
+            stream = pool.stream("a", "question")
+            async for frame in stream:
+                if frame["type"] == "delta":
+                    break
+            await stream.aclose()
+            await agent.wait_for(lambda frame: frame.get("type") == "cancel")
+            await pool.close()
+            return agent.received
+
+    request, cancel = run(main())
+    assert cancel["id"] == request["id"]
+
+
+def test_sessions_stick_to_one_agent():
+    def handle_as(name):
+        async def handle(ws, frame):
+            await reply(ws, frame["id"], name)
+        return handle
+
+    async def main():
+        async with StubAgent(handle_as("a")) as first, StubAgent(handle_as("b")) as second:
+            pool = AgentPool(f"{first.url},{second.url}", size=1)
+            await pool.start()
+            while pool.stats()["connected"] < 2:
+                await asyncio.sleep(0.01)
+            answered = {}
+            for session in (f"session-{i}" for i in range(20)):
+                answered[session] = {await pool.request(session, "hi") for _ in range(3)}
+            await pool.close()
+            return answered
+
+    answered = run(main())
+    assert all(len(agents) == 1 for agents in answered.values())
+    assert set.union(*answered.values()) == {"a", "b"}
@@ -0,0 +1,64 @@
+import faiss
+import numpy as np
+import pytest
+
+from processing.hybrid import reciprocal_rank_fusion, search_index
+from utils.metadata_store import MetadataStore
+
+TEXTS = [
+    "Asida is a Libyan dough dish served with date syrup.",
+    "Lentil soup is rich in protein and fibre.",
+    "Drink water before meals to feel full sooner.",
+    "Protein helps muscles recover after exercise.",
+]
+DIM = 8
+
+
+def unit(*components):
+    vector = np.zeros(DIM, dtype=np.float32)
+    vector[:len(components)] = components
+    return vector / np.linalg.norm(vector)
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    store = MetadataStore(str(tmp_path / "metadata.db"))
+    ids = store.append({"chunk_id": i, "source": "guide.pdf", "text": text} for i, text in enumerate(TEXTS))
+    # Each chunk along its own axis, so a query's cosine with every chunk is set exactly
+    vectors = np.eye(DIM, dtype=np.float32)[:len(TEXTS)]
+    index = faiss.IndexIDMap(faiss.IndexFlatIP(DIM))
+    index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+    yield index, store
+    store.close()
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    assert reciprocal_rank_fusion([[1, 2, 3], [3, 1]], k=60) == [1, 3, 2]
+
+
+def test_off_topic_question_gets_nothing_even_with_keyword_matches(corpus):
+    index, store = corpus
+    # Shares "protein" with two chunks, but no chunk's cosine reaches min_score
+    query = unit(0.1, 0.1, 0.1, 0.1, 1)
+    assert store.search_text("How much protein is in a car battery?")
+    assert search_index(index, store, query, top_k=3, min_score=0.3, query="How much protein is in a car battery?",
+                        reranker="") == []
+
+
+def test_dense_only_search_drops_results_below_min_score(corpus):
+    index, store = corpus
+    results = search_index(index, store, unit(1, 0.2), top_k=3, min_score=0.3, hybrid=False)
+    assert [chunk["chunk_id"] for chunk in results] == [0]
+    assert results[0]["score"] == pytest.approx(0.98, abs=0.01)
+
+
+def test_supported_question_adds_keyword_matches(corpus):
+    index, store = corpus
+    # Close to the lentil chunk only; "protein" also matches the exercise chunk by keyword
+    results = search_index(index, store, unit(0, 1), top_k=3, min_score=0.3, query="Which soups have protein?",
+                           reranker="")
+    by_chunk = {chunk["chunk_id"]: chunk for chunk in results}
+    assert results[0]["chunk_id"] == 1
+    assert by_chunk[1]["score"] == pytest.approx(1.0) and "bm25" in by_chunk[1]
+    assert by_chunk[3]["score"] is None and by_chunk[3]["bm25"] > 0
+    assert 2 not in by_chunk
@@ -0,0 +1,18 @@
+import json
+
+from utils.metadata_store import migrate_json
+
+
+def test_migrated_json_chunks_belong_to_their_document(tmp_path):
+    legacy = tmp_path / "metadata.json"
+    legacy.write_text(json.dumps([
+        {"chunk_id": 0, "source": "uploads/guide.pdf#page=1", "text": "Lentils are rich in protein."},
+        {"chunk_id": 1, "source": "uploads/guide.pdf#page=2", "text": "Drink water before meals."},
+    ]), encoding="utf-8")
+
+    store = migrate_json(str(legacy), str(tmp_path / "metadata.db"))
+
+    assert store.document_ids("uploads/guide.pdf") == [0, 1]
+    assert [chunk["text"] for chunk in store.get_many([0, 1])] == [
+        "Lentils are rich in protein.", "Drink water before meals."]
+    store.close()
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from semantic_cache import SemanticCache
+
+
+def vector(seed, dim=8):
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+@pytest.mark.parametrize("size", [0, -1])
+def test_zero_size_disables_the_cache(size):
+    cache = SemanticCache(max_entries=size)
+    assert not cache.enabled
+    cache.put(np.ones(4), [], "a")
+    assert cache.lookup(np.ones(4)) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_reuses_answer_of_the_same_question():
+    cache = SemanticCache(max_entries=4)
+    cache.put(vector(1), [{"id": 1}], "answer", version=1)
+    hit = cache.lookup(vector(1), version=1)
+    assert hit.answer == "answer" and hit.chunks == [{"id": 1}]
+    assert cache.lookup(vector(2), version=1) is None
+
+
+def test_new_index_version_drops_entries():
+    cache = SemanticCache(max_entries=4)
+    cache.put(vector(1), [], "answer", version=1)
+    assert cache.lookup(vector(1), version=2) is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_evicts_least_recently_used_when_full():
+    cache = SemanticCache(max_entries=2)
+    cache.put(vector(1), [], "one")
+    cache.put(vector(2), [], "two")
+    cache.lookup(vector(1))
+    cache.put(vector(3), [], "three")
+    assert cache.lookup(vector(2)) is None
+    assert cache.lookup(vector(1)).answer == "one"
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,291 @@
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+METADATA_DB_PATH = "data/embeddings/metadata.db"
+LEGACY_METADATA_PATH = "data/embeddings/metadata.json"
+
+logger = logging.getLogger("chatbot.metadata_store")
+
+SCHEMA_VERSION = 4
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,  -- FAISS vector id
+    chunk_id INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    text TEXT NOT NULL,
+    document TEXT  -- path of the ingested file (added in version 3)
+);
+-- Index-wide settings such as the distance metric (added in version 2)
+CREATE TABLE IF NOT EXISTS info (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+-- Ingested files and a hash of their content (added in version 3)
+CREATE TABLE IF NOT EXISTS documents (
+    path TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    pages INTEGER NOT NULL,
+    chunks INTEGER NOT NULL,
+    ingested_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_sha256 ON documents (sha256);
+-- Full-text index of chunk texts for BM25 search, kept in sync by triggers (added in version 4)
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+    text, content='chunks', content_rowid='id', tokenize='porter unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS chunks_fts_insert AFTER INSERT ON chunks BEGIN
+    INSERT INTO chunks_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS chunks_fts_delete AFTER DELETE ON chunks BEGIN
+    INSERT INTO chunks_fts (chunks_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+# Words too common to help a keyword search
+STOPWORDS = frozenset("""
+a about an and are as at be but by can could do does for from had has have how i if in into is it its me my
+no not of on or should so than that the their them there these they this to was we were what when where which
+who why will with would you your
+""".split())
+
+
+def fts_query(text: str) -> Optional[str]:
+    """FTS5 query matching any of the words of `text`, or None when it has no searchable word."""
+    words = [w for w in re.findall(r"\w+", text.lower()) if w not in STOPWORDS]
+    return " OR ".join(f'"{w}"' for w in dict.fromkeys(words)) or None
+
+
+# Chunks of stores created before version 3 get their document from the "path#page=N" source
+MIGRATE_V3 = """
+ALTER TABLE chunks ADD COLUMN document TEXT;
+UPDATE chunks SET document = substr(source, 1, instr(source, '#page=') - 1) WHERE instr(source, '#page=') > 0;
+"""
+
+
+class MetadataStore:
+    """
+    Chunk metadata in an sqlite table keyed by FAISS vector id.
+
+    Nothing is loaded up front: `get_many` reads only the rows a search returned, and
+    `append` writes only the new rows. An FTS5 table indexes the chunk texts for BM25
+    keyword search. Ingested files are recorded with a hash of their content so that
+    unchanged files are skipped and replaced files can be removed. One connection is
+    shared by all threads under a lock; queries are primary-key lookups, so the lock
+    is held for microseconds.
+
+    Args:
+        path (str): sqlite database file, created if missing.
+    """
+
+    def __init__(self, path: str = METADATA_DB_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(chunks)")]
+        if columns and "document" not in columns:
+            self._conn.executescript(MIGRATE_V3)
+        has_fts = self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'chunks_fts'").fetchone()
+        self._conn.executescript(SCHEMA)
+        if not has_fts:
+            self._conn.execute("INSERT INTO chunks_fts (chunks_fts) VALUES ('rebuild')")
+        self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def _next_id(self) -> int:
+        # Ids of removed chunks are never reused, so a stale index cannot return another chunk's id
+        row = self._conn.execute("SELECT value FROM info WHERE key = 'next_id'").fetchone()
+        highest = self._conn.execute("SELECT COALESCE(MAX(id) + 1, 0) FROM chunks").fetchone()[0]
+        return max(highest, int(row[0]) if row else 0)
+
+    def next_id(self) -> int:
+        """Id the next appended chunk will get."""
+        with self._lock:
+            return self._next_id()
+
+    def append(self, chunks: Iterable[Dict]) -> List[int]:
+        """
+        Add chunks after the existing ones, with increasing ids that are used as their FAISS ids.
+
+        Returns:
+            List[int]: Ids assigned to the chunks.
+        """
+        with self._lock:
+            start = self._next_id()
+            rows = [(start + i, c["chunk_id"], c["source"], c["text"], c.get("document"))
+                    for i, c in enumerate(chunks)]
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO chunks (id, chunk_id, source, text, document) VALUES (?, ?, ?, ?, ?)", rows)
+                self._conn.execute("INSERT OR REPLACE INTO info (key, value) VALUES ('next_id', ?)",
+                                   (str(start + len(rows)),))
+        return [row[0] for row in rows]
+
+    def get_many(self, ids: Iterable[int]) -> List[Dict]:
+        """Chunks for the given ids, in the same order; unknown ids are skipped."""
+        ids = [int(i) for i in ids]
+        if not ids:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, chunk_id, source, text FROM chunks WHERE id IN ({','.join('?' * len(ids))})", ids
+            ).fetchall()
+        found = {row[0]: {"id": row[0], "chunk_id": row[1], "source": row[2], "text": row[3]} for row in rows}
+        return [found[i] for i in ids if i in found]
+
+    def search_text(self, query: str, limit: int = 50) -> List[Tuple[int, float]]:
+        """
+        BM25 keyword search over chunk texts.
+
+        Returns:
+            List[Tuple[int, float]]: (id, BM25 score) of the best chunks, best first.
+        """
+        match = fts_query(query)
+        if match is None:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT rowid, -bm25(chunks_fts) FROM chunks_fts WHERE chunks_fts MATCH ? ORDER BY rank LIMIT ?",
+                (match, limit)).fetchall()
+        return rows
+
+    def get_info(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM info WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_info(self, key: str, value: str):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def document(self, path: str) -> Optional[Dict]:
+        """Ingestion record of a file (sha256, pages, chunks, ingested_at), or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256, pages, chunks, ingested_at FROM documents WHERE path = ?", (path,)).fetchone()
+        return dict(zip(("sha256", "pages", "chunks", "ingested_at"), row)) if row else None
+
+    def find_document(self, sha256: str) -> Optional[str]:
+        """Path of an ingested file with this content hash, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT path FROM documents WHERE sha256 = ?", (sha256,)).fetchone()
+        return row[0] if row else None
+
+    def documents(self) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, sha256, pages, chunks, ingested_at FROM documents ORDER BY path").fetchall()
+        return [dict(zip(("path", "sha256", "pages", "chunks", "ingested_at"), row)) for row in rows]
+
+    def document_ids(self, path: str) -> List[int]:
+        """Ids of the chunks of a file."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT id FROM chunks WHERE document = ?", (path,))]
+
+    def add_document(self, path: str, sha256: str, pages: int, chunks: int):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (path, sha256, pages, chunks, ingested_at) VALUES (?, ?, ?, ?, ?)",
+                (path, sha256, pages, chunks, time.time()))
+
+    def remove_document(self, path: str) -> int:
+        """
+        Delete a file's chunks and ingestion record.
+
+        Returns:
+            int: Number of chunks deleted.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO info (key, value) VALUES ('next_id', ?)", (str(self._next_id()),))
+            self._conn.execute("DELETE FROM documents WHERE path = ?", (path,))
+            return self._conn.execute("DELETE FROM chunks WHERE document = ?", (path,)).rowcount
+
+    def record_documents(self, documents: Iterable[tuple], removed_ids: Iterable[int] = ()):
+        """
+        Finish an ingestion in one transaction: record the ingested files as
+        (path, sha256, pages, chunks), delete the chunks whose vectors were removed, and
+        mark every chunk up to now as present in the written index.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO info (key, value) VALUES ('next_id', ?)", (str(self._next_id()),))
+            self._conn.executemany("DELETE FROM chunks WHERE id = ?", ((int(i),) for i in removed_ids))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO documents (path, sha256, pages, chunks, ingested_at) VALUES (?, ?, ?, ?, ?)",
+                ((*document, time.time()) for document in documents))
+            self._conn.execute("INSERT OR REPLACE INTO info (key, value) VALUES ('indexed_next_id', ?)",
+                               (str(self._next_id()),))
+
+    def discard_unindexed(self) -> int:
+        """
+        Delete chunks appended after the last `record_documents`, left by an interrupted ingestion.
+
+        Returns:
+            int: Number of chunks deleted.
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT value FROM info WHERE key = 'indexed_next_id'").fetchone()
+            if row is None:
+                return 0
+            return self._conn.execute("DELETE FROM chunks WHERE id >= ?", (int(row[0]),)).rowcount
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.execute("DELETE FROM documents")
+            self._conn.execute("DELETE FROM info WHERE key IN ('next_id', 'indexed_next_id')")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def migrate_json(json_path: str = LEGACY_METADATA_PATH, db_path: str = METADATA_DB_PATH) -> MetadataStore:
+    """
+    Copy a legacy metadata.json list into a new store; list position becomes the vector id.
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+    store = MetadataStore(db_path)
+    if len(store):
+        raise ValueError(f"{db_path} already holds chunks, not migrating over it")
+    # As in MIGRATE_V3, legacy chunks get their document from the "path#page=N" source
+    for chunk in metadata:
+        document, separator, _ = chunk["source"].partition("#page=")
+        if separator and not chunk.get("document"):
+            chunk["document"] = document
+    store.append(metadata)
+    logger.info("✅ Migrated %d chunks from %s to %s", len(metadata), json_path, db_path)
+    return store
+
+
+def open_store(db_path: str = METADATA_DB_PATH, legacy_path: Optional[str] = None) -> MetadataStore:
+    """
+    Open the metadata store, migrating the legacy JSON file first if only that exists.
+    The legacy file defaults to the store's path with a .json extension.
+    """
+    legacy_path = legacy_path or os.path.splitext(db_path)[0] + ".json"
+    if not os.path.exists(db_path) and os.path.exists(legacy_path):
+        return migrate_json(legacy_path, db_path)
+    return MetadataStore(db_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate chunk metadata from metadata.json to sqlite.")
+    parser.add_argument("--json", default=LEGACY_METADATA_PATH)
+    parser.add_argument("--db", default=METADATA_DB_PATH)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    migrate_json(args.json, args.db)
@@ -1,16 +1,31 @@
 import fitz  # PyMuPDF
-from typing import List, Dict
+from typing import Dict, Iterator, List, Optional
 
-def extract_text_from_pdf(file_path: str) -> List[Dict]:
-    doc = fitz.open(file_path)
-    pages = []
-    for page_num in range(len(doc)):
-        page = doc[page_num]
-        text = page.get_text("text")
-        if text.strip():
-            pages.append({
-                "source": f"{file_path}#page={page_num + 1}",
-                "text": text.strip(),
-                "page": page_num + 1
-            })
-    return pages
\ No newline at end of file
+
+def page_count(file_path: str) -> int:
+    with fitz.open(file_path) as doc:
+        return len(doc)
+
+
+def iter_pdf_pages(file_path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[Dict]:
+    """
+    Yield the non-empty pages of a PDF one at a time, so only the current page's text is held.
+
+    Args:
+        file_path (str): PDF file.
+        start (int): First page (0-based).
+        stop (int): Page after the last one, the end of the document by default.
+    """
+    with fitz.open(file_path) as doc:
+        for page_num in range(start, min(stop if stop is not None else len(doc), len(doc))):
+            text = doc[page_num].get_text("text").strip()
+            if text:
+                yield {
+                    "source": f"{file_path}#page={page_num + 1}",
+                    "text": text,
+                    "page": page_num + 1
+                }
+
+
+def extract_text_from_pdf(file_path: str, start: int = 0, stop: Optional[int] = None) -> List[Dict]:
+    return list(iter_pdf_pages(file_path, start, stop))
@@ -1,105 +1,320 @@
 import faiss
+import logging
 import os
 import numpy as np
-import json
-from typing import List, Dict
-from processing.embedder import embed_chunks
+from typing import List, Dict, Optional
+from processing.embedder import embed_chunks, load_model, EMBEDDING_MODEL
+from utils.metadata_store import METADATA_DB_PATH, MetadataStore, open_store
 
-# Create FAISS index from list of embeddings (2D numpy array)
-def build_faiss_index(embeddings: np.ndarray) -> faiss.Index:
-    dim = embeddings.shape[1]
-    index = faiss.IndexFlatL2(dim)
-    index.add(embeddings)
+logger = logging.getLogger("chatbot.vector_db")
+
+# "cosine" (inner product over L2-normalised vectors) or "l2"
+FAISS_METRIC = os.getenv("FAISS_METRIC", "cosine")
+# "flat" (exact), "ivf_flat", "ivf_pq" or "hnsw"
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+FAISS_NLIST = int(os.getenv("FAISS_NLIST", "0"))  # IVF lists, 0 picks ~4 * sqrt(vectors), fewer for small corpora
+FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "48"))  # PQ sub-quantizers, must divide the dimension
+FAISS_PQ_BITS = int(os.getenv("FAISS_PQ_BITS", "8"))
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_EF_CONSTRUCTION = int(os.getenv("FAISS_EF_CONSTRUCTION", "200"))
+FAISS_TRAIN_SAMPLE = int(os.getenv("FAISS_TRAIN_SAMPLE", "100000"))  # Vectors used to train IVF/PQ
+# Search-time accuracy/speed trade-off, applied whenever an index is loaded
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+METRICS = {"cosine": faiss.METRIC_INNER_PRODUCT, "l2": faiss.METRIC_L2}
+MIN_TRAIN_POINTS_PER_LIST = 39  # Below this FAISS warns that k-means is unreliable
+
+
+def embedding_dimension(model_name: str = EMBEDDING_MODEL) -> int:
+    """Output dimension of the embedding model."""
+    return load_model(model_name).get_sentence_embedding_dimension()
+
+
+def index_type_of(index: faiss.Index) -> str:
+    """Name of the INDEX_TYPES entry an index was built as."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap):
+        index = faiss.downcast_index(index.index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def metric_of(index: faiss.Index) -> str:
+    """"cosine" for inner-product indexes, "l2" otherwise."""
+    return "cosine" if index.metric_type == faiss.METRIC_INNER_PRODUCT else "l2"
+
+
+def normalize(embeddings: np.ndarray) -> np.ndarray:
+    """L2-normalised float32 copy of a 2D array of embeddings."""
+    embeddings = np.array(embeddings, dtype="float32", order="C", ndmin=2)
+    faiss.normalize_L2(embeddings)
+    return embeddings
+
+
+def prepare(embeddings: np.ndarray, metric: str) -> np.ndarray:
+    """Embeddings as the index expects them: normalised for cosine, unchanged for L2."""
+    if metric == "cosine":
+        return normalize(embeddings)
+    return np.ascontiguousarray(embeddings, dtype="float32")
+
+
+def similarities(distances: np.ndarray, metric: str) -> np.ndarray:
+    """
+    Cosine similarities from FAISS search results. Inner products of normalised vectors
+    already are; squared L2 distances d between unit vectors give 1 - d / 2.
+    """
+    return distances if metric == "cosine" else 1 - distances / 2
+
+
+def set_search_params(index: faiss.Index, nprobe: int = FAISS_NPROBE, ef_search: int = FAISS_EF_SEARCH) -> faiss.Index:
+    """Apply nprobe (IVF) or efSearch (HNSW) to an index; other indexes are unchanged."""
+    kind = index_type_of(index)
+    if kind in ("ivf_flat", "ivf_pq"):
+        faiss.extract_index_ivf(index).nprobe = nprobe
+    elif kind == "hnsw":
+        faiss.ParameterSpace().set_index_parameter(index, "efSearch", ef_search)
     return index
 
-# Save FAISS index and metadata
-def save_faiss_index(chunks, index_path="data/embeddings/index.faiss", metadata_path="data/embeddings/metadata.json"):
-    embeddings = np.array([chunk["embedding"] for chunk in chunks]).astype("float32")
-    metadata = [{"chunk_id": chunk["chunk_id"], "source": chunk["source"], "text": chunk["text"]} for chunk in chunks]
 
-    index = build_faiss_index(embeddings)
+def has_ids(index: faiss.Index) -> bool:
+    """
+    Whether vectors can be added with explicit ids and removed. IVF indexes store ids
+    natively; flat and HNSW indexes need an IndexIDMap2 around them.
+    """
+    return isinstance(faiss.downcast_index(index), (faiss.IndexIDMap, faiss.IndexIVF))
+
+
+def vectors_and_ids(index: faiss.Index):
+    """All vectors of a flat or HNSW index with their ids (IVF-PQ vectors cannot be recovered exactly)."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap):
+        return index.index.reconstruct_n(0, index.ntotal), faiss.vector_to_array(index.id_map)
+    return index.reconstruct_n(0, index.ntotal), np.arange(index.ntotal, dtype="int64")
+
+
+def _refill(index: faiss.Index, embeddings: np.ndarray, ids: np.ndarray) -> faiss.Index:
+    # An empty copy with the same structure and training, wrapped to hold explicit ids
+    base = faiss.downcast_index(index)
+    if isinstance(base, faiss.IndexIDMap):
+        base = base.index
+    empty = faiss.clone_index(base)
+    empty.reset()
+    index = faiss.IndexIDMap2(empty)
+    index.add_with_ids(embeddings, ids)
+    return set_search_params(index)
+
+
+def with_ids(index: faiss.Index) -> faiss.Index:
+    """An index that supports explicit ids; ids of existing vectors are their positions."""
+    if has_ids(index):
+        return index
+    return _refill(index, *vectors_and_ids(index))
+
 
-    os.makedirs(os.path.dirname(index_path), exist_ok=True)
-    faiss.write_index(index, index_path)
+def add_vectors(index: faiss.Index, embeddings: np.ndarray, ids) -> faiss.Index:
+    """Add embeddings under the given ids, prepared for the index's metric."""
+    index = with_ids(index)
+    index.add_with_ids(prepare(embeddings, metric_of(index)), np.asarray(ids, dtype="int64"))
+    return index
+
+
+def remove_vectors(index: faiss.Index, ids) -> faiss.Index:
+    """
+    Remove the vectors with the given ids. HNSW graphs cannot delete nodes, so they are
+    rebuilt from the remaining vectors.
+    """
+    index = with_ids(index)
+    ids = np.asarray(ids, dtype="int64")
+    if not len(ids):
+        return index
+    if index_type_of(index) != "hnsw":
+        index.remove_ids(ids)
+        return index
+    embeddings, existing = vectors_and_ids(index)
+    keep = ~np.isin(existing, ids)
+    return _refill(index, embeddings[keep], existing[keep])
+
+
+def _train_sample(embeddings: np.ndarray, size: int) -> np.ndarray:
+    if len(embeddings) <= size:
+        return embeddings
+    rows = np.random.default_rng(0).choice(len(embeddings), size, replace=False)
+    return embeddings[np.sort(rows)]
+
+
+# Create FAISS index from list of embeddings (2D numpy array)
+def build_faiss_index(embeddings: np.ndarray, index_type: str = FAISS_INDEX_TYPE, nlist: int = FAISS_NLIST,
+                      pq_m: int = FAISS_PQ_M, pq_bits: int = FAISS_PQ_BITS, hnsw_m: int = FAISS_HNSW_M,
+                      ef_construction: int = FAISS_EF_CONSTRUCTION,
+                      train_sample: int = FAISS_TRAIN_SAMPLE, metric: str = FAISS_METRIC,
+                      ids: Optional[np.ndarray] = None) -> faiss.Index:
+    """
+    Build an index of the given type and metric over `embeddings`.
+
+    With the cosine metric, embeddings are L2-normalised and searched by inner product.
+    IVF indexes are trained on a random sample of at most `train_sample` vectors; when
+    there are too few vectors to train them, an exact flat index is built instead.
+    With `ids`, vectors are stored under those ids and can later be removed.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}, expected one of {INDEX_TYPES}")
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric!r}, expected one of {tuple(METRICS)}")
+    embeddings = prepare(embeddings, metric)
+    count, dim = embeddings.shape
+    metric_type = METRICS[metric]
+
+    if index_type in ("ivf_flat", "ivf_pq"):
+        nlist = nlist or min(int(4 * np.sqrt(count)), count // MIN_TRAIN_POINTS_PER_LIST)
+        needed = nlist * MIN_TRAIN_POINTS_PER_LIST
+        if index_type == "ivf_pq":
+            needed = max(needed, MIN_TRAIN_POINTS_PER_LIST * 2 ** pq_bits)  # PQ codebooks
+        if nlist < 1 or count < needed:
+            logger.warning("⚠️ %d vectors are too few to train %s with %d lists, using flat", count, index_type, nlist)
+            index_type = "flat"
+
+    if index_type == "flat":
+        index = faiss.IndexFlat(dim, metric_type)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m, metric_type)
+        index.hnsw.efConstruction = ef_construction
+    else:
+        quantizer = faiss.IndexFlat(dim, metric_type)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, metric_type)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, pq_bits, metric_type)
+        index.train(_train_sample(embeddings, train_sample))
 
-    with open(metadata_path, "w", encoding="utf-8") as f:
-        json.dump(metadata, f, ensure_ascii=False, indent=2)
+    if ids is None:
+        index.add(embeddings)
+    else:
+        if not isinstance(index, faiss.IndexIVF):
+            index = faiss.IndexIDMap2(index)
+        index.add_with_ids(embeddings, np.asarray(ids, dtype="int64"))
+    return set_search_params(index)
+
+
+def rebuild_index(index: faiss.Index, index_type: str = FAISS_INDEX_TYPE) -> faiss.Index:
+    """
+    Convert a flat index to `index_type` once it holds enough vectors, keeping vector ids.
+    Other indexes are returned unchanged (their vectors cannot be recovered exactly).
+    """
+    if index_type == "flat" or index_type_of(index) != "flat" or index.ntotal == 0:
+        return index
+    embeddings, ids = vectors_and_ids(index)
+    rebuilt = build_faiss_index(embeddings, index_type, metric=metric_of(index), ids=ids)
+    return rebuilt if index_type_of(rebuilt) != "flat" else index
+
+
+def write_index(index: faiss.Index, index_path="data/embeddings/index.faiss"):
+    """Write an index atomically, so a retriever reloading it never reads a partial file."""
+    os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+    faiss.write_index(index, index_path + ".tmp")
+    os.replace(index_path + ".tmp", index_path)
+
+# Save FAISS index and metadata
+def save_faiss_index(chunks, index_path="data/embeddings/index.faiss", metadata_path=METADATA_DB_PATH):
+    embeddings = np.array([chunk["embedding"] for chunk in chunks]).astype("float32")
+
+    store = MetadataStore(metadata_path)
+    store.clear()
+    ids = store.append(chunks)
+    index = build_faiss_index(embeddings, ids=ids)
+    write_index(index, index_path)
+    store.set_info("metric", metric_of(index))
+    store.record_documents([])
+    store.close()
 
     print(f"✅ Saved FAISS index to: {index_path}")
     print(f"📝 Saved metadata to: {metadata_path}")
 
 
-# Load FAISS index and metadata
-def load_faiss_index(index_path="data/embeddings/index.faiss", metadata_path="data/embeddings/metadata.json"):
-    index = faiss.read_index(index_path)
-    with open(metadata_path, "r", encoding="utf-8") as f:
-        metadata = json.load(f)
-    return index, metadata
+# Load a FAISS index with the configured search parameters
+def read_index(index_path="data/embeddings/index.faiss", mmap: bool = False) -> faiss.Index:
+    """
+    With `mmap`, vectors stay in the file and are paged in by the OS on demand (and shared
+    between processes). Such an index is read-only: adding to it aborts the process.
+    """
+    flags = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0) if mmap else 0
+    return set_search_params(faiss.read_index(index_path, flags))
+
+
+# Load FAISS index and metadata store (metadata rows are read on demand)
+def load_faiss_index(index_path="data/embeddings/index.faiss", metadata_path=METADATA_DB_PATH, mmap: bool = False):
+    index, store = read_index(index_path, mmap), open_store(metadata_path)
+    stored = store.get_info("metric")
+    if stored is not None and stored != metric_of(index):
+        logger.warning("⚠️ Metadata says the index metric is %s but %s uses %s", stored, index_path, metric_of(index))
+    return index, store
 
 # Embeds new chunks and updates the existing FAISS index and metadata
 def update_index_with_new_chunks(
     new_chunks: List[Dict],
     index_path: str = "data/embeddings/index.faiss",
-    metadata_path: str = "data/embeddings/metadata.json"
+    metadata_path: str = METADATA_DB_PATH
 ) -> None:
     """
-    Adds new embedded chunks to an existing FAISS index and updates the metadata file.
+    Adds new embedded chunks to an existing FAISS index and appends their metadata rows.
 
     Args:
         new_chunks (List[Dict]): New document chunks (unembedded).
         index_path (str): Path to the existing FAISS index.
-        metadata_path (str): Path to the existing metadata JSON file.
+        metadata_path (str): Path to the metadata store.
     """
     print("🔄 Embedding new chunks...")
     embedded_chunks = embed_chunks(new_chunks)
     embeddings = np.array([chunk["embedding"] for chunk in embedded_chunks]).astype("float32")
 
-    print("📥 Loading existing index and metadata...")
-    if not os.path.exists(index_path) or not os.path.exists(metadata_path):
+    print("📥 Loading existing index...")
+    if not os.path.exists(index_path):
         save_faiss_index(embedded_chunks, index_path, metadata_path)
         return
 
-    index = faiss.read_index(index_path)
-    with open(metadata_path, "r", encoding="utf-8") as f:
-        try:
-            metadata = json.load(f)
-        except json.JSONDecodeError:
-            metadata = []
+    index, store = load_faiss_index(index_path, metadata_path)
+    if len(store) != index.ntotal:
+        raise ValueError(f"Index has {index.ntotal} vectors but metadata has {len(store)} rows")
 
     print("➕ Adding new embeddings to index...")
-    index.add(embeddings)
+    index = add_vectors(index, embeddings, np.arange(store.next_id(), store.next_id() + len(embeddings)))
+    index = rebuild_index(index)
 
-    print("📝 Updating metadata...")
-    new_metadata = [
-        {"chunk_id": chunk["chunk_id"], "source": chunk["source"], "text": chunk["text"]}
-        for chunk in embedded_chunks
-    ]
-    metadata.extend(new_metadata)
+    print("💾 Saving updated index...")
+    write_index(index, index_path)
 
-    print("💾 Saving updated index and metadata...")
-    faiss.write_index(index, index_path)
-    with open(metadata_path, "w", encoding="utf-8") as f:
-        json.dump(metadata, f, ensure_ascii=False, indent=2)
+    print("📝 Appending metadata...")
+    store.append(embedded_chunks)
+    store.record_documents([])
+    store.close()
 
     print(f"✅ Successfully added {len(new_chunks)} new chunks to the index.")
 
 # Empty FAISS index and metadata
-def empty_faiss_index(index_path="data/embeddings/index.faiss", metadata_path="data/embeddings/metadata.json"):
+def empty_faiss_index(index_path="data/embeddings/index.faiss", metadata_path=METADATA_DB_PATH,
+                      dim: Optional[int] = None):
     """
-    Empties the FAISS index and metadata by creating a new empty index and clearing the metadata file.
+    Empties the FAISS index and metadata by creating a new empty index and clearing the metadata store.
+    The empty index is flat; it is converted to FAISS_INDEX_TYPE once enough chunks are added.
 
     Args:
         index_path (str): Path to the FAISS index.
-        metadata_path (str): Path to the metadata JSON file.
+        metadata_path (str): Path to the metadata store.
+        dim (int): Embedding dimension, read from the embedding model by default.
     """
-    dim = 384  # Assuming the embedding dimension is 384 (adjust if different)
-    index = faiss.IndexFlatL2(dim)
-
-    os.makedirs(os.path.dirname(index_path), exist_ok=True)
-    faiss.write_index(index, index_path)
+    index = faiss.IndexIDMap2(faiss.IndexFlat(dim or embedding_dimension(), METRICS[FAISS_METRIC]))
+    write_index(index, index_path)
 
-    with open(metadata_path, "w", encoding="utf-8") as f:
-        json.dump([], f, ensure_ascii=False, indent=2)
+    store = MetadataStore(metadata_path)
+    store.clear()
+    store.set_info("metric", FAISS_METRIC)
+    store.close()
 
     print(f"🗑️ Emptied FAISS index: {index_path}")
     print(f"🗑️ Emptied metadata: {metadata_path}")
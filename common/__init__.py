@@ -0,0 +1,6 @@
+"""
+Code shared by the meal detection API (api/) and the chatbot (chatbot/).
+
+Both services run from their own directory; their observability modules put the
+repository root on sys.path so that `common` can be imported.
+"""
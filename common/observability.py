@@ -0,0 +1,73 @@
+import contextvars
+import logging
+import os
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+from prometheus_client import multiprocess
+
+# DEBUG adds a line per request and per timed stage; INFO (default) keeps startup, connections and errors
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Id of the request being served, set by each service when a request or message comes in
+request_id_var = contextvars.ContextVar("request_id", default="-")
+
+
+class RequestIdFilter(logging.Filter):
+    """Adds the current request id to every record, as %(request_id)s."""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+def configure_logging(service: logging.Logger, level: str = LOG_LEVEL):
+    """Log to stderr with the request id on every line: `service` and this package at `level`, libraries at WARNING."""
+    handler = logging.StreamHandler()
+    handler.addFilter(RequestIdFilter())
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+    logging.basicConfig(level=logging.WARNING, handlers=[handler])
+    service.setLevel(level)
+    logging.getLogger("common").setLevel(level)
+
+
+class StageTimer:
+    """
+    Records stage durations into a histogram labelled by stage, with a debug line each.
+
+    Args:
+        histogram (Histogram): Histogram with a single "stage" label.
+        logger (logging.Logger): Logger of the debug lines.
+    """
+
+    def __init__(self, histogram, logger: logging.Logger):
+        self.logger = logger
+        self._stage = lru_cache(maxsize=None)(histogram.labels)
+
+    def observe(self, stage: str, seconds: float):
+        """Record a stage duration measured by the caller."""
+        self._stage(stage).observe(seconds)
+        self.logger.debug("%s took %.1f ms", stage, seconds * 1000)
+
+    @contextmanager
+    def span(self, stage: str):
+        """Time the enclosed block as `stage`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+
+def metrics() -> tuple:
+    """
+    Prometheus exposition, as (body, content type): this process' metrics, or those of
+    every worker when they share a PROMETHEUS_MULTIPROC_DIR (see api/serve.py).
+    """
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
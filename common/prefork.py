@@ -0,0 +1,92 @@
+import gc
+import logging
+import os
+import signal
+import time
+from typing import Callable, Optional
+
+# Library threads per worker process; 0 splits the cores evenly between workers
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", "0"))
+
+logger = logging.getLogger("common.prefork")
+
+
+def worker_threads(workers: int, threads: int = WORKER_THREADS) -> int:
+    return threads or max(1, (os.cpu_count() or 1) // workers)
+
+
+def run_workers(workers: int, serve: Callable[[int], None], limit_threads: Callable[[int], None],
+                threads: int = WORKER_THREADS, on_exit: Optional[Callable[[int], None]] = None):
+    """
+    Fork `workers` processes running `serve(index)` and keep them running until SIGTERM or SIGINT.
+
+    Whatever the caller loaded before is shared copy-on-write with every worker; the
+    objects are frozen out of the garbage collector first, so collections in the workers
+    do not write to (and copy) their pages. A worker that dies is forked again from the
+    same preloaded state.
+
+    Thread pools do not survive fork(): a child of a process that has started an OpenMP
+    pool hangs on its first parallel region, and onnxruntime or OpenVINO threads are
+    simply gone. So the caller must run whatever it preloads with `limit_threads(1)`,
+    and leave models whose runtime owns threads to be loaded in each worker. Every
+    worker then calls `limit_threads(threads)` before `serve`.
+
+    Args:
+        workers (int): Number of worker processes.
+        serve (Callable): Runs in each worker with its index, 0 to workers - 1; returning exits the worker.
+        limit_threads (Callable): Sizes the thread pools of the service's libraries.
+        threads (int): Library threads per worker, 0 to split the cores evenly.
+        on_exit (Callable): Called in the parent with the pid of every worker that exited.
+    """
+    threads = worker_threads(workers, threads)
+    gc.freeze()
+    children = {}  # pid -> worker index
+    stopping = False
+
+    def spawn(index: int):
+        pid = os.fork()
+        if pid:
+            children[pid] = index
+            return
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        code = 0
+        try:
+            limit_threads(threads)
+            serve(index)
+        except BaseException:
+            logger.exception("Worker %d failed", index)
+            code = 1
+        finally:
+            os._exit(code)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    for index in range(workers):
+        spawn(index)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    logger.info("Started %d workers with %d threads each: %s", workers, threads, sorted(children))
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is None:
+            continue
+        if on_exit:
+            on_exit(pid)
+        if not stopping:
+            logger.warning("Worker %d (pid %d) exited with status %d, restarting it", index, pid,
+                           os.waitstatus_to_exitcode(status))
+            time.sleep(1)  # Do not spin if the worker fails on start
+            spawn(index)
@@ -22,6 +22,13 @@ interface Message {
   timestamp: Date;
 }
 
+// Reply frames sent by the chat gateway; deltas of one reply share its id
+interface ReplyFrame {
+  id: string;
+  type: "start" | "delta" | "end" | "error";
+  text?: string;
+}
+
 const CoachChat = () => {
   const { toast } = useToast();
   const [messages, setMessages] = useState<Message[]>([
@@ -34,10 +41,12 @@ const CoachChat = () => {
   ]);
   const [inputValue, setInputValue] = useState("");
   const [isTyping, setIsTyping] = useState(false);
+  const [isReplying, setIsReplying] = useState(false);
   const [notificationsEnabled, setNotificationsEnabled] = useState(false);
   const [isConnected, setIsConnected] = useState(false);
   const messagesEndRef = useRef<HTMLDivElement>(null);
   const socketRef = useRef<WebSocket | null>(null);
+  const replyRef = useRef<{ id: string; text: string } | null>(null);
 
   // 🔌 Connect WebSocket once
   useEffect(() => {
@@ -50,21 +59,50 @@ const CoachChat = () => {
     };
 
     socket.onmessage = (event) => {
-      console.log("🤖 Coach:", event.data);
-      const coachResponse: Message = {
-        id: Date.now().toString(),
-        text: event.data,
-        sender: "coach",
-        timestamp: new Date(),
-      };
+      let frame: ReplyFrame;
+      try {
+        frame = JSON.parse(event.data);
+      } catch {
+        // Plain-text reply from an older gateway
+        frame = { id: Date.now().toString(), type: "end", text: event.data };
+      }
 
+      const reply = replyRef.current;
+      if (frame.type === "start") {
+        replyRef.current = { id: frame.id, text: "" };
+        return;
+      }
+
+      if (frame.type === "delta") {
+        // Append streamed tokens to the reply being written, creating it on the first one
+        const first = !reply?.text;
+        const text = (reply?.text ?? "") + (frame.text ?? "");
+        replyRef.current = { id: frame.id, text };
+        setIsTyping(false);
+        setMessages((prev) =>
+          first
+            ? [...prev, { id: frame.id, text, sender: "coach", timestamp: new Date() }]
+            : prev.map((m) => (m.id === frame.id ? { ...m, text } : m))
+        );
+        return;
+      }
+
+      // "end" or "error" completes the reply; errors are appended to any partial text
+      const streamed = reply?.id === frame.id ? reply.text : "";
+      const text = frame.type === "error" && streamed ? `${streamed}\n\n${frame.text}` : streamed || (frame.text ?? "");
+      replyRef.current = null;
+      console.log("🤖 Coach:", text);
       playNotificationSound();
       if (notificationsEnabled && document.hidden) {
-        showNotification("Coach Emma", event.data, coachAvatar);
+        showNotification("Coach Emma", text, coachAvatar);
       }
-
-      setMessages((prev) => [...prev, coachResponse]);
+      setMessages((prev) =>
+        streamed
+          ? prev.map((m) => (m.id === frame.id ? { ...m, text } : m))
+          : [...prev, { id: frame.id, text, sender: "coach", timestamp: new Date() }]
+      );
       setIsTyping(false);
+      setIsReplying(false);
     };
 
     socket.onclose = () => {
@@ -124,6 +162,7 @@ const CoachChat = () => {
     setMessages((prev) => [...prev, userMessage]);
     setInputValue("");
     setIsTyping(true);
+    setIsReplying(true);
 
     socketRef.current.send(userMessage.text);
   };
@@ -293,7 +332,7 @@ const CoachChat = () => {
               size="icon"
               className="h-12 w-12 sm:h-14 sm:w-14 flex-shrink-0 touch-manipulation"
               onClick={handleSendMessage}
-              disabled={!inputValue.trim() || isTyping || !isConnected}
+              disabled={!inputValue.trim() || isReplying || !isConnected}
             >
               <Send className="w-5 h-5" />
             </Button>
@@ -40,36 +40,30 @@ const MealUpload = () => {
   const handleSendImage = async () => {
     if (!selectedFile) return;
     setIsAnalyzing(true);
-    const reader = new FileReader();
-    reader.onloadend = async () => {
-      try {
-        const payload: any = { image: reader.result };
-        if (mealDescription.trim()) {
-          payload.description = mealDescription.trim();
-        }
-        const response = await api.post('/upload_image', payload);
-        console.log(response);
-        setDetectedItems(response.data.detected_items || []);
-        toast({
-          title: "Success",
-          description: "Image uploaded successfully!",
-        });
-      } catch (error) {
-        console.error('Upload failed:', error);
-        toast({
-          title: "Error",
-          description: "Failed to upload image.",
-          variant: "destructive",
-        });
-      } finally {
-        setIsAnalyzing(false);
-      }
-    };
-    reader.readAsDataURL(selectedFile);
+    try {
+      // Send the file as a raw binary body instead of a base64 data URL
+      const response = await api.post('/upload_image/file', selectedFile, {
+        headers: { "Content-Type": selectedFile.type || "application/octet-stream" },
+      });
+      console.log(response);
+      setDetectedItems(response.data.detected_items || []);
+      toast({
+        title: "Success",
+        description: "Image uploaded successfully!",
+      });
+    } catch (error) {
+      console.error('Upload failed:', error);
+      toast({
+        title: "Error",
+        description: "Failed to upload image.",
+        variant: "destructive",
+      });
+    } finally {
+      setIsAnalyzing(false);
+    }
   };
 
 
-
   return (
     <div className="min-h-screen gradient-warm pb-20">
       <div className="container max-w-2xl mx-auto px-4 pt-8">